@@ -0,0 +1,173 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.config import settings
+from app.agents.utilities.embedding_service import embedding_service
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding files unavailable
+    _ENCODING = None
+
+# Per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+EXCERPTS_HEADER = "Relevant earlier excerpts:"
+
+SUMMARY_PROMPT = """Progressively summarize the business consultation below, adding to the previous summary.
+Keep facts about the client's business, goals, constraints, numbers and any advice already given.
+
+Previous summary:
+{summary}
+
+New conversation lines:
+{lines}
+
+New summary:"""
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+def count_message_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(count_tokens(str(m.content)) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def format_lines(messages: Sequence[BaseMessage]) -> str:
+    return "\n".join(f"{'User' if m.type == 'human' else 'Consultant'}: {m.content}" for m in messages)
+
+
+def stable_context(messages: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """A built history without the excerpts selected for the current query: the summary and verbatim turns."""
+    return [m for m in messages if not (m.type == "system" and str(m.content).startswith(EXCERPTS_HEADER))]
+
+
+class ContextBuilder:
+    """
+    Assemble the chat history sent with each turn within a token budget.
+
+    The most recent messages are kept verbatim. Older messages are folded into
+    a rolling per-session summary, which is extended incrementally once enough
+    unsummarized text has accumulated, and are then dropped from the session's
+    memory. Optionally (``retrieval_k``), summarized messages are embedded once
+    when they are folded in, and the top-k most similar to the current query
+    are added back as excerpts; at most ``max_excerpts`` are kept per session.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, Sequence[BaseMessage]], Awaitable[str]],
+        token_budget: Optional[int] = None,
+        recent_messages: Optional[int] = None,
+        summary_min_tokens: Optional[int] = None,
+        retrieval_k: Optional[int] = None,
+        embed_many: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None,
+        max_excerpts: int = 500,
+    ):
+        self.summarize = summarize
+        self.token_budget = token_budget or settings.context_token_budget
+        self.recent_messages = recent_messages or settings.context_recent_messages
+        self.summary_min_tokens = settings.context_summary_min_tokens if summary_min_tokens is None else summary_min_tokens
+        self.retrieval_k = settings.context_retrieval_k if retrieval_k is None else retrieval_k
+        self.embed_many = embed_many or embedding_service.embed_many
+        self.max_excerpts = max_excerpts
+        self.tokens_saved_total = 0
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(await self.embed_many(texts), dtype=np.float32)
+        return vectors / (np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-12)
+
+    async def _update_summary(self, session, older: List[BaseMessage]) -> bool:
+        """Fold ``older`` into the summary and drop it from memory; returns whether it was folded."""
+        if not older or count_message_tokens(older) < self.summary_min_tokens:
+            return False
+        try:
+            session.summary = await self.summarize(session.summary, older)
+        except Exception as e:
+            # Unsummarized messages are still sent verbatim (budget permitting)
+            logger.warning("[ContextBuilder] Summary update failed for session %s: %s", session.session_id, e)
+            return False
+        if self.retrieval_k:
+            await self._add_excerpts(session, older)
+        del session.memory.chat_memory.messages[: len(older)]
+        session.summarized_count += len(older)
+        session.summarized_tokens += count_message_tokens(older)
+        return True
+
+    async def _add_excerpts(self, session, messages: List[BaseMessage]):
+        # Empty messages (e.g. a failed turn's reply) can't be embedded and are never relevant
+        messages = [m for m in messages if str(m.content).strip()]
+        if not messages:
+            return
+        try:
+            vectors = await self._embed([str(m.content) for m in messages])
+        except Exception as e:
+            logger.warning("[ContextBuilder] Embedding excerpts failed for session %s: %s", session.session_id, e)
+            return
+        if session.excerpt_vectors is not None:
+            vectors = np.vstack([session.excerpt_vectors, vectors])
+        session.excerpts = (session.excerpts + list(messages))[-self.max_excerpts:]
+        session.excerpt_vectors = vectors[-self.max_excerpts:]
+
+    async def _relevant(self, session, query: str) -> List[BaseMessage]:
+        if not self.retrieval_k or not session.excerpts:
+            return []
+        query_vector = (await self._embed([query]))[0]
+        scores = session.excerpt_vectors @ query_vector
+        top = np.argsort(-scores)[: self.retrieval_k]
+        # Keep conversation order among the selected excerpts
+        return [session.excerpts[i] for i in sorted(top)]
+
+    async def build(self, session, query: str) -> Tuple[List[BaseMessage], Dict[str, Any]]:
+        """Return (chat_history, stats) for one turn of ``session``."""
+        messages = list(session.messages)
+        full_tokens = session.summarized_tokens + count_message_tokens(messages)
+        split = max(0, len(messages) - self.recent_messages)
+        older, recent = messages[:split], messages[split:]
+
+        unsummarized = [] if await self._update_summary(session, older) else older
+        relevant = await self._relevant(session, query)
+
+        prefix: List[BaseMessage] = []
+        if session.summary:
+            prefix.append(SystemMessage(content=f"Summary of the earlier conversation:\n{session.summary}"))
+        if relevant:
+            prefix.append(SystemMessage(content=f"{EXCERPTS_HEADER}\n{format_lines(relevant)}"))
+
+        # Drop from the oldest end until the budget is met, keeping the last exchange
+        body = unsummarized + recent
+        budget = self.token_budget - count_message_tokens(prefix)
+        while len(body) > 2 and count_message_tokens(body) > budget:
+            body.pop(0)
+        history = prefix + body
+
+        used_tokens = count_message_tokens(history)
+        saved = max(0, full_tokens - used_tokens)
+        self.tokens_saved_total += saved
+        stats = {
+            "full_tokens": full_tokens,
+            "context_tokens": used_tokens,
+            "tokens_saved": saved,
+            "summarized_messages": session.summarized_count,
+            "relevant_messages": len(relevant),
+        }
+        logger.info("[ContextBuilder] session=%s context_tokens=%d tokens_saved=%d", session.session_id, used_tokens, saved)
+        return history, stats
+
+
+def llm_summarizer(llm):
+    """Build a summarize callable backed by a chat model."""
+    async def summarize(summary: str, messages: Sequence[BaseMessage]) -> str:
+        prompt = SUMMARY_PROMPT.format(summary=summary or "(none)", lines=format_lines(messages))
+        response = await llm.ainvoke([HumanMessage(content=prompt)])
+        return str(response.content).strip()
+    return summarize
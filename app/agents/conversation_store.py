@@ -0,0 +1,177 @@
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+from app.supabase_integration.rest import rest_client
+
+logger = logging.getLogger(__name__)
+
+# Optional RPC that logs a turn in one round trip (set CONVERSATION_TURN_RPC=log_turn).
+# The history select sees the snapshot from before the insert, so it never
+# includes the new rows:
+#
+#   create or replace function log_turn(
+#       p_session_id text, p_user_id uuid, p_content text, p_title text,
+#       p_after_id bigint default null, p_history_limit int default 0
+#   ) returns json language sql security invoker as $$
+#     with history as (
+#       select id, role, content from conversations
+#       where session_id = p_session_id and (p_after_id is null or id > p_after_id)
+#       order by id desc limit p_history_limit
+#     ), inserted as (
+#       insert into conversations (session_id, user_id, role, content, title, status)
+#       values (p_session_id, p_user_id, 'user', p_content, p_title, default),
+#              (p_session_id, p_user_id, 'assistant', '', p_title, 'pending')
+#       returning id, role
+#     )
+#     select json_build_object(
+#       'user_row_id', (select id from inserted where role = 'user'),
+#       'assistant_row_id', (select id from inserted where role = 'assistant'),
+#       'history', coalesce((select json_agg(h order by h.id) from history h), '[]'::json)
+#     );
+#   $$;
+#
+# RPC that stores a batch of embeddings in one statement (EMBEDDING_WRITER_RPC,
+# default update_embeddings). Each value is cast to the column's type:
+#
+#   create or replace function update_embeddings(p_rows jsonb)
+#   returns void language sql security invoker as $$
+#     update conversations c set embedding = r.embedding
+#     from jsonb_populate_recordset(null::conversations, p_rows) r
+#     where c.id = r.id;
+#   $$;
+
+
+class ConversationStore:
+    """
+    Batched writes to the ``conversations`` table.
+
+    A turn's user row and pending assistant row are inserted with one bulk
+    POST (or, with ``turn_rpc``, one RPC that also returns recent history).
+    ``bulk_import`` loads many historical rows in large batches, and
+    ``update_embeddings`` stores a batch of embeddings with ``embedding_rpc``.
+    """
+
+    def __init__(
+        self,
+        rest=None,
+        table: str = "conversations",
+        turn_rpc: Optional[str] = None,
+        import_batch_size: Optional[int] = None,
+        embedding_rpc: Optional[str] = None,
+    ):
+        self.rest = rest or rest_client
+        self.table = table
+        self.turn_rpc = settings.conversation_turn_rpc if turn_rpc is None else turn_rpc
+        self.import_batch_size = import_batch_size or settings.conversation_import_batch_size
+        self.embedding_rpc = settings.embedding_writer_rpc if embedding_rpc is None else embedding_rpc
+
+    async def insert_rows(self, rows: List[Dict[str, Any]], jwt_token: Optional[str], select: str = "id") -> List[Dict[str, Any]]:
+        """Insert ``rows`` in one request and return them (``select`` columns) in order."""
+        columns = list(dict.fromkeys(key for row in rows for key in row))
+        params = {"columns": ",".join(columns)}
+        if select:
+            params["select"] = select
+        resp = await self.rest.post(
+            self.table,
+            rows,
+            jwt_token,
+            params=params,
+            # Rows may omit some of the columns (e.g. status); those get the column default
+            prefer="return=representation,missing=default" if select else "return=minimal,missing=default",
+        )
+        if resp.status_code not in (200, 201):
+            raise Exception(f"Insert failed: {resp.text}")
+        return resp.json() if select else []
+
+    async def start_turn(
+        self,
+        session_id: str,
+        user_id: str,
+        user_message: str,
+        jwt_token: Optional[str],
+        title: str = "Business Consultation",
+        history_after: Optional[Any] = None,
+        history_limit: int = 0,
+    ) -> Tuple[Optional[Any], Optional[Any], Optional[List[Dict[str, Any]]]]:
+        """
+        Log the user message and a pending assistant row for one turn.
+
+        Returns ``(user_row_id, assistant_row_id, history)``; history (rows
+        newer than ``history_after``, oldest first) is only returned by the
+        turn RPC and only when ``history_limit`` is set, otherwise it is None.
+        """
+        if self.turn_rpc:
+            resp = await self.rest.post(
+                f"rpc/{self.turn_rpc}",
+                {
+                    "p_session_id": session_id,
+                    "p_user_id": user_id,
+                    "p_content": user_message,
+                    "p_title": title,
+                    "p_after_id": history_after,
+                    "p_history_limit": history_limit,
+                },
+                jwt_token,
+                prefer=None,
+            )
+            if resp.status_code != 200:
+                raise Exception(f"{self.turn_rpc} failed: {resp.text}")
+            data = resp.json()
+            history = data.get("history") if history_limit else None
+            return data.get("user_row_id"), data.get("assistant_row_id"), history
+        base = {"session_id": session_id, "user_id": user_id, "title": title, "metadata": {}, "is_archived": False}
+        inserted = await self.insert_rows(
+            [
+                dict(base, role="user", content=user_message),
+                dict(base, role="assistant", content="", status="pending"),
+            ],
+            jwt_token,
+            select="id,role",
+        )
+        # PostgREST does not promise to return rows in insert order
+        ids = {row.get("role"): row.get("id") for row in inserted}
+        return ids.get("user"), ids.get("assistant"), None
+
+    async def bulk_import(
+        self,
+        rows: Iterable[Dict[str, Any]],
+        jwt_token: Optional[str],
+        select: Optional[str] = "id,content",
+        batch_size: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Insert many rows, ``batch_size`` per request; returns the inserted rows' ``select`` columns."""
+        batch_size = batch_size or self.import_batch_size
+        inserted: List[Dict[str, Any]] = []
+        batch: List[Dict[str, Any]] = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                inserted.extend(await self.insert_rows(batch, jwt_token, select=select))
+                batch = []
+        if batch:
+            inserted.extend(await self.insert_rows(batch, jwt_token, select=select))
+        logger.info("[ConversationStore] Imported %d rows", len(inserted))
+        return inserted
+
+    async def update_embeddings(self, rows: List[Dict[str, Any]], jwt_token: Optional[str]):
+        """
+        Store ``[{"id", "embedding"}]`` with one call to ``embedding_rpc``. When
+        the RPC is not configured or does not exist (404), rows are patched one
+        request each instead.
+        """
+        if self.embedding_rpc:
+            resp = await self.rest.post(f"rpc/{self.embedding_rpc}", {"p_rows": rows}, jwt_token, prefer="return=minimal")
+            if resp.status_code in (200, 204):
+                return
+            if resp.status_code != 404:
+                raise Exception(f"{self.embedding_rpc} failed: {resp.text}")
+            logger.warning("[ConversationStore] RPC %s not found, patching embeddings row by row", self.embedding_rpc)
+            self.embedding_rpc = ""
+        for row in rows:
+            # The row is not echoed back: with return=representation the response would carry the vector again
+            resp = await self.rest.patch(
+                self.table, {"embedding": row["embedding"]}, jwt_token, params={"id": f"eq.{row['id']}"}, prefer="return=minimal"
+            )
+            if resp.status_code not in (200, 204):
+                raise Exception(f"Embedding update failed: {resp.text}")
@@ -1,137 +1,174 @@
-import websocket
+import asyncio
 import json
-import threading
+import time
 import uuid
-from app.supabase_integration import get_supabase_client
+import websockets
+from app.config import settings
+from app.supabase_integration.rest import rest_client
+from app.agents.research_persistence import BufferedResearchWriter
+from app.agents.research_cache import research_cache
+from app.metrics import RESEARCH_BYTES, RESEARCH_JOBS, observe, span
 import logging
 
 class GPTResearcherAgent:
-    def __init__(self, ws_url):
-        self.ws_url = ws_url
-        self.supabase = None  # Will be set per request
-        self.research_id = None
-        self.metadata = []
-        self.results = None
-        self.user_id = None
-        self.topic = None
-        self._ws_thread = None
-        self._ws = None
-        self._ws_closed = False
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
+    """
+    Client for the GPT Researcher websocket API.
 
-    def set_supabase_client(self, jwt_token):
-        self.supabase = get_supabase_client()
-        self.supabase.postgrest.auth(jwt_token)
+    The agent holds no per-job state: each ``arun_task`` call is one job, so
+    many jobs can run concurrently on the event loop (see ResearchJobManager).
+    Jobs are persisted through the pooled PostgREST client and can be
+    cancelled or time out individually. Completed reports are cached by
+    ``cache_key`` so repeated requests are answered without the researcher.
+    """
 
-    def _insert_initial_row(self):
-        self.supabase.table("research_history").insert({
-            "id": self.research_id,
-            "user_id": self.user_id,
-            "topic": self.topic,
-            "metadata": self.metadata,
-            "results": self.results
-        }).execute()
-
-    def _update_metadata(self):
-        self.supabase.table("research_history").update({
-            "metadata": self.metadata
-        }).eq("id", self.research_id).execute()
+    def __init__(self, ws_url, rest=None, timeout=None, cache=None):
+        self.ws_url = ws_url
+        self.rest = rest or rest_client
+        self.timeout = timeout or settings.gpt_researcher_timeout
+        self.cache = cache or research_cache
+        self.logger = logging.getLogger(__name__)
 
-    def _update_results(self):
-        try:
-            self.logger.info("[Supabase] Updating results in Supabase. Results length: %d", len(self.results))
-            response = self.supabase.table("research_history").update({
-                "results": self.results
-            }).eq("id", self.research_id).execute()
-            self.logger.info("[Supabase] Supabase update response: %s", response)
-            if hasattr(response, 'error') and response.error:
-                self.logger.error("[Supabase] Supabase update failed: %s", response.error)
-        except Exception as e:
-            self.logger.error("[Supabase] Failed to update results in Supabase: %s", str(e))
-            self.logger.error("[Supabase] Research ID: %s", self.research_id)
-            self.logger.error("[Supabase] Results length: %d", len(self.results))
+    async def _insert_initial_row(self, research_id, user_id, topic, jwt_token, metadata=None, results=""):
+        resp = await self.rest.post("research_history", {
+            "id": research_id,
+            "user_id": user_id,
+            "topic": topic,
+            "metadata": metadata or [],
+            "results": results
+        }, jwt_token, prefer="return=minimal")
+        if resp.status_code >= 400:
+            raise Exception(f"Insert into research_history failed: {resp.text}")
 
-    def _on_message(self, ws, message):
-        self.logger.info("[WebSocket] Received message: %s", message)
+    async def _on_message(self, writer, message, on_event=None):
+        if isinstance(message, bytes):
+            message = message.decode("utf-8", errors="replace")
+        self.logger.debug("[WebSocket] Received message: %s", message)
         if "📝 Report written for" in message:
             self.logger.info("[WebSocket] Report completion message received!")
         try:
             msg = json.loads(message)
         except Exception:
             msg = message
+        if isinstance(msg, dict) and on_event is not None:
+            # Re-broadcast to live followers before persisting
+            on_event(msg)
         if isinstance(msg, dict) and msg.get("type") == "report":
-            output = msg.get("output", "")
-            self.logger.info("[WebSocket] Appending report chunk. Current results length: %d", len(self.results))
-            self.results += output
-            self.logger.info("[WebSocket] New results length: %d", len(self.results))
-            self._update_results()
+            # Chunks are buffered and persisted in batches by the writer
+            chunk = msg.get("output", "")
+            RESEARCH_BYTES.inc(len(chunk.encode("utf-8")) if isinstance(chunk, str) else 0)
+            await writer.add_chunk(chunk)
         elif isinstance(msg, dict):
-            self.metadata.append(msg)
-            self._update_metadata()
-        self.logger.info("[WebSocket] Message handling complete.")
+            await writer.add_metadata(msg)
 
-    def _on_error(self, ws, error):
-        self.logger.error("[WebSocket] Error: %s", error)
-        ws.close()
-        self._ws_closed = True
+    async def _stream(self, writer, payload, on_event=None):
+        connect_start = time.perf_counter()
+        async with websockets.connect(self.ws_url, max_size=None) as ws:
+            observe("researcher.connect", time.perf_counter() - connect_start)
+            await ws.send(payload)
+            # The researcher closes the connection once the report is written
+            stream_start = time.perf_counter()
+            async for message in ws:
+                await self._on_message(writer, message, on_event)
+            observe("researcher.stream", time.perf_counter() - stream_start)
 
-    def _on_close(self, ws, close_status_code, close_msg):
-        self.logger.info("[WebSocket] Connection closed. Final results length: %d", len(self.results))
-        self.logger.info("[WebSocket] Close status code: %s, message: %s", close_status_code, close_msg)
-        self._update_results()
-        self.logger.info("[WebSocket] on_close handler complete.")
-        self._ws_closed = True
+    async def arun_task(self, task, report_type, report_source, tone, user_id, topic, jwt_token,
+                        headers=None, research_id=None, timeout=None, on_event=None, cache_key=None):
+        """
+        Run one research job to completion (or timeout) and return its results.
+        ``on_event`` is called with every JSON message received from the researcher.
+        """
+        research_id = research_id or str(uuid.uuid4())
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            self.logger.info("[run_task] Research task %s answered from cache", research_id)
+            RESEARCH_JOBS.inc(status="cached")
+            return await self._save_copy(research_id, user_id, topic, jwt_token, cached["metadata"], cached["results"], on_event)
+        self.logger.info("[run_task] Starting research task %s for user_id=%s, topic=%s", research_id, user_id, topic)
+        started = time.perf_counter()
+        writer = BufferedResearchWriter(research_id, jwt_token, rest=self.rest)
+        with span("researcher.insert_row"):
+            await self._insert_initial_row(research_id, user_id, topic, jwt_token)
 
-    def _on_open(self, ws, payload):
-        self.logger.info("[WebSocket] Opened connection, sending payload")
-        ws.send(payload)
-
-    def run_task(self, task, report_type, report_source, tone, user_id, topic, jwt_token, headers=None):
-        self.logger.info("[run_task] Starting research task for user_id=%s, topic=%s", user_id, topic)
-        self.set_supabase_client(jwt_token)
-        self.user_id = user_id
-        self.topic = topic
-        self.research_id = str(uuid.uuid4())
-        self.metadata = []
-        self.results = ""
-        self._insert_initial_row()
-        
         payload_data = {
             "task": task,
             "report_type": report_type,
             "report_source": report_source,
             "tone": tone
         }
-        
+
         if headers:
             payload_data["headers"] = headers
-            
+
         payload = f'start {json.dumps(payload_data)}'
-        
-        self._ws_closed = False
-        self._ws = websocket.WebSocketApp(
-            self.ws_url,
-            on_open=lambda ws: self._on_open(ws, payload),
-            on_message=self._on_message,
-            on_error=self._on_error,
-            on_close=self._on_close
-        )
-        self._ws_thread = threading.Thread(target=self._ws.run_forever)
-        self.logger.info("[run_task] Starting WebSocket thread")
-        self._ws_thread.start()
-        self._ws_thread.join(timeout=300)
-        if self._ws_thread.is_alive():
-            self.logger.warning("[run_task] WebSocket thread did not finish in 60s, attempting to close")
-            if self._ws:
-                try:
-                    self._ws.close()
-                except Exception as e:
-                    self.logger.error("[run_task] Error closing WebSocket: %s", e)
-            self._ws_thread.join(timeout=5)
-        self.logger.info("[run_task] Finished research task for research_id=%s, final results length: %d", self.research_id, len(self.results))
+
+        status = "completed"
+        try:
+            # wait_for rather than asyncio.timeout, which needs Python 3.11
+            await asyncio.wait_for(self._stream(writer, payload, on_event), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            status = "timeout"
+            self.logger.warning("[run_task] Research task %s timed out after %ss", research_id, timeout or self.timeout)
+        except asyncio.CancelledError:
+            status = "cancelled"
+            self.logger.info("[run_task] Research task %s cancelled", research_id)
+            raise
+        except (OSError, websockets.WebSocketException) as e:
+            status = "failed"
+            self.logger.error("[run_task] WebSocket error for research task %s: %s", research_id, e)
+        finally:
+            # Persist whatever arrived, even when cancelled
+            with span("researcher.final_flush"):
+                await asyncio.shield(writer.flush(final=True))
+            observe("researcher.run", time.perf_counter() - started)
+            RESEARCH_JOBS.inc(status=status)
+            self.logger.info("[run_task] Research task %s %s. Writer stats: %s", research_id, status, writer.stats())
+        if status == "completed":
+            await self.cache.set(cache_key, writer.metadata, writer.results)
+        return {
+            "research_id": research_id,
+            "status": status,
+            "metadata": writer.metadata,
+            "results": writer.results
+        }
+
+    async def _save_copy(self, research_id, user_id, topic, jwt_token, metadata, results, on_event=None):
+        """Store an already finished report as this user's own research_history row."""
+        if on_event is not None:
+            for item in metadata:
+                on_event(item)
+            on_event({"type": "report", "output": results})
+        await self._insert_initial_row(research_id, user_id, topic, jwt_token, metadata=metadata, results=results)
         return {
-            "research_id": self.research_id,
-            "metadata": self.metadata,
-            "results": self.results
-        } 
\ No newline at end of file
+            "research_id": research_id,
+            "status": "completed",
+            "cached": True,
+            "metadata": metadata,
+            "results": results
+        }
+
+    async def afollow_task(self, leader, research_id, user_id, topic, jwt_token, on_event=None, cache_key=None, **_):
+        """
+        Attach to an identical job already in flight instead of starting another
+        one: relay its events live, then save its report under this job's id.
+        """
+        self.logger.info("[run_task] Research task %s attached to %s", research_id, leader.research_id)
+        metadata, parts = [], []
+        async for _, event in leader.follow(0):
+            if event.get("type") == "status":
+                continue
+            if on_event is not None:
+                on_event(event)
+            if event.get("type") == "report":
+                parts.append(event.get("output", ""))
+            else:
+                metadata.append(event)
+        if leader.status != "completed":
+            return {"research_id": research_id, "status": leader.status, "metadata": metadata, "results": "".join(parts)}
+        results = "".join(parts)
+        if leader.first_offset:
+            # The leader's event log was trimmed; take the full report from the cache
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                metadata, results = cached["metadata"], cached["results"]
+        await self._insert_initial_row(research_id, user_id, topic, jwt_token, metadata=metadata, results=results)
+        return {"research_id": research_id, "status": "completed", "metadata": metadata, "results": results}
@@ -0,0 +1,80 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.agents.memory import async_memory
+
+logger = logging.getLogger(__name__)
+
+# fetch(session_id, jwt_token, after_id=None, limit=None) -> [{"id", "role", "content"}, ...] oldest first
+FetchHistory = Callable[..., Awaitable[List[Dict[str, Any]]]]
+
+
+class ConversationHistoryStore:
+    """
+    Incremental conversation history.
+
+    The most recent ``window`` messages of each session live in a capped Redis
+    list that is appended to as messages are logged. Supabase is only queried
+    on a cache miss, and then only for rows after the caller's cursor.
+
+    Lists are keyed by user as well as session: a hit skips the RLS-checked
+    Supabase read, so a client-chosen session id alone must not reach
+    another user's history.
+    """
+
+    def __init__(self, fetch: FetchHistory, redis=None, window: Optional[int] = None, ttl: Optional[int] = None):
+        self.fetch = fetch
+        self.redis = redis or async_memory
+        self.window = window or settings.history_window
+        self.ttl = ttl or settings.history_ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(session_id: str, user_id: Optional[str]) -> str:
+        return f"session:{user_id}:{session_id}:history"
+
+    async def append(self, session_id: str, user_id: Optional[str], messages: List[Dict[str, Any]]):
+        """Append logged messages; a missing list is left for the next miss to backfill."""
+        messages = [m for m in messages if m.get("id") is not None]
+        if messages:
+            await self.redis.append_to_list(self.key(session_id, user_id), messages, self.window, self.ttl, create=False)
+
+    async def get_cached(
+        self, session_id: str, user_id: Optional[str], after_id: Optional[Any] = None
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Cached messages newer than ``after_id``, or None on a cache miss."""
+        cached = await self.redis.get_list(self.key(session_id, user_id))
+        if cached is None:
+            return None
+        self.hits += 1
+        return [m for m in cached if after_id is None or m["id"] > after_id]
+
+    async def load(
+        self, session_id: str, user_id: Optional[str], jwt_token: Optional[str], after_id: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """Fetch from Supabase (RLS-scoped to ``jwt_token``, which belongs to ``user_id``) without touching the cache."""
+        self.misses += 1
+        return await self.fetch(session_id, jwt_token, after_id=after_id, limit=self.window)
+
+    async def seed(self, session_id: str, user_id: Optional[str], rows: List[Dict[str, Any]]):
+        """Start the shared list from a full window of rows (fetched with no cursor)."""
+        if rows:
+            await self.redis.append_to_list(self.key(session_id, user_id), rows, self.window, self.ttl)
+
+    async def get_recent(
+        self, session_id: str, user_id: Optional[str], jwt_token: Optional[str], after_id: Optional[Any] = None
+    ) -> List[Dict[str, Any]]:
+        """Return recent messages, oldest first, newer than ``after_id`` when given."""
+        cached = await self.get_cached(session_id, user_id, after_id)
+        if cached is not None:
+            return cached
+        rows = await self.load(session_id, user_id, jwt_token, after_id)
+        if after_id is None:
+            # Only a full window is a valid seed for the shared list
+            await self.seed(session_id, user_id, rows)
+        return rows
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -1,26 +1,60 @@
 import redis
+import redis.asyncio as aioredis
 import json
+import time
+import logging
+from contextlib import asynccontextmanager
 from ..config import settings
-from typing import Any, Dict, Optional
+from ..metrics import observe
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, compact binary encoding
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+def get_serializer(name: Optional[str] = None) -> Tuple[Callable[[Any], Any], Callable[[Any], Any]]:
+    """
+    ``(dumps, loads)`` for ``REDIS_SERIALIZER``: ``json`` (default), ``orjson``
+    or ``msgpack``. Falls back to json when the package is not installed.
+    Values written with one serializer can't be read with another, so change
+    it together with a flush (or new key prefix) of existing data.
+    """
+    name = name or settings.redis_serializer
+    if name == "orjson" and orjson is not None:
+        return orjson.dumps, orjson.loads
+    if name == "msgpack" and msgpack is not None:
+        return (lambda value: msgpack.packb(value, use_bin_type=True)), (lambda blob: msgpack.unpackb(blob, raw=False))
+    if name != "json":
+        logger.warning("[RedisMemory] Serializer %s is not available; using json", name)
+    return json.dumps, json.loads
+
 
 class RedisMemory:
     def __init__(self):
         self.redis_client = redis.from_url(settings.redis_url)
-    
+
     def set_memory(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
         """
         Store a value in Redis memory
         """
         try:
             serialized_value = json.dumps(value)
-            self.redis_client.set(key, serialized_value)
-            if expire:
-                self.redis_client.expire(key, expire)
+            # SET ... EX in one command, so the key never exists without its TTL
+            self.redis_client.set(key, serialized_value, ex=expire)
             return True
         except Exception as e:
-            print(f"Error setting memory: {e}")
+            logger.error("Error setting memory: %s", e)
             return False
-    
+
     def get_memory(self, key: str) -> Optional[Any]:
         """
         Retrieve a value from Redis memory
@@ -31,9 +65,9 @@ class RedisMemory:
                 return json.loads(value)
             return None
         except Exception as e:
-            print(f"Error getting memory: {e}")
+            logger.error("Error getting memory: %s", e)
             return None
-    
+
     def delete_memory(self, key: str) -> bool:
         """
         Delete a value from Redis memory
@@ -42,9 +76,9 @@ class RedisMemory:
             self.redis_client.delete(key)
             return True
         except Exception as e:
-            print(f"Error deleting memory: {e}")
+            logger.error("Error deleting memory: %s", e)
             return False
-    
+
     def clear_all_memories(self) -> bool:
         """
         Clear all memories (use with caution)
@@ -53,8 +87,175 @@ class RedisMemory:
             self.redis_client.flushdb()
             return True
         except Exception as e:
-            print(f"Error clearing memories: {e}")
+            logger.error("Error clearing memories: %s", e)
             return False
 
-# Create a singleton instance
-memory = RedisMemory() 
\ No newline at end of file
+class AsyncRedisMemory:
+    """
+    asyncio counterpart of RedisMemory for use inside request handlers.
+
+    All instances built from the same URL share one connection pool. Multi-key
+    reads and writes go out in a single round trip (MGET / a pipeline), and
+    per-operation latencies are kept for ``stats()``.
+    """
+    _pools: Dict[str, aioredis.ConnectionPool] = {}
+
+    def __init__(self, url: Optional[str] = None, serializer: Optional[str] = None, max_connections: Optional[int] = None, client=None):
+        url = url or settings.redis_url
+        if client is None:
+            pool = self._pools.get(url)
+            if pool is None:
+                pool = self._pools[url] = aioredis.ConnectionPool.from_url(
+                    url,
+                    max_connections=max_connections or settings.redis_max_connections,
+                    socket_timeout=settings.redis_socket_timeout or None,
+                    socket_connect_timeout=settings.redis_socket_timeout or None,
+                )
+            client = aioredis.Redis(connection_pool=pool)
+        self.redis_client = client
+        self.dumps, self.loads = get_serializer(serializer)
+        self.latency: Dict[str, Dict[str, float]] = {}
+        self.errors = 0
+
+    @asynccontextmanager
+    async def _timed(self, op: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            observe(f"redis.{op}", elapsed / 1000)
+            entry = self.latency.get(op)
+            if entry is None:
+                entry = self.latency[op] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+            entry["count"] += 1
+            entry["total_ms"] += elapsed
+            entry["max_ms"] = max(entry["max_ms"], elapsed)
+
+    def _failed(self, action: str, e: Exception):
+        self.errors += 1
+        logger.error("Error %s: %s", action, e)
+
+    async def set_memory(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
+        """
+        Store a value in Redis memory
+        """
+        try:
+            async with self._timed("set"):
+                await self.redis_client.set(key, self.dumps(value), ex=expire)
+            return True
+        except Exception as e:
+            self._failed("setting memory", e)
+            return False
+
+    async def get_memory(self, key: str) -> Optional[Any]:
+        """
+        Retrieve a value from Redis memory
+        """
+        try:
+            async with self._timed("get"):
+                value = await self.redis_client.get(key)
+            if value:
+                return self.loads(value)
+            return None
+        except Exception as e:
+            self._failed("getting memory", e)
+            return None
+
+    async def set_many(self, values: Dict[str, Any], expire: Optional[int] = None) -> bool:
+        """
+        Store several values in one pipelined round trip
+        """
+        if not values:
+            return True
+        try:
+            async with self._timed("set_many"):
+                pipe = self.redis_client.pipeline(transaction=False)
+                for key, value in values.items():
+                    pipe.set(key, self.dumps(value), ex=expire)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            self._failed("setting memories", e)
+            return False
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Retrieve several values with one MGET; missing keys are left out
+        """
+        if not keys:
+            return {}
+        try:
+            async with self._timed("get_many"):
+                values = await self.redis_client.mget(keys)
+            return {key: self.loads(value) for key, value in zip(keys, values) if value}
+        except Exception as e:
+            self._failed("getting memories", e)
+            return {}
+
+    async def delete_memory(self, key: str) -> bool:
+        """
+        Delete a value from Redis memory
+        """
+        try:
+            async with self._timed("delete"):
+                await self.redis_client.delete(key)
+            return True
+        except Exception as e:
+            self._failed("deleting memory", e)
+            return False
+
+    async def append_to_list(self, key: str, values: List[Any], max_length: int, expire: Optional[int] = None, create: bool = True) -> bool:
+        """
+        Append values to a capped list, keeping only the newest max_length items.
+        With create=False nothing is written unless the list already exists.
+        """
+        try:
+            async with self._timed("append_to_list"):
+                pipe = self.redis_client.pipeline(transaction=False)
+                push = pipe.rpush if create else pipe.rpushx
+                push(key, *[self.dumps(value) for value in values])
+                pipe.ltrim(key, -max_length, -1)
+                if expire:
+                    pipe.expire(key, expire)
+                await pipe.execute()
+            return True
+        except Exception as e:
+            self._failed("appending to list", e)
+            return False
+
+    async def get_list(self, key: str) -> Optional[List[Any]]:
+        """
+        Retrieve a whole list; None when the key is missing or Redis is unavailable
+        """
+        try:
+            async with self._timed("get_list"):
+                values = await self.redis_client.lrange(key, 0, -1)
+            if not values:
+                return None
+            return [self.loads(value) for value in values]
+        except Exception as e:
+            self._failed("getting list", e)
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "errors": self.errors,
+            "latency_ms": {
+                op: {
+                    "count": entry["count"],
+                    "avg": round(entry["total_ms"] / entry["count"], 3),
+                    "max": round(entry["max_ms"], 3),
+                }
+                for op, entry in self.latency.items()
+            },
+        }
+
+    async def close(self):
+        await self.redis_client.aclose()
+        # aclose() leaves an explicitly passed pool open
+        await self.redis_client.connection_pool.disconnect()
+
+# Create singleton instances
+memory = RedisMemory()
+async_memory = AsyncRedisMemory()
@@ -1,11 +1,26 @@
 import os
+import time
 import uuid
+import asyncio
+from contextvars import ContextVar
 from typing import List, Dict, Any, Optional
-import httpx
 from supabase import create_client, Client
-from app.agents.utilities.create_embeddings import get_embedding
-from app.agents.memory import memory as redis_memory
-from langchain.memory import ConversationBufferMemory
+from app.supabase_integration.rest import rest_client
+from app.agents.utilities.create_embeddings import get_embedding, aget_embedding
+from app.agents.utilities.embedding_writer import EmbeddingWriteBehind
+from app.agents.utilities.embedding_codec import to_wire
+from app.agents.memory import async_memory as redis_memory
+from app.agents.session_pool import SessionMemoryPool
+from app.agents.history_store import ConversationHistoryStore
+from app.agents.conversation_store import ConversationStore
+from app.agents.context_builder import ContextBuilder, llm_summarizer, stable_context
+from app.agents.vector_index import create_vector_search
+from app.agents.retrieval import Retriever
+from app.agents.response_cache import ResponseCache, context_fingerprint
+from app.agents.turn_router import TurnRouter
+from app.config import settings
+from app.tracing import record, trace_callbacks
+from app.metrics import TokenUsageHandler, observe, span
 from langchain_openai import ChatOpenAI
 from langchain.chains import ConversationChain
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
@@ -21,6 +36,9 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 EMBEDDING_DIM = 1536  # Set this to your embedding size (e.g., 1536 for OpenAI Ada)
 
+# The user and JWT of the turn being answered, for tools of the shared agent executor
+current_turn: ContextVar[Optional[Dict[str, Any]]] = ContextVar("current_turn", default=None)
+
 # Custom system prompt for business consulting
 BUSINESS_CONSULTANT_PROMPT = """You are an expert business consultant with deep knowledge in:
 - Business strategy and growth
@@ -41,24 +59,44 @@ Always maintain a professional tone and focus on delivering value through practi
 
 class ConversationalAgent:
     def __init__(self, llm_model="gpt-3.5-turbo"):
-        logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
         self.logger.info("[ConversationalAgent] Initializing agent with model %s", llm_model)
-        self.llm = ChatOpenAI(model=llm_model)
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
+        self.llm = ChatOpenAI(
+            model=llm_model, base_url=settings.openai_base_url, stream_usage=True, callbacks=[TokenUsageHandler("agent")]
         )
+        # Memory is per session; the prompt, tools, LLM and executor are shared
+        self.sessions = SessionMemoryPool()
+        self.history = ConversationHistoryStore(fetch=self._rest_get_conversation_history)
+        # Batched conversation writes (one request per turn, bulk imports)
+        self.store = ConversationStore()
+        self.context_builder = ContextBuilder(summarize=llm_summarizer(self.llm))
         
         # Initialize tools
         self.tools = self._initialize_tools()
         
         # Create the agent with custom prompt
         self.agent = self._create_agent()
+        # Turns that need no tools are answered by one LLM call without the tool schemas
+        self.direct_chain = self._create_direct_chain()
+        self.router = TurnRouter(self.tools)
         
         # Initialize Supabase client (will be updated with JWT token)
         self.logger.info("[ConversationalAgent] Creating Supabase client")
         self.supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        # Similarity search backend (match_conversations RPC or a local per-user index)
+        self.vector_search = create_vector_search()
+        self.retriever = Retriever(self.vector_search)
+        # Embeddings for logged messages are written in the background and then indexed
+        self.embedding_writer = EmbeddingWriteBehind(
+            patch_many=self.store.update_embeddings,
+            on_written=self._index_embedding,
+            encode=to_wire,
+            credential=settings.embedding_writer_service_key or None,
+        )
+        # Opt-in cache of replies to repeated questions (RESPONSE_CACHE_ENABLED)
+        self.response_cache = ResponseCache()
+        # Assistant rows of streamed replies still being written back
+        self._pending_finalizers = set()
         self.logger.info("[ConversationalAgent] Initialization complete")
         
     def _initialize_tools(self) -> List[Tool]:
@@ -67,11 +105,13 @@ class ConversationalAgent:
             Tool(
                 name="SearchSimilarConversations",
                 func=self._search_similar_conversations,
+                coroutine=self._asearch_similar_conversations,
                 description="Search for similar past conversations to provide context-aware responses"
             ),
             Tool(
                 name="GetBusinessMetrics",
                 func=self._get_business_metrics,
+                coroutine=self._aget_business_metrics,
                 description="Retrieve relevant business metrics and KPIs for analysis"
             )
         ]
@@ -91,13 +131,28 @@ class ConversationalAgent:
             prompt=prompt
         )
         
+        # Steps are only recorded for traced requests (see app.tracing)
         return AgentExecutor(
             agent=agent,
             tools=self.tools,
-            memory=self.memory,
-            verbose=True
+            # Lets callers tell whether a reply depended on tool results
+            return_intermediate_steps=True
         )
 
+    def _create_direct_chain(self):
+        """Same prompt as the agent, without tools or scratchpad"""
+        prompt = ChatPromptTemplate.from_messages([
+            SystemMessage(content=BUSINESS_CONSULTANT_PROMPT),
+            MessagesPlaceholder(variable_name="chat_history"),
+            ("human", "{input}"),
+        ])
+        return prompt | self.llm
+
+    def _route(self, session, user_message):
+        decision = self.router.route(user_message, has_history=bool(session.messages or session.summarized_count))
+        record("route", route=decision.route, reason=decision.reason)
+        return decision.route
+
     def _search_similar_conversations(self, query: str) -> List[Dict[str, Any]]:
         """Search for similar conversations using embeddings"""
         query_embedding = get_embedding(query)
@@ -114,6 +169,26 @@ class ConversationalAgent:
         
         return response.data if response.data else []
 
+    async def _asearch_similar_conversations(self, query: str) -> List[Dict[str, Any]]:
+        """Async variant of _search_similar_conversations used by the agent"""
+        turn = current_turn.get() or {}
+        with span("tool.search_similar_conversations"):
+            query_embedding = await aget_embedding(query)
+            rows = await self.retriever.retrieve(
+                query,
+                user_id=turn.get("user_id"),
+                jwt_token=turn.get("jwt_token"),
+                query_embedding=query_embedding
+            )
+        return [
+            {key: row.get(key) for key in ("content", "role", "session_id", "similarity")}
+            for row in rows
+        ]
+
+    def _index_embedding(self, row_id, embedding, meta):
+        if meta:
+            self.vector_search.add(meta.get("user_id"), row_id, embedding, meta)
+
     def _get_business_metrics(self, metric_type: str) -> Dict[str, Any]:
         """Example tool for retrieving business metrics"""
         # This is a placeholder - implement actual metric retrieval logic
@@ -123,47 +198,52 @@ class ConversationalAgent:
             "timestamp": "2024-03-20T12:00:00Z"
         }
 
+    async def _aget_business_metrics(self, metric_type: str) -> Dict[str, Any]:
+        with span("tool.get_business_metrics"):
+            return self._get_business_metrics(metric_type)
+
     def get_or_create_session_id(self, session_id=None):
         if session_id:
             return session_id
         return str(uuid.uuid4())
 
     async def _rest_insert_conversation(self, insert_data, jwt_token):
-        url = f"{SUPABASE_URL}/rest/v1/conversations"
-        headers = {
-            "apikey": SUPABASE_KEY,
-            "Authorization": f"Bearer {jwt_token}",
-            "Content-Type": "application/json",
-            "Prefer": "return=representation"
-        }
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(url, headers=headers, json=insert_data)
-            print("Insert status:", resp.status_code)
-            print("Insert response text:", resp.text)
-            if resp.status_code not in (200, 201):
-                raise Exception(f"Insert failed: {resp.text}")
-            try:
-                return resp.json()
-            except Exception as e:
-                print("Failed to parse JSON response:", e)
-                print("Raw response text:", resp.text)
-                raise
+        resp = await rest_client.post("conversations", insert_data, jwt_token)
+        record("rest", method="POST", table="conversations", status=resp.status_code)
+        if resp.status_code not in (200, 201):
+            raise Exception(f"Insert failed: {resp.text}")
+        try:
+            return resp.json()
+        except Exception as e:
+            self.logger.error("Failed to parse insert response (%s): %.500s", e, resp.text)
+            raise
 
-    async def _rest_get_conversation_history(self, session_id, jwt_token):
-        url = f"{SUPABASE_URL}/rest/v1/conversations?select=role,content&session_id=eq.{session_id}&order=id"
-        headers = {
-            "apikey": SUPABASE_KEY,
-            "Authorization": f"Bearer {jwt_token}"
-        }
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url, headers=headers)
-            if resp.status_code != 200:
-                raise Exception(f"Select failed: {resp.text}")
-            data = resp.json()
-            return [(msg["role"], msg["content"]) for msg in data]
+    async def _rest_get_conversation_history(self, session_id, jwt_token, after_id=None, limit=None):
+        params = {"select": "id,role,content", "session_id": f"eq.{session_id}", "order": "id"}
+        if after_id is not None:
+            params["id"] = f"gt.{after_id}"
+        if limit:
+            # Newest rows first so the limit keeps the most recent window
+            params["order"] = "id.desc"
+            params["limit"] = limit
+        resp = await rest_client.get("conversations", jwt_token, params=params)
+        if resp.status_code != 200:
+            raise Exception(f"Select failed: {resp.text}")
+        data = resp.json()
+        if limit:
+            data.reverse()
+        return [{"id": msg["id"], "role": msg["role"], "content": msg["content"]} for msg in data]
+
+    @staticmethod
+    def _row_id(rows):
+        if isinstance(rows, list) and rows:
+            return rows[0].get("id")
+        if isinstance(rows, dict):
+            return rows.get("id")
+        return None
 
     async def log_message(self, session_id, user_id, role, content, jwt_token, title=None, metadata=None, is_archived=False):
-        embedding = get_embedding(content)
+        # The row is inserted without an embedding; the write-behind queue fills it in
         insert_data = {
             "session_id": session_id,
             "user_id": user_id,
@@ -171,83 +251,256 @@ class ConversationalAgent:
             "content": content,
             "title": title or "Business Consultation",
             "metadata": metadata or {},
-            "is_archived": is_archived,
-            "embedding": embedding
+            "is_archived": is_archived
         }
-        await self._rest_insert_conversation(insert_data, jwt_token)
+        with span("log_message"):
+            inserted = await self._rest_insert_conversation(insert_data, jwt_token)
+        row_id = self._row_id(inserted)
+        if row_id is not None:
+            await self.history.append(session_id, user_id, [{"id": row_id, "role": role, "content": content}])
+            await self.embedding_writer.enqueue(row_id, content, jwt_token, meta={
+                "user_id": user_id, "session_id": session_id, "role": role, "content": content
+            })
+        return inserted
 
-    async def get_conversation_history(self, session_id, jwt_token):
-        return await self._rest_get_conversation_history(session_id, jwt_token)
+    async def get_conversation_history(self, session_id, user_id, jwt_token, after_id=None):
+        return await self.history.get_recent(session_id, user_id, jwt_token, after_id=after_id)
 
-    def update_memory(self, history):
-        self.memory.clear()
-        for role, content in history:
-            if role == "user":
-                self.memory.chat_memory.add_user_message(content)
+    def update_memory(self, session, history):
+        """Apply only the messages newer than the session's cursor."""
+        for msg in history:
+            if session.cursor is not None and msg["id"] <= session.cursor:
+                continue
+            if msg["role"] == "user":
+                session.memory.chat_memory.add_user_message(msg["content"])
             else:
-                self.memory.chat_memory.add_ai_message(content)
+                session.memory.chat_memory.add_ai_message(msg["content"])
+            session.cursor = msg["id"]
 
     async def _rest_update_conversation(self, row_id, update_data, jwt_token):
-        url = f"{SUPABASE_URL}/rest/v1/conversations?id=eq.{row_id}"
-        headers = {
-            "apikey": SUPABASE_KEY,
-            "Authorization": f"Bearer {jwt_token}",
-            "Content-Type": "application/json",
-            "Prefer": "return=representation"
-        }
-        async with httpx.AsyncClient() as client:
-            resp = await client.patch(url, headers=headers, json=update_data)
-            print("Update status:", resp.status_code)
-            print("Update response text:", resp.text)
-            if resp.status_code not in (200, 201):
-                raise Exception(f"Update failed: {resp.text}")
-            try:
-                return resp.json()
-            except Exception as e:
-                print("Failed to parse JSON response:", e)
-                print("Raw response text:", resp.text)
-                raise
+        resp = await rest_client.patch("conversations", update_data, jwt_token, params={"id": f"eq.{row_id}"})
+        record("rest", method="PATCH", table="conversations", status=resp.status_code)
+        if resp.status_code not in (200, 201):
+            raise Exception(f"Update failed: {resp.text}")
+        try:
+            return resp.json()
+        except Exception as e:
+            self.logger.error("Failed to parse update response (%s): %.500s", e, resp.text)
+            raise
 
-    async def run(self, user_message, user_id, session_id=None, jwt_token=None):
-        self.logger.info("[run] Start: user_id=%s, session_id=%s", user_id, session_id)
-        session_id = self.get_or_create_session_id(session_id)
-        # Log user message
-        await self.log_message(session_id, user_id, "user", user_message, jwt_token)
-        # Retrieve conversation history
-        history = await self.get_conversation_history(session_id, jwt_token)
-        # Update Redis short-term memory
-        redis_memory.set_memory(f"session:{session_id}:last_user_message", user_message, expire=3600)
-        # Update LangChain memory
-        self.update_memory(history)
-        # Insert assistant row with status 'pending' and empty content
-        pending_assistant_data = {
-            "session_id": session_id,
-            "user_id": user_id,
-            "role": "assistant",
-            "content": "",
-            "title": "Business Consultation",
-            "metadata": {},
-            "is_archived": False,
-            "embedding": [0.0] * EMBEDDING_DIM,
-            "status": "pending"
-        }
-        pending_row = await self._rest_insert_conversation(pending_assistant_data, jwt_token)
-        assistant_row_id = None
-        if isinstance(pending_row, list) and pending_row:
-            assistant_row_id = pending_row[0].get("id")
-        elif isinstance(pending_row, dict):
-            assistant_row_id = pending_row.get("id")
-        # Generate agent reply using the agent executor
-        agent_reply = self.agent.invoke({"input": user_message})["output"]
-        # Update the assistant row with the reply and status 'complete'
+    async def _start_turn(self, session, user_message, user_id, jwt_token):
+        """
+        Bring the session's memory up to date, log the user message and insert
+        the pending assistant row. Both rows go out in one bulk insert, issued
+        concurrently with the history select on a cache miss (or together with
+        it when the turn RPC is configured).
+        """
+        session_id = session.session_id
+        with span("history_fetch"):
+            history = await self.history.get_cached(session_id, user_id, after_id=session.cursor)
+        if history is not None:
+            with span("log_turn"):
+                user_row_id, assistant_row_id, _ = await self.store.start_turn(session_id, user_id, user_message, jwt_token)
+        elif self.store.turn_rpc:
+            with span("log_turn"):
+                user_row_id, assistant_row_id, history = await self.store.start_turn(
+                    session_id, user_id, user_message, jwt_token,
+                    history_after=session.cursor, history_limit=self.history.window
+                )
+            history = history or []
+            if session.cursor is None:
+                await self.history.seed(session_id, user_id, history)
+        else:
+            with span("log_turn"):
+                history, (user_row_id, assistant_row_id, _) = await asyncio.gather(
+                    self.history.load(session_id, user_id, jwt_token, after_id=session.cursor),
+                    self.store.start_turn(session_id, user_id, user_message, jwt_token),
+                )
+            # The concurrent select may already see this turn's rows
+            if user_row_id is not None:
+                history = [m for m in history if m["id"] < user_row_id]
+            if session.cursor is None:
+                await self.history.seed(session_id, user_id, history)
+        self.update_memory(session, history)
+        if user_row_id is not None:
+            await self.history.append(session_id, user_id, [{"id": user_row_id, "role": "user", "content": user_message}])
+            await self.embedding_writer.enqueue(user_row_id, user_message, jwt_token, meta={
+                "user_id": user_id, "session_id": session_id, "role": "user", "content": user_message
+            })
+        return assistant_row_id
+
+    async def import_conversations(self, rows, jwt_token, embed=True):
+        """
+        Bulk-load conversation rows (dicts with session_id, user_id, role,
+        content and optional created_at), oldest first. Embeddings
+        are queued for the imported rows unless ``embed`` is False.
+        """
+        rows = [
+            dict({"title": "Business Consultation", "metadata": {}, "is_archived": False}, **row)
+            for row in rows
+        ]
+        inserted = await self.store.bulk_import(rows, jwt_token, select="id,session_id,user_id,role,content")
+        by_session = {}
+        for row in inserted:
+            by_session.setdefault((row["session_id"], row["user_id"]), []).append(
+                {"id": row["id"], "role": row["role"], "content": row["content"]}
+            )
+            if embed and row.get("content"):
+                await self.embedding_writer.enqueue(row["id"], row["content"], jwt_token, meta={
+                    "user_id": row["user_id"], "session_id": row["session_id"], "role": row["role"], "content": row["content"]
+                })
+        for (session_id, user_id), messages in by_session.items():
+            await self.history.append(session_id, user_id, messages)
+        return inserted
+
+    async def _finish_turn(self, session_id, user_id, assistant_row_id, agent_reply, jwt_token, status="complete", user_message=None):
+        """Update the assistant row with the reply, queue its embedding and update short-term memory."""
         if assistant_row_id:
             update_data = {
                 "content": agent_reply,
-                "embedding": get_embedding(agent_reply),
-                "status": "complete"
+                "status": status
             }
             await self._rest_update_conversation(assistant_row_id, update_data, jwt_token)
-        # Update Redis with agent reply
-        redis_memory.set_memory(f"session:{session_id}:last_agent_reply", agent_reply, expire=3600)
+            if status == "complete":
+                await self.embedding_writer.enqueue(assistant_row_id, agent_reply, jwt_token, meta={
+                    "user_id": user_id, "session_id": session_id, "role": "assistant", "content": agent_reply
+                })
+        # Update Redis short-term memory with both sides of the turn in one pipeline
+        last_turn = {f"session:{session_id}:last_agent_reply": agent_reply}
+        if user_message is not None:
+            last_turn[f"session:{session_id}:last_user_message"] = user_message
+        await redis_memory.set_many(last_turn, expire=3600)
+
+    def _finish_turn_later(self, *args, **kwargs):
+        task = asyncio.create_task(self._finish_turn(*args, **kwargs))
+        self._pending_finalizers.add(task)
+        task.add_done_callback(self._on_finalized)
+
+    def _on_finalized(self, task):
+        self._pending_finalizers.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.error("[run_stream] Finalizing assistant row failed: %s", task.exception())
+
+    async def drain_finalizers(self):
+        """Wait for assistant rows still being finalized after a streamed reply."""
+        if self._pending_finalizers:
+            await asyncio.gather(*list(self._pending_finalizers), return_exceptions=True)
+
+    async def _cached_reply(self, user_id, user_message, chat_history):
+        """Look the turn up in the response cache; returns ``(fingerprint, hit or None)``."""
+        if not self.response_cache.enabled:
+            return None, None
+        # Excerpts are picked per query; keying on them would split paraphrases of one question
+        fingerprint = context_fingerprint(stable_context(chat_history), self.llm.model_name)
+        with span("response_cache"):
+            cached = await self.response_cache.get(user_id, user_message, fingerprint)
+        if cached is not None:
+            record("response_cache", tier=cached["tier"], similarity=cached["similarity"])
+        return fingerprint, cached
+
+    async def run(self, user_message, user_id, session_id=None, jwt_token=None):
+        self.logger.info("[run] Start: user_id=%s, session_id=%s", user_id, session_id)
+        session_id = self.get_or_create_session_id(session_id)
+        current_turn.set({"user_id": user_id, "jwt_token": jwt_token, "session_id": session_id})
+        async with self.sessions.session(session_id, user_id) as session:
+            assistant_row_id = await self._start_turn(session, user_message, user_id, jwt_token)
+            # Generate agent reply using the shared agent executor and this session's
+            # history, trimmed to the token budget
+            with span("context_build"):
+                chat_history, context_stats = await self.context_builder.build(session, user_message)
+            record("context", **context_stats)
+            fingerprint, cached = await self._cached_reply(user_id, user_message, chat_history)
+            route = self._route(session, user_message) if cached is None else "cached"
+            if cached is not None:
+                agent_reply = cached["reply"]
+            elif route == "direct":
+                with span("direct_invoke"):
+                    message = await self.direct_chain.ainvoke({"input": user_message, "chat_history": chat_history}, config=trace_callbacks())
+                agent_reply = message.content
+                if fingerprint is not None:
+                    await self.response_cache.set(user_id, user_message, fingerprint, agent_reply)
+            else:
+                with span("agent_invoke"):
+                    result = await self.agent.ainvoke({"input": user_message, "chat_history": chat_history}, config=trace_callbacks())
+                agent_reply = result["output"]
+                if fingerprint is not None:
+                    await self.response_cache.set(
+                        user_id, user_message, fingerprint, agent_reply, used_tools=bool(result.get("intermediate_steps"))
+                    )
+            if assistant_row_id:
+                await self.history.append(session_id, user_id, [{"id": assistant_row_id, "role": "assistant", "content": agent_reply}])
+            with span("finish_turn"):
+                await self._finish_turn(session_id, user_id, assistant_row_id, agent_reply, jwt_token, user_message=user_message)
         self.logger.info("[run] End: user_id=%s, session_id=%s", user_id, session_id)
-        return {"reply": agent_reply, "session_id": session_id} 
\ No newline at end of file
+        return {"reply": agent_reply, "session_id": session_id, "context": context_stats, "cached": bool(cached), "route": route}
+
+    async def run_stream(self, user_message, user_id, session_id=None, jwt_token=None):
+        """
+        Like ``run``, but yield ``(event, data)`` pairs while the reply is generated:
+        ``session``, ``tool_start``, ``tool_end``, ``token`` and finally ``done``.
+        The assistant row is finalized in the background once the reply is complete.
+        """
+        self.logger.info("[run_stream] Start: user_id=%s, session_id=%s", user_id, session_id)
+        session_id = self.get_or_create_session_id(session_id)
+        current_turn.set({"user_id": user_id, "jwt_token": jwt_token, "session_id": session_id})
+        async with self.sessions.session(session_id, user_id) as session:
+            yield "session", {"session_id": session_id}
+            assistant_row_id = await self._start_turn(session, user_message, user_id, jwt_token)
+            with span("context_build"):
+                chat_history, context_stats = await self.context_builder.build(session, user_message)
+            fingerprint, cached = await self._cached_reply(user_id, user_message, chat_history)
+            route = self._route(session, user_message) if cached is None else "cached"
+            tokens = []
+            agent_reply = cached["reply"] if cached is not None else None
+            used_tools = False
+            stream_start = time.perf_counter()
+            try:
+                if cached is not None:
+                    tokens.append(agent_reply)
+                    yield "token", {"text": agent_reply}
+                elif route == "direct":
+                    async for chunk in self.direct_chain.astream(
+                        {"input": user_message, "chat_history": chat_history}, config=trace_callbacks()
+                    ):
+                        if chunk.content:
+                            tokens.append(chunk.content)
+                            yield "token", {"text": chunk.content}
+                else:
+                    async for event in self.agent.astream_events(
+                        {"input": user_message, "chat_history": chat_history}, config=trace_callbacks(), version="v2"
+                    ):
+                        kind = event["event"]
+                        if kind == "on_chat_model_stream":
+                            text = event["data"]["chunk"].content
+                            if text:
+                                tokens.append(text)
+                                yield "token", {"text": text}
+                        elif kind == "on_tool_start":
+                            used_tools = True
+                            yield "tool_start", {"tool": event["name"], "input": event["data"].get("input")}
+                        elif kind == "on_tool_end":
+                            yield "tool_end", {"tool": event["name"]}
+                        elif kind == "on_chain_end" and event["name"] == "AgentExecutor":
+                            agent_reply = event["data"]["output"]["output"]
+            except BaseException:
+                # Client went away or the agent failed: keep what was generated
+                self._finish_turn_later(
+                    session_id, user_id, assistant_row_id, "".join(tokens), jwt_token, status="failed", user_message=user_message
+                )
+                raise
+            if cached is None:
+                # Includes time the client took to read the stream
+                observe(f"{route}_stream", time.perf_counter() - stream_start)
+                if agent_reply is None:
+                    agent_reply = "".join(tokens)
+                if fingerprint is not None:
+                    await self.response_cache.set(user_id, user_message, fingerprint, agent_reply, used_tools=used_tools)
+            # History is appended while the session lock is held so the next turn sees the reply
+            if assistant_row_id:
+                await self.history.append(session_id, user_id, [{"id": assistant_row_id, "role": "assistant", "content": agent_reply}])
+            self._finish_turn_later(session_id, user_id, assistant_row_id, agent_reply, jwt_token, user_message=user_message)
+        self.logger.info("[run_stream] End: user_id=%s, session_id=%s", user_id, session_id)
+        yield "done", {
+            "reply": agent_reply, "session_id": session_id, "context": context_stats, "cached": bool(cached), "route": route
+        }
+
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import logging
+import unicodedata
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.agents.memory import async_memory
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join(unicodedata.normalize("NFC", value or "").split()).casefold()
+
+
+# Report sources whose results do not depend on the requesting user's documents
+SHARED_REPORT_SOURCES = {"web"}
+
+
+def research_cache_key(
+    task: str,
+    report_type: str,
+    report_source: str,
+    tone: str,
+    headers: Optional[Dict[str, Any]] = None,
+    user_id: Optional[str] = None,
+) -> str:
+    """
+    Key identical research requests alike, ignoring case and whitespace
+    differences. Web research is shared across users; reports built from
+    other sources (local documents, hybrid, ...) are keyed per ``user_id``.
+    """
+    payload = {
+        "task": _normalize(task),
+        "report_type": _normalize(report_type),
+        "report_source": _normalize(report_source),
+        "tone": _normalize(tone),
+        # Research options such as depth change the report, so they are part of the key
+        "headers": headers or {},
+    }
+    if _normalize(report_source) not in SHARED_REPORT_SOURCES:
+        payload["user_id"] = user_id
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class ResearchResultCache:
+    """Completed research reports in Redis, keyed by ``research_cache_key`` and kept for ``ttl`` seconds."""
+
+    def __init__(self, redis=None, ttl: Optional[int] = None, enabled: Optional[bool] = None):
+        self.redis = redis or async_memory
+        self.ttl = ttl or settings.research_cache_ttl
+        self.enabled = settings.research_cache_enabled if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(cache_key: str) -> str:
+        return f"research:result:{cache_key}"
+
+    async def get(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return ``{"metadata", "results"}`` of a cached report, or None."""
+        if not self.enabled or not cache_key:
+            return None
+        cached = await self.redis.get_memory(self.key(cache_key))
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached
+
+    async def set(self, cache_key: Optional[str], metadata, results: str) -> bool:
+        if not self.enabled or not cache_key or not results:
+            return False
+        return await self.redis.set_memory(self.key(cache_key), {"metadata": metadata, "results": results}, expire=self.ttl)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# Create a singleton instance
+research_cache = ResearchResultCache()
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResearchQueueFull(Exception):
+    """Raised when a user already has the maximum number of queued research jobs."""
+
+
+@dataclass
+class ResearchJob:
+    research_id: str
+    user_id: str
+    params: Dict[str, Any]
+    status: str = "queued"  # queued, running, completed, timeout, failed, cancelled
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    result_length: int = 0
+    # Set when this job is attached to an identical job already in flight (not exposed to clients)
+    leader_id: Optional[str] = None
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    # Messages received from the researcher, addressable by offset for resuming clients
+    events: List[Dict[str, Any]] = field(default_factory=list, repr=False)
+    first_offset: int = 0
+    max_events: int = field(default_factory=lambda: settings.research_event_log_size, repr=False)
+    _changed: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status not in ("queued", "running")
+
+    @property
+    def next_offset(self) -> int:
+        return self.first_offset + len(self.events)
+
+    def publish(self, event: Dict[str, Any]):
+        """Append an event to the job's log and wake followers."""
+        self.events.append(event)
+        if len(self.events) > self.max_events:
+            drop = len(self.events) - self.max_events
+            del self.events[:drop]
+            self.first_offset += drop
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def restart(self, status: str):
+        """Drop the events relayed so far (resuming clients skip past them) and announce a restart."""
+        self.first_offset = self.next_offset
+        self.events = []
+        self.status = status
+        self.publish({"type": "status", "status": status, "restarted": True})
+
+    async def follow(self, offset: int = 0, heartbeat: Optional[float] = None) -> AsyncIterator[Tuple[Optional[int], Optional[Dict[str, Any]]]]:
+        """
+        Yield ``(offset, event)`` from ``offset`` on, waiting for new events until
+        the job is done. Offsets that were already trimmed resume at the oldest
+        kept event. With ``heartbeat``, ``(None, None)`` is yielded when nothing
+        arrived for that many seconds.
+        """
+        while True:
+            offset = max(offset, self.first_offset)
+            while offset < self.next_offset:
+                yield offset, self.events[offset - self.first_offset]
+                offset += 1
+            if self.done:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None, None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "research_id": self.research_id,
+            "status": self.status,
+            "topic": self.params.get("topic"),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "result_length": self.result_length,
+        }
+
+
+class ResearchJobManager:
+    """
+    Schedule research jobs with bounded concurrency and per-user fairness.
+
+    ``submit`` returns a job (and its research_id) immediately. At most
+    ``max_concurrent`` jobs run at once; queued jobs are started round-robin
+    across users so one user's backlog cannot starve everyone else. Job status
+    is kept in memory, including the last ``history_size`` finished jobs.
+
+    Jobs submitted with the same ``cache_key`` as a queued or running job are
+    handed to ``follow`` with that leader instead of being run again; followers
+    do not take a concurrency slot. Cancelling a leader does not cancel its
+    followers: the oldest one is queued to run the research itself, the others
+    are attached to it, and all of them publish a ``restarted`` status event.
+    """
+
+    def __init__(
+        self,
+        run: Callable[..., Awaitable[Dict[str, Any]]],
+        follow: Optional[Callable[..., Awaitable[Dict[str, Any]]]] = None,
+        max_concurrent: Optional[int] = None,
+        max_queued_per_user: Optional[int] = None,
+        history_size: Optional[int] = None,
+    ):
+        self.run = run
+        self.follow = follow
+        self.max_concurrent = max_concurrent or settings.research_max_concurrent
+        self.max_queued_per_user = max_queued_per_user or settings.research_max_queued_per_user
+        self.history_size = history_size or settings.research_job_history
+        self.jobs: "OrderedDict[str, ResearchJob]" = OrderedDict()
+        # user_id -> queued jobs; dict order is the round-robin order
+        self._queues: "OrderedDict[str, Deque[ResearchJob]]" = OrderedDict()
+        self._running = 0
+        # cache_key -> the job actually doing that research
+        self._leaders: Dict[str, ResearchJob] = {}
+        self._closing = False
+
+    def submit(self, user_id: str, **params) -> ResearchJob:
+        cache_key = params.get("cache_key")
+        leader = self._leaders.get(cache_key) if cache_key and self.follow else None
+        if leader is not None:
+            return self._attach(user_id, leader, params)
+        queue = self._queues.get(user_id)
+        if queue is not None and len(queue) >= self.max_queued_per_user:
+            raise ResearchQueueFull(f"User {user_id} already has {len(queue)} research jobs queued")
+        job = ResearchJob(research_id=str(uuid.uuid4()), user_id=user_id, params=params)
+        self.jobs[job.research_id] = job
+        self._queues.setdefault(user_id, deque()).append(job)
+        if cache_key:
+            self._leaders[cache_key] = job
+        self._dispatch()
+        return job
+
+    def _attach(self, user_id: str, leader: ResearchJob, params: Dict[str, Any]) -> ResearchJob:
+        job = ResearchJob(research_id=str(uuid.uuid4()), user_id=user_id, params=params, leader_id=leader.research_id)
+        self.jobs[job.research_id] = job
+        job.status = "running"
+        job.started_at = time.time()
+        job.publish({"type": "status", "status": job.status})
+        self._start_following(job, leader)
+        return job
+
+    def _start_following(self, job: ResearchJob, leader: ResearchJob):
+        job.leader_id = leader.research_id
+        job.task = asyncio.create_task(
+            self.follow(leader, research_id=job.research_id, user_id=job.user_id, on_event=job.publish, **job.params)
+        )
+        job.task.add_done_callback(lambda task, job=job: self._on_done(job, task))
+
+    def _followers(self, leader: ResearchJob) -> List[ResearchJob]:
+        return [j for j in self.jobs.values() if j.leader_id == leader.research_id and not j.done]
+
+    def _detach(self, job: ResearchJob):
+        """Stop a follower's relay task without finishing the job (``_on_done`` ignores tasks it no longer owns)."""
+        task, job.task = job.task, None
+        if task is not None:
+            task.cancel()
+
+    def _promote(self, leader: ResearchJob, followers: List[ResearchJob]):
+        """Hand a cancelled leader's research over to its oldest follower."""
+        successor, others = followers[0], followers[1:]
+        self._detach(successor)
+        successor.leader_id = None
+        successor.restart("queued")
+        self._queues.setdefault(successor.user_id, deque()).append(successor)
+        cache_key = leader.params.get("cache_key")
+        if cache_key:
+            self._leaders[cache_key] = successor
+        for job in others:
+            self._detach(job)
+            job.restart("running")
+            self._start_following(job, successor)
+        logger.info("[ResearchJobManager] Research job %s cancelled; %s takes over for %d followers",
+                    leader.research_id, successor.research_id, len(others))
+
+    def get(self, research_id: str) -> Optional[ResearchJob]:
+        return self.jobs.get(research_id)
+
+    def cancel(self, research_id: str) -> bool:
+        job = self.jobs.get(research_id)
+        if job is None or job.done:
+            return False
+        followers = self._followers(job) if job.leader_id is None and not self._closing else []
+        if followers:
+            self._promote(job, followers)
+        if job.status == "queued":
+            queue = self._queues.get(job.user_id)
+            if queue is not None:
+                queue.remove(job)
+                if not queue:
+                    del self._queues[job.user_id]
+            self._finish(job, "cancelled")
+        else:
+            job.task.cancel()
+        self._dispatch()
+        return True
+
+    def _next_job(self) -> Optional[ResearchJob]:
+        if not self._queues:
+            return None
+        user_id, queue = self._queues.popitem(last=False)
+        job = queue.popleft()
+        if queue:
+            # Back of the line for this user's next job
+            self._queues[user_id] = queue
+        return job
+
+    def _dispatch(self):
+        while self._running < self.max_concurrent:
+            job = self._next_job()
+            if job is None:
+                return
+            self._running += 1
+            job.status = "running"
+            job.started_at = time.time()
+            job.publish({"type": "status", "status": job.status})
+            job.task = asyncio.create_task(
+                self.run(research_id=job.research_id, user_id=job.user_id, on_event=job.publish, **job.params)
+            )
+            # Bookkeeping lives in the callback so it also runs for tasks cancelled before they started
+            job.task.add_done_callback(lambda task, job=job: self._on_done(job, task))
+
+    def _on_done(self, job: ResearchJob, task: asyncio.Task):
+        if task is not job.task:
+            # A follower's relay task that was replaced when its leader was cancelled
+            return
+        if job.leader_id is None:
+            self._running -= 1
+        if task.cancelled():
+            self._finish(job, "cancelled")
+        elif task.exception() is not None:
+            logger.error("[ResearchJobManager] Research job %s failed: %s", job.research_id, task.exception())
+            self._finish(job, "failed", str(task.exception()))
+        else:
+            result = task.result() or {}
+            job.result_length = len(result.get("results") or "")
+            self._finish(job, result.get("status", "completed"))
+        self._dispatch()
+
+    def _finish(self, job: ResearchJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        job.task = None
+        cache_key = job.params.get("cache_key")
+        if cache_key and self._leaders.get(cache_key) is job:
+            del self._leaders[cache_key]
+        job.publish({"type": "status", "status": status, "error": error})
+        # Forget the oldest finished jobs beyond the history size
+        finished = [rid for rid, j in self.jobs.items() if j.done]
+        for rid in finished[: max(0, len(finished) - self.history_size)]:
+            del self.jobs[rid]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "running": self._running,
+            "queued": sum(len(q) for q in self._queues.values()),
+            "attached": sum(1 for j in self.jobs.values() if j.leader_id and not j.done),
+            "tracked": len(self.jobs),
+        }
+
+    async def aclose(self):
+        """Cancel queued and running jobs; running jobs still flush what they received."""
+        self._closing = True
+        for research_id in list(self.jobs):
+            job = self.jobs.get(research_id)
+            if job is not None and job.status == "queued":
+                self.cancel(research_id)
+        tasks = [job.task for job in self.jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,138 @@
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.supabase_integration.rest import rest_client
+
+logger = logging.getLogger(__name__)
+
+# Expected layout of the chunk table (one row per flush, ordered by seq):
+#
+#   create table research_chunks (
+#       research_id uuid references research_history(id) on delete cascade,
+#       seq integer not null,
+#       content text not null,
+#       created_at timestamptz default now(),
+#       primary key (research_id, seq)
+#   );
+
+
+class BufferedResearchWriter:
+    """
+    Buffer report chunks and metadata of one research run and persist them in batches.
+
+    Chunks are flushed once ``flush_bytes`` characters are pending or
+    ``flush_interval`` seconds have passed since the last flush. Each flush
+    appends the pending text as one row of ``chunk_table``, so every byte is
+    sent once; the full report is written to ``research_history.results`` only
+    on the final flush. Without a chunk table (or if inserting into it fails)
+    the writer falls back to rewriting ``results`` at most once per flush.
+    Writes go through the pooled PostgREST client with the user's JWT.
+    """
+
+    def __init__(
+        self,
+        research_id: str,
+        jwt_token: Optional[str],
+        rest=None,
+        table: str = "research_history",
+        chunk_table: Optional[str] = None,
+        flush_interval: Optional[float] = None,
+        flush_bytes: Optional[int] = None,
+    ):
+        self.rest = rest or rest_client
+        self.research_id = research_id
+        self.jwt_token = jwt_token
+        self.table = table
+        self.chunk_table = settings.research_chunk_table if chunk_table is None else chunk_table
+        self.flush_interval = settings.research_flush_interval if flush_interval is None else flush_interval
+        self.flush_bytes = flush_bytes or settings.research_flush_bytes
+        self.metadata: List[Any] = []
+        self._parts: List[str] = []
+        self._length = 0
+        self._pending: List[str] = []
+        self._pending_bytes = 0
+        self._seq = 0
+        self._synced_length = 0
+        self._metadata_dirty = False
+        self._last_flush = time.monotonic()
+        self.flushes = 0
+        self.bytes_sent = 0
+
+    @property
+    def results(self) -> str:
+        return "".join(self._parts)
+
+    def __len__(self) -> int:
+        return self._length
+
+    async def add_chunk(self, text: str):
+        if not text:
+            return
+        self._parts.append(text)
+        self._length += len(text)
+        self._pending.append(text)
+        self._pending_bytes += len(text)
+        await self._maybe_flush()
+
+    async def add_metadata(self, item: Any):
+        self.metadata.append(item)
+        self._metadata_dirty = True
+        await self._maybe_flush()
+
+    async def _maybe_flush(self):
+        due = time.monotonic() - self._last_flush >= self.flush_interval
+        if self._pending_bytes >= self.flush_bytes or (due and (self._pending or self._metadata_dirty)):
+            await self.flush()
+
+    async def _write(self, method: str, path: str, payload: Dict[str, Any], params=None):
+        resp = await self.rest.request(method, path, self.jwt_token, params=params, json=payload, prefer="return=minimal")
+        if resp.status_code >= 400:
+            raise Exception(f"{method} {path} failed ({resp.status_code}): {resp.text}")
+
+    async def _append_chunk_row(self, content: str) -> bool:
+        try:
+            await self._write("POST", self.chunk_table, {
+                "research_id": self.research_id,
+                "seq": self._seq,
+                "content": content,
+            })
+        except Exception as e:
+            logger.warning("[ResearchWriter] Chunk insert into %s failed, rewriting results instead: %s", self.chunk_table, e)
+            self.chunk_table = ""
+            return False
+        self._seq += 1
+        self.bytes_sent += len(content)
+        return True
+
+    async def flush(self, final: bool = False):
+        """Persist everything pending; ``final`` also writes the complete report to the parent row."""
+        self._last_flush = time.monotonic()
+        if self._pending:
+            content = "".join(self._pending)
+            self._pending, self._pending_bytes = [], 0
+            if self.chunk_table:
+                # On failure chunk_table is cleared and results are rewritten below
+                await self._append_chunk_row(content)
+        update: Dict[str, Any] = {}
+        if self._length != self._synced_length and (final or not self.chunk_table):
+            update["results"] = "".join(self._parts)
+        if self._metadata_dirty:
+            update["metadata"] = list(self.metadata)
+        if not update:
+            return
+        try:
+            await self._write("PATCH", self.table, update, params={"id": f"eq.{self.research_id}"})
+        except Exception as e:
+            # Keep the dirty state so the next flush retries
+            logger.error("[ResearchWriter] Failed to update %s %s: %s", self.table, self.research_id, e)
+            return
+        if "results" in update:
+            self._synced_length = self._length
+            self.bytes_sent += len(update["results"])
+        self._metadata_dirty = False
+        self.flushes += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {"length": self._length, "flushes": self.flushes, "bytes_sent": self.bytes_sent, "chunks": self._seq}
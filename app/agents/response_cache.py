@@ -0,0 +1,169 @@
+import hashlib
+import logging
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import settings
+from app.agents.memory import async_memory
+from app.agents.utilities.embedding_service import embedding_service
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_LOOKUPS = registry.counter("fridday_response_cache_total", "Response cache lookups by outcome", ["result"])
+
+
+def normalize_prompt(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFC", text or "").split()).casefold().rstrip("?!. ")
+
+
+def context_fingerprint(messages: Sequence[Any], model: str = "") -> str:
+    """Hash of the model and the chat history the prompt is answered in."""
+    digest = hashlib.sha256(model.encode("utf-8"))
+    for message in messages:
+        role = getattr(message, "type", None) or (message.get("role") if isinstance(message, dict) else "")
+        content = getattr(message, "content", None)
+        if content is None and isinstance(message, dict):
+            content = message.get("content")
+        digest.update(f"\x00{role}\x01{content}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class _SemanticBucket:
+    """Normalized prompt embeddings and replies cached under one scope and context."""
+
+    def __init__(self):
+        self.vectors: List[np.ndarray] = []
+        self.replies: List[str] = []
+        self.expires: List[float] = []
+
+    def add(self, vector: np.ndarray, reply: str, expires_at: float, max_entries: int):
+        self.vectors.append(vector)
+        self.replies.append(reply)
+        self.expires.append(expires_at)
+        if len(self.vectors) > max_entries:
+            del self.vectors[0], self.replies[0], self.expires[0]
+
+    def best(self, vector: np.ndarray, now: float):
+        live = [i for i, expires_at in enumerate(self.expires) if expires_at > now]
+        if len(live) != len(self.expires):
+            self.vectors = [self.vectors[i] for i in live]
+            self.replies = [self.replies[i] for i in live]
+            self.expires = [self.expires[i] for i in live]
+        if not self.vectors:
+            return None, 0.0
+        scores = np.vstack(self.vectors) @ vector
+        best = int(np.argmax(scores))
+        return self.replies[best], float(scores[best])
+
+
+class ResponseCache:
+    """
+    Agent replies cached by prompt and conversation context.
+
+    The exact tier keys Redis on the normalized prompt plus a fingerprint of
+    the model and chat history. On a miss, the semantic tier compares the
+    prompt's embedding (the same one the embedding writer stores, so it is
+    usually already cached) with earlier prompts asked in the same context
+    and returns the closest reply above ``threshold``. Entries are scoped per
+    user unless ``scope`` is ``global``; in global scope replies that used
+    tools are not stored, since tool results are user-specific. The semantic
+    tier lives in process memory.
+    """
+
+    def __init__(
+        self,
+        redis=None,
+        embed: Optional[Callable[[str], Awaitable[List[float]]]] = None,
+        enabled: Optional[bool] = None,
+        ttl: Optional[int] = None,
+        threshold: Optional[float] = None,
+        scope: Optional[str] = None,
+        max_buckets: int = 10000,
+        max_entries_per_bucket: int = 64,
+    ):
+        self.redis = redis or async_memory
+        self.embed = embed or embedding_service.embed
+        self.enabled = settings.response_cache_enabled if enabled is None else enabled
+        self.ttl = ttl or settings.response_cache_ttl
+        self.threshold = settings.response_cache_threshold if threshold is None else threshold
+        self.scope = scope or settings.response_cache_scope
+        self.max_buckets = max_buckets
+        self.max_entries_per_bucket = max_entries_per_bucket
+        self._buckets: "OrderedDict[str, _SemanticBucket]" = OrderedDict()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def _scope(self, user_id) -> str:
+        return "global" if self.scope == "global" else f"user:{user_id}"
+
+    def _exact_key(self, scope: str, fingerprint: str, prompt: str) -> str:
+        digest = hashlib.sha256(f"{scope}\x00{fingerprint}\x00{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+        return f"response:exact:{digest}"
+
+    async def _vector(self, prompt: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(await self.embed(prompt), dtype=np.float32)
+        except Exception as e:
+            logger.warning("[ResponseCache] Embedding failed, skipping semantic tier: %s", e)
+            return None
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    async def get(self, user_id, prompt: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """Return ``{"reply", "tier", "similarity"}`` for a cached answer, or None."""
+        if not self.enabled:
+            return None
+        scope = self._scope(user_id)
+        cached = await self.redis.get_memory(self._exact_key(scope, fingerprint, prompt))
+        if cached is not None:
+            self.exact_hits += 1
+            RESPONSE_CACHE_LOOKUPS.inc(result="exact_hit")
+            return {"reply": cached["reply"], "tier": "exact", "similarity": 1.0}
+        bucket = self._buckets.get(f"{scope}:{fingerprint}")
+        if bucket is not None and self.threshold < 1.0:
+            vector = await self._vector(prompt)
+            if vector is not None:
+                reply, similarity = bucket.best(vector, time.time())
+                if reply is not None and similarity >= self.threshold:
+                    self._buckets.move_to_end(f"{scope}:{fingerprint}")
+                    self.semantic_hits += 1
+                    RESPONSE_CACHE_LOOKUPS.inc(result="semantic_hit")
+                    return {"reply": reply, "tier": "semantic", "similarity": similarity}
+        self.misses += 1
+        RESPONSE_CACHE_LOOKUPS.inc(result="miss")
+        return None
+
+    async def set(self, user_id, prompt: str, fingerprint: str, reply: str, used_tools: bool = False) -> bool:
+        if not self.enabled or not reply or (used_tools and self.scope == "global"):
+            return False
+        scope = self._scope(user_id)
+        await self.redis.set_memory(self._exact_key(scope, fingerprint, prompt), {"reply": reply}, expire=self.ttl)
+        if self.threshold < 1.0:
+            vector = await self._vector(prompt)
+            if vector is not None:
+                key = f"{scope}:{fingerprint}"
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = _SemanticBucket()
+                    if len(self._buckets) > self.max_buckets:
+                        self._buckets.popitem(last=False)
+                self._buckets.move_to_end(key)
+                bucket.add(vector, reply, time.time() + self.ttl, self.max_entries_per_bucket)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.semantic_hits
+        total = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "semantic_buckets": len(self._buckets),
+        }
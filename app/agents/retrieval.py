@@ -0,0 +1,132 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.agents.context_builder import count_tokens
+from app.agents.utilities.embedding_service import embedding_service
+from app.agents.vector_index import decode_embedding
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetrievalConfig:
+    """Per-call knobs for ``Retriever.retrieve``; defaults come from settings."""
+    k: int = field(default_factory=lambda: settings.retrieval_k)
+    fetch_k: int = field(default_factory=lambda: settings.retrieval_fetch_k)
+    threshold: float = field(default_factory=lambda: settings.retrieval_threshold)
+    # 1.0 ranks by relevance only; lower values trade relevance for diversity. None disables MMR.
+    mmr_lambda: Optional[float] = field(default_factory=lambda: settings.retrieval_mmr_lambda)
+    max_per_session: Optional[int] = field(default_factory=lambda: settings.retrieval_max_per_session or None)
+    token_budget: Optional[int] = field(default_factory=lambda: settings.retrieval_token_budget or None)
+
+
+def select(query: np.ndarray, vectors: np.ndarray, sessions: List[Any], config: RetrievalConfig) -> List[int]:
+    """
+    Pick up to ``config.k`` candidate indices from ``vectors`` (n x d).
+
+    Relevance and pairwise similarities come from one matrix product over the
+    normalized vectors; MMR then greedily picks the candidate maximizing
+    ``lambda * relevance - (1 - lambda) * max similarity to the picks so far``,
+    skipping candidates whose session already has ``max_per_session`` picks.
+    """
+    n = len(vectors)
+    if n == 0:
+        return []
+    matrix = np.vstack([query[None, :], vectors]).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True) + 1e-12
+    gram = matrix[1:] @ matrix.T  # column 0: relevance, columns 1..n: candidate similarities
+    relevance, similarity = gram[:, 0], gram[:, 1:]
+
+    eligible = relevance >= config.threshold
+    lam = 1.0 if config.mmr_lambda is None else config.mmr_lambda
+    redundancy = np.zeros(n, dtype=np.float32)
+    per_session: Dict[Any, int] = {}
+    picked: List[int] = []
+    while len(picked) < config.k and eligible.any():
+        scores = np.where(eligible, lam * relevance - (1 - lam) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        eligible[best] = False
+        session = sessions[best]
+        if config.max_per_session and session is not None:
+            if per_session.get(session, 0) >= config.max_per_session:
+                continue
+            per_session[session] = per_session.get(session, 0) + 1
+        picked.append(best)
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return picked
+
+
+def trim_to_budget(rows: List[Dict[str, Any]], token_budget: Optional[int]) -> List[Dict[str, Any]]:
+    """Keep rows in rank order, skipping any that would exceed the budget."""
+    if not token_budget:
+        return rows
+    kept, used = [], 0
+    for row in rows:
+        tokens = count_tokens(str(row.get("content", "")))
+        if used + tokens > token_budget:
+            continue
+        kept.append(row)
+        used += tokens
+    return kept
+
+
+class Retriever:
+    """
+    Similar-conversation retrieval with post-processing.
+
+    Over-fetches ``fetch_k`` candidates from the vector search backend, then
+    re-ranks, diversifies (MMR), collapses near-duplicates from the same
+    session and trims the result to a token budget.
+    """
+
+    def __init__(self, search, embed_many: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None):
+        self.search = search
+        self.embed_many = embed_many or embedding_service.embed_many
+
+    async def retrieve(
+        self,
+        query: str,
+        user_id=None,
+        jwt_token=None,
+        config: Optional[RetrievalConfig] = None,
+        query_embedding=None,
+    ) -> List[Dict[str, Any]]:
+        config = config or RetrievalConfig()
+        if query_embedding is None:
+            query_embedding = (await self.embed_many([query]))[0]
+        candidates = await self.search.search(
+            query_embedding, user_id=user_id, jwt_token=jwt_token, k=config.fetch_k, threshold=config.threshold
+        )
+        candidates = [c for c in candidates if c.get("content")]
+        if not candidates:
+            return []
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        picked = select(
+            query_vector,
+            await self._vectors(candidates, len(query_vector)),
+            [c.get("session_id") for c in candidates],
+            config,
+        )
+        rows = trim_to_budget([candidates[i] for i in picked], config.token_budget)
+        logger.info("[Retriever] %d candidates -> %d results", len(candidates), len(rows))
+        return rows
+
+    async def _vectors(self, candidates: List[Dict[str, Any]], dim: int) -> np.ndarray:
+        """
+        The candidates' stored vectors (popped from the rows). Only rows the
+        backend returned without one are embedded again.
+        """
+        vectors: List[Optional[np.ndarray]] = []
+        for candidate in candidates:
+            vector = decode_embedding(candidate.pop("embedding", None))
+            vectors.append(vector if vector is not None and len(vector) == dim else None)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = await self.embed_many([candidates[i]["content"] for i in missing])
+            for i, vector in zip(missing, embedded):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+        return np.vstack(vectors)
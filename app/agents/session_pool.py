@@ -0,0 +1,101 @@
+import asyncio
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from langchain.memory import ConversationBufferMemory
+
+from app.config import settings
+
+
+class SessionState:
+    """Per-session conversation memory plus a lock serializing turns within the session."""
+
+    def __init__(self, session_id: str, user_id: Optional[str] = None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.memory = ConversationBufferMemory(
+            memory_key="chat_history",
+            return_messages=True
+        )
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+        # Id of the newest conversation row applied to memory
+        self.cursor = None
+        # Rolling summary of the summarized_count messages dropped from memory
+        self.summary = ""
+        self.summarized_count = 0
+        self.summarized_tokens = 0
+        # Summarized messages kept for relevant-excerpt retrieval, with their unit vectors
+        self.excerpts = []
+        self.excerpt_vectors = None
+
+    @property
+    def messages(self):
+        return self.memory.chat_memory.messages
+
+
+class SessionMemoryPool:
+    """
+    LRU/TTL-bounded pool of per-session memories, keyed by (user_id, session_id).
+
+    Different sessions never share a memory object, so their turns can run
+    concurrently on one worker; turns within a single session are serialized
+    by that session's lock. The user is part of the key because session ids
+    come from the client: a caller reusing another user's id gets its own,
+    empty state instead of the owner's memory.
+    """
+
+    def __init__(self, max_sessions: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_sessions = max_sessions or settings.session_pool_size
+        self.ttl = ttl or settings.session_ttl
+        self._sessions: "OrderedDict[Tuple[Optional[str], str], SessionState]" = OrderedDict()
+        self.evictions = 0
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in list(self._sessions):
+            state = self._sessions[key]
+            expired = now - state.last_used > self.ttl
+            over_capacity = len(self._sessions) > self.max_sessions
+            if not (expired or over_capacity):
+                break
+            # Never drop a session mid-turn; it is evicted once released
+            if state.lock.locked():
+                continue
+            del self._sessions[key]
+            self.evictions += 1
+
+    def get(self, session_id: str, user_id: Optional[str] = None) -> SessionState:
+        key = (user_id, session_id)
+        state = self._sessions.get(key)
+        if state is None:
+            state = SessionState(session_id, user_id)
+            self._sessions[key] = state
+        else:
+            self._sessions.move_to_end(key)
+        state.last_used = time.monotonic()
+        self._evict()
+        return state
+
+    @asynccontextmanager
+    async def session(self, session_id: str, user_id: Optional[str] = None):
+        """Hold the session's lock for the duration of one turn."""
+        state = self.get(session_id, user_id)
+        async with state.lock:
+            yield state
+        state.last_used = time.monotonic()
+
+    def discard(self, session_id: str, user_id: Optional[str] = None):
+        self._sessions.pop((user_id, session_id), None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "active": sum(1 for state in self._sessions.values() if state.lock.locked()),
+            "evictions": self.evictions,
+        }
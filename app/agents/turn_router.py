@@ -0,0 +1,103 @@
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence
+
+from app.config import settings
+from app.agents.context_builder import count_tokens
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+TURN_ROUTES = registry.counter("fridday_turn_routes_total", "Turns by route and routing reason", ["route", "reason"])
+TOKENS_SAVED = registry.counter("fridday_turn_router_tokens_saved_total", "Tool-schema prompt tokens not sent on direct turns")
+
+# Acknowledgements, greetings and sign-offs, optionally followed by a few words ("thanks, that helps")
+SMALL_TALK = re.compile(
+    r"^(?:thanks?(?: you)?|thx|ty|ok(?:ay)?|k|cool|great|nice|perfect|awesome|got it|sounds good|makes sense|"
+    r"understood|sure|yes|yeah|yep|no|nope|hi|hello|hey|good (?:morning|afternoon|evening)|bye|goodbye|cheers)\b",
+    re.IGNORECASE,
+)
+# Requests that need SearchSimilarConversations (earlier conversations) or GetBusinessMetrics (figures)
+TOOL_HINTS = {
+    "history": re.compile(
+        r"\b(?:last time|previous(?:ly)?|earlier|we (?:discussed|talked|spoke)|you (?:said|mentioned|told)|"
+        r"remember|recall|(?:past|previous|old|earlier|my|our) (?:chats?|conversations?|discussions?|sessions?)|"
+        r"(?:chat|conversation) history|similar (?:question|conversation|case)s?)\b",
+        re.IGNORECASE,
+    ),
+    "lookup": re.compile(r"\b(?:search|look (?:up|for|into)|find|pull up|dig up|check)\b", re.IGNORECASE),
+    "metrics": re.compile(
+        r"\b(?:metrics?|kpis?|revenue|sales (?:data|figures|numbers)|numbers|figures|churn rate|conversion rate|"
+        r"margins?|growth rate|cac|ltv|mrr|arr|roi|benchmarks?|performance data)\b",
+        re.IGNORECASE,
+    ),
+}
+
+
+@dataclass
+class RouteDecision:
+    route: str  # "direct" (single LLM call) or "agent" (function-calling executor)
+    reason: str
+
+
+def classify(message: str, max_direct_words: Optional[int] = None, has_history: bool = False) -> RouteDecision:
+    """
+    Decide whether a turn needs the tool-using agent. Turns that hint at
+    earlier conversations, lookups or business figures go to the agent; small
+    talk, and short follow-ups in a session that already has history, are
+    answered by one LLM call. A short message opening a session has nothing to
+    follow up on, so it goes to the agent.
+    """
+    max_direct_words = settings.turn_router_max_direct_words if max_direct_words is None else max_direct_words
+    text = message.strip()
+    for reason, pattern in TOOL_HINTS.items():
+        if pattern.search(text):
+            return RouteDecision("agent", reason)
+    words = len(text.split())
+    if SMALL_TALK.match(text) and words <= 6:
+        return RouteDecision("direct", "small_talk")
+    if words <= max_direct_words:
+        return RouteDecision("direct", "short_follow_up") if has_history else RouteDecision("agent", "first_turn")
+    return RouteDecision("agent", "open_question")
+
+
+class TurnRouter:
+    """Routes turns with ``classify`` and keeps counts of decisions and estimated savings."""
+
+    def __init__(self, tools: Sequence[Any] = (), enabled: Optional[bool] = None):
+        self.enabled = settings.turn_router_enabled if enabled is None else enabled
+        # Every agent call re-sends the tool schemas; direct calls don't
+        self.tool_schema_tokens = self._schema_tokens(tools)
+        self.decisions: Dict[str, int] = {}
+        self.tokens_saved = 0
+
+    @staticmethod
+    def _schema_tokens(tools: Sequence[Any]) -> int:
+        if not tools:
+            return 0
+        from langchain_core.utils.function_calling import convert_to_openai_function
+        return count_tokens(json.dumps([convert_to_openai_function(tool) for tool in tools]))
+
+    def route(self, message: str, has_history: bool = False) -> RouteDecision:
+        decision = classify(message, has_history=has_history) if self.enabled else RouteDecision("agent", "router_disabled")
+        key = f"{decision.route}:{decision.reason}"
+        self.decisions[key] = self.decisions.get(key, 0) + 1
+        TURN_ROUTES.inc(route=decision.route, reason=decision.reason)
+        if decision.route == "direct":
+            self.tokens_saved += self.tool_schema_tokens
+            TOKENS_SAVED.inc(self.tool_schema_tokens)
+        logger.debug("[TurnRouter] %s (%s): %.80s", decision.route, decision.reason, message)
+        return decision
+
+    def stats(self) -> Dict[str, Any]:
+        direct = sum(n for key, n in self.decisions.items() if key.startswith("direct:"))
+        total = sum(self.decisions.values())
+        return {
+            "enabled": self.enabled,
+            "decisions": dict(self.decisions),
+            "direct_rate": direct / total if total else 0.0,
+            "tool_schema_tokens": self.tool_schema_tokens,
+            "estimated_tokens_saved": self.tokens_saved,
+        }
@@ -1,13 +1,33 @@
 from openai import OpenAI
-import os
+from functools import lru_cache
+from app.config import settings
+from app.agents.utilities.embedding_cache import embedding_cache
+from app.agents.utilities.embedding_service import embedding_service
 
-def get_embedding(text, model="text-embedding-ada-002"):
+@lru_cache()
+def get_openai_client() -> OpenAI:
+    """Get a cached OpenAI client so connections are reused across calls."""
+    return OpenAI(api_key=settings.openai_api_key or None, base_url=settings.openai_base_url)
+
+def get_embedding(text, model=None):
     """
     Returns the embedding vector for the given text using OpenAI.
+    Results are served from / stored in the shared embedding cache.
     """
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    response = client.embeddings.create(
+    model = model or settings.embedding_model
+    cached = embedding_cache.get(model, text)
+    if cached is not None:
+        return cached
+    response = get_openai_client().embeddings.create(
         input=[text],
         model=model
     )
-    return response.data[0].embedding
+    embedding = response.data[0].embedding
+    embedding_cache.set(model, text, embedding)
+    return embedding
+
+async def aget_embedding(text, model=None):
+    """
+    Async variant of get_embedding; batched with concurrent callers by the embedding service.
+    """
+    return await embedding_service.embed(text, model)
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+from app.agents.utilities.embedding_codec import dequantize, quantize
+
+logger = logging.getLogger(__name__)
+
+# Seconds to stop using the Redis tier after a connection error
+REDIS_RETRY_AFTER = 30
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache.
+
+    Keys are a SHA-256 of the model name plus the normalized text. Vectors are
+    kept packed (``dtype``: float32, float16 or int8; 4, 2 or 1 bytes per
+    dimension) both in the bounded in-process LRU tier and in the shared
+    Redis tier.
+
+    ``aget``/``aset_many`` use the pooled asyncio Redis client, so the LRU tier
+    is only touched on the event loop; the sync ``get``/``set`` (for callers
+    outside the loop) use the sync client. A lock keeps the LRU consistent if
+    both are used at once.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        use_redis: Optional[bool] = None,
+        ttl: Optional[int] = None,
+        redis_client=None,
+        namespace: str = "emb",
+        dtype: Optional[str] = None,
+        async_redis_client=None,
+    ):
+        self.max_entries = max_entries if max_entries is not None else settings.embedding_cache_size
+        self.use_redis = settings.embedding_cache_redis if use_redis is None else use_redis
+        self.ttl = ttl or settings.embedding_cache_ttl
+        self.dtype = dtype or settings.embedding_cache_dtype
+        # Blobs of different precisions must not be mixed up in the shared tier
+        self.namespace = namespace if self.dtype == "float32" else f"{namespace}.{self.dtype}"
+        self._redis_client = redis_client
+        self._async_redis_client = async_redis_client
+        self._redis_disabled_until = 0.0
+        self._local: "OrderedDict[str, bytes]" = OrderedDict()
+        self._local_lock = threading.Lock()
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return unicodedata.normalize("NFC", " ".join(text.split()))
+
+    def make_key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(f"{model}\x00{self.normalize(text)}".encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    @property
+    def redis_client(self):
+        if not self.use_redis or time.monotonic() < self._redis_disabled_until:
+            return None
+        if self._redis_client is None:
+            # Share the connection owned by RedisMemory
+            from app.agents.memory import memory
+            self._redis_client = memory.redis_client
+        return self._redis_client
+
+    @property
+    def async_redis_client(self):
+        if not self.use_redis or time.monotonic() < self._redis_disabled_until:
+            return None
+        if self._async_redis_client is None:
+            # Share the connection pool owned by AsyncRedisMemory
+            from app.agents.memory import async_memory
+            self._async_redis_client = async_memory.redis_client
+        return self._async_redis_client
+
+    def _redis_failed(self, e: Exception):
+        logger.warning("[EmbeddingCache] Redis tier unavailable, bypassing for %ds: %s", REDIS_RETRY_AFTER, e)
+        self._redis_disabled_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._local_lock:
+            packed = self._local.get(key)
+            if packed is None:
+                return None
+            self._local.move_to_end(key)
+            self.local_hits += 1
+        return dequantize(packed, self.dtype).tolist()
+
+    def _set_local(self, key: str, packed: bytes):
+        if self.max_entries <= 0:
+            return
+        with self._local_lock:
+            self._local[key] = packed
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _from_redis(self, keys: Sequence[str], blobs: Sequence[Optional[bytes]], results: List, missing: List[int]):
+        """Fill ``results[missing]`` from Redis blobs, promoting hits into the LRU tier."""
+        for i, blob in zip(missing, blobs):
+            if blob:
+                self._set_local(keys[i], blob)
+                results[i] = dequantize(blob, self.dtype).tolist()
+                self.redis_hits += 1
+            else:
+                self.misses += 1
+
+    def _get_redis(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        client = self.redis_client
+        if client is None:
+            return [None] * len(keys)
+        try:
+            return client.mget(keys)
+        except Exception as e:
+            self._redis_failed(e)
+            return [None] * len(keys)
+
+    def _set_redis(self, items: Sequence[Tuple[str, bytes]]):
+        client = self.redis_client
+        if client is None or not items:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, blob in items:
+                pipe.set(key, blob, ex=self.ttl)
+            pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Look up several texts, checking the LRU tier first and Redis for the rest."""
+        keys = [self.make_key(model, text) for text in texts]
+        results = [self._get_local(key) for key in keys]
+        missing = [i for i, vector in enumerate(results) if vector is None]
+        if missing:
+            self._from_redis(keys, self._get_redis([keys[i] for i in missing]), results, missing)
+        return results
+
+    def _store_local(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> List[Tuple[str, bytes]]:
+        items = []
+        for text, embedding in zip(texts, embeddings):
+            key = self.make_key(model, text)
+            packed = quantize(embedding, self.dtype)
+            self._set_local(key, packed)
+            items.append((key, packed))
+        return items
+
+    def set_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        self._set_redis(self._store_local(model, texts, embeddings))
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        return self.get_many(model, [text])[0]
+
+    def set(self, model: str, text: str, embedding: Sequence[float]):
+        self.set_many(model, [text], [embedding])
+
+    async def aget(self, model: str, text: str) -> Optional[List[float]]:
+        """Async lookup: LRU hits return immediately, misses go to Redis over the async client."""
+        key = self.make_key(model, text)
+        vector = self._get_local(key)
+        if vector is not None:
+            return vector
+        client = self.async_redis_client
+        if client is None:
+            self.misses += 1
+            return None
+        try:
+            blobs = await client.mget([key])
+        except Exception as e:
+            self._redis_failed(e)
+            blobs = [None]
+        results: List[Optional[List[float]]] = [None]
+        self._from_redis([key], blobs, results, [0])
+        return results[0]
+
+    async def aset_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        items = self._store_local(model, texts, embeddings)
+        client = self.async_redis_client
+        if client is None or not items:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, blob in items:
+                pipe.set(key, blob, ex=self.ttl)
+            await pipe.execute()
+        except Exception as e:
+            self._redis_failed(e)
+
+    def clear(self):
+        with self._local_lock:
+            self._local.clear()
+
+    def stats(self) -> Dict[str, float]:
+        hits = self.local_hits + self.redis_hits
+        total = hits + self.misses
+        with self._local_lock:
+            entries = len(self._local)
+            local_bytes = sum(len(blob) for blob in self._local.values())
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "local_entries": entries,
+            "local_bytes": local_bytes,
+        }
+
+
+# Create a singleton instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,116 @@
+import base64
+import struct
+from typing import Optional, Sequence, Union
+
+import numpy as np
+
+from app.config import settings
+
+DTYPES = ("float32", "float16", "int8")
+
+Vector = Union[Sequence[float], np.ndarray]
+
+
+def quantize(vector: Vector, dtype: str = "float32") -> bytes:
+    """
+    Pack a vector into bytes: 4 bytes/dim for float32, 2 for float16, and 1 for
+    int8 (symmetric per-vector scaling; the float32 scale is stored first).
+    """
+    values = np.asarray(vector, dtype=np.float32).reshape(-1)
+    if dtype == "float32":
+        return values.tobytes()
+    if dtype == "float16":
+        return values.astype(np.float16).tobytes()
+    if dtype == "int8":
+        peak = float(np.abs(values).max()) if values.size else 0.0
+        scale = peak / 127.0 if peak else 1.0
+        codes = np.clip(np.rint(values / scale), -127, 127).astype(np.int8)
+        return struct.pack("<f", scale) + codes.tobytes()
+    raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+
+def dequantize(blob: bytes, dtype: str = "float32") -> np.ndarray:
+    """Inverse of ``quantize``; always returns float32."""
+    if dtype == "float32":
+        return np.frombuffer(blob, dtype=np.float32).copy()
+    if dtype == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    if dtype == "int8":
+        (scale,) = struct.unpack_from("<f", blob)
+        return np.frombuffer(blob, dtype=np.int8, offset=4).astype(np.float32) * scale
+    raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+
+def quantize_matrix(matrix: np.ndarray, dtype: str = "float32"):
+    """Row-wise ``quantize`` for a whole matrix: returns ``(codes, scales)``; scales is None unless int8."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if dtype == "float32":
+        return matrix, None
+    if dtype == "float16":
+        return matrix.astype(np.float16), None
+    if dtype == "int8":
+        peaks = np.abs(matrix).max(axis=1) if matrix.size else np.zeros(len(matrix), dtype=np.float32)
+        scales = np.where(peaks > 0, peaks / 127.0, 1.0).astype(np.float32)
+        codes = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+
+def dequantize_matrix(codes: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+    matrix = codes.astype(np.float32)
+    if scales is not None:
+        matrix *= scales[:, None]
+    return matrix
+
+
+def to_base64(vector: Vector, dtype: str = "float32") -> str:
+    return base64.b64encode(quantize(vector, dtype)).decode("ascii")
+
+
+def from_base64(text: str, dtype: str = "float32") -> np.ndarray:
+    return dequantize(base64.b64decode(text), dtype)
+
+
+def to_bytea(vector: Vector, dtype: str = "float32") -> str:
+    """Postgres ``bytea`` hex input format, as accepted by PostgREST."""
+    return "\\x" + quantize(vector, dtype).hex()
+
+
+def from_bytea(text: str, dtype: str = "float32") -> np.ndarray:
+    return dequantize(bytes.fromhex(text[2:] if text.startswith("\\x") else text), dtype)
+
+
+def to_pgvector(vector: Vector, precision: int = 7) -> str:
+    """
+    pgvector text literal with ``precision`` significant digits. The default of
+    7 is about float32's own precision (relative error below 1e-6), at roughly
+    two thirds the size of Python's repr-based JSON floats.
+    """
+    values = np.asarray(vector, dtype=np.float32).reshape(-1)
+    return "[" + ",".join(f"{v:.{precision}g}" for v in values.tolist()) + "]"
+
+
+def from_pgvector(text: str) -> np.ndarray:
+    return np.array([float(v) for v in text.strip("[]").split(",") if v], dtype=np.float32)
+
+
+def to_wire(vector: Optional[Vector], wire_format: Optional[str] = None, precision: Optional[int] = None):
+    """
+    Value to send for a row's ``embedding`` column.
+
+    ``pgvector`` (default) sends the compact text literal; ``json`` sends the
+    plain float list; ``base64``/``bytea`` send packed ``EMBEDDING_WIRE_DTYPE``
+    bytes and require a bytea column (or a conversion trigger) on the table.
+    """
+    if vector is None:
+        return None
+    wire_format = wire_format or settings.embedding_wire_format
+    if wire_format == "json":
+        return [float(v) for v in vector]
+    if wire_format == "pgvector":
+        return to_pgvector(vector, precision or settings.embedding_wire_precision)
+    if wire_format == "base64":
+        return to_base64(vector, settings.embedding_wire_dtype)
+    if wire_format == "bytea":
+        return to_bytea(vector, settings.embedding_wire_dtype)
+    raise ValueError(f"Unsupported embedding wire format: {wire_format}")
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from openai import AsyncOpenAI, BadRequestError
+
+from app.config import settings
+from app.metrics import record_tokens, span
+from app.agents.utilities.embedding_cache import EmbeddingCache, embedding_cache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding files unavailable
+    _ENCODING = None
+
+
+class EmbeddingService:
+    """
+    Long-lived OpenAI embeddings client with request micro-batching.
+
+    Concurrent ``embed`` calls that arrive within ``batch_window_ms`` of each
+    other (from any session) are coalesced into a single ``embeddings.create``
+    request over one pooled HTTP client. When a cache is attached, hits skip
+    the network entirely and fresh vectors are written back to it.
+
+    Because callers share requests, one bad input must not fail the others:
+    empty texts are rejected and oversized ones truncated before they join a
+    batch, and a batch the API still rejects is re-sent text by text.
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        batch_window_ms: Optional[float] = None,
+        max_batch_size: Optional[int] = None,
+        client: Optional[AsyncOpenAI] = None,
+        cache: Optional[EmbeddingCache] = None,
+        max_input_tokens: Optional[int] = None,
+    ):
+        self.model = model or settings.embedding_model
+        if batch_window_ms is None:
+            batch_window_ms = settings.embedding_batch_window_ms
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size or settings.embedding_max_batch_size
+        self.max_input_tokens = max_input_tokens or settings.embedding_max_input_tokens
+        self._client = client
+        self.cache = cache
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._flush_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._inflight: set = set()
+        self.requests_sent = 0
+        self.texts_embedded = 0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """Lazily create the shared client so importing this module needs no API key."""
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=settings.openai_api_key or None,
+                base_url=settings.openai_base_url,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=settings.embedding_max_connections,
+                        max_keepalive_connections=settings.embedding_max_connections,
+                    ),
+                    timeout=httpx.Timeout(30.0, connect=5.0),
+                ),
+            )
+        return self._client
+
+    def _prepare(self, text: str) -> str:
+        """Reject empty input and cut ``text`` to the model's input limit."""
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("Cannot embed empty text")
+        if _ENCODING is not None:
+            tokens = _ENCODING.encode(text, disallowed_special=())
+            if len(tokens) > self.max_input_tokens:
+                return _ENCODING.decode(tokens[:self.max_input_tokens])
+            return text
+        # Without a tokenizer, assume at least one token per 4 characters
+        return text[:self.max_input_tokens * 4]
+
+    async def embed(self, text: str, model: Optional[str] = None) -> List[float]:
+        """Return the embedding for ``text``, sharing a request with concurrent callers."""
+        model = model or self.model
+        text = self._prepare(text)
+        if self.cache is not None:
+            cached = await self.cache.aget(model, text)
+            if cached is not None:
+                return cached
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(model, [])
+        pending.append((text, future))
+        if len(pending) >= self.max_batch_size:
+            self._flush(model)
+        elif model not in self._flush_handles:
+            self._flush_handles[model] = loop.call_later(self.batch_window, self._flush, model)
+        return await future
+
+    async def embed_many(self, texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+        """Embed several texts; they join the current batch window like any other caller."""
+        return list(await asyncio.gather(*(self.embed(text, model) for text in texts)))
+
+    def _flush(self, model: str):
+        handle = self._flush_handles.pop(model, None)
+        if handle is not None:
+            handle.cancel()
+        batch = self._pending.pop(model, [])
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._send(model, batch))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, model: str, batch: List[Tuple[str, asyncio.Future]]):
+        # Identical strings in one window are only sent once
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            with span("openai.embeddings"):
+                response = await self.client.embeddings.create(input=unique_texts, model=model)
+        except BadRequestError as e:
+            if len(unique_texts) == 1:
+                self._fail(batch, e)
+                return
+            # The API rejected some input; retry each text so only its own callers see the error
+            logger.warning("[EmbeddingService] Batch of %d rejected, re-sending one by one: %s", len(unique_texts), e)
+            by_text: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+            for item in batch:
+                by_text.setdefault(item[0], []).append(item)
+            await asyncio.gather(*(self._send(model, items) for items in by_text.values()))
+            return
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        self.requests_sent += 1
+        self.texts_embedded += len(unique_texts)
+        if response.usage is not None:
+            record_tokens("embeddings", prompt=response.usage.prompt_tokens)
+        vectors = {unique_texts[item.index]: item.embedding for item in response.data}
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[text])
+        if self.cache is not None:
+            await self.cache.aset_many(model, list(vectors), list(vectors.values()))
+
+    @staticmethod
+    def _fail(batch: List[Tuple[str, asyncio.Future]], error: Exception):
+        logger.error("[EmbeddingService] Batch of %d failed: %s", len(batch), error)
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def aclose(self):
+        """Flush pending requests, wait for in-flight batches and close the HTTP pool."""
+        for model in list(self._pending):
+            self._flush(model)
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests_sent": self.requests_sent,
+            "texts_embedded": self.texts_embedded,
+            "pending": sum(len(batch) for batch in self._pending.values()),
+        }
+
+
+# Create a singleton instance
+embedding_service = EmbeddingService(cache=embedding_cache)
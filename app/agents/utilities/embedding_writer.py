@@ -0,0 +1,205 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.agents.utilities.embedding_service import embedding_service
+
+logger = logging.getLogger(__name__)
+
+# (row_id, content, jwt_token, meta)
+PendingRow = Tuple[Any, str, Optional[str], Optional[Dict[str, Any]]]
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether retrying could help: not for invalid input or 4xx responses other than timeouts and rate limits."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int) and 400 <= status < 500:
+        return status in (408, 429)
+    return not isinstance(error, (ValueError, TypeError))
+
+
+class EmbeddingWriteBehind:
+    """
+    Background write-behind pipeline for conversation embeddings.
+
+    Rows are inserted without an embedding; their ids are queued here and a
+    small pool of asyncio workers embeds them in batches and patches the
+    ``embedding`` column afterwards. With ``patch_many(rows, jwt)`` each batch
+    is stored with one request per credential (``rows`` are ``{"id",
+    "embedding"}`` dicts); otherwise rows are patched one by one, concurrently.
+    The bounded queue applies backpressure to producers when the workers fall
+    behind. Only transient errors are retried; a batch whose embedding fails
+    permanently (e.g. one empty or rejected row) is split into single rows so
+    the rest are still written. ``on_written(row_id, embedding, meta)`` is called for every row
+    once its embedding has been stored. ``encode`` turns a vector into the
+    value written to the ``embedding`` column.
+
+    Rows are written with the JWT they were queued with unless ``credential``
+    (a service key) is given. User JWTs can expire while rows wait in the
+    queue or between retries; such writes fail and the rows are counted in
+    ``rows_failed``.
+    """
+
+    def __init__(
+        self,
+        patch: Optional[Callable[[Any, Dict[str, Any], Optional[str]], Awaitable[Any]]] = None,
+        embed_many: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        on_written: Optional[Callable[[Any, List[float], Optional[Dict[str, Any]]], None]] = None,
+        encode: Optional[Callable[[List[float]], Any]] = None,
+        patch_many: Optional[Callable[[List[Dict[str, Any]], Optional[str]], Awaitable[Any]]] = None,
+        credential: Optional[str] = None,
+    ):
+        self.patch = patch
+        self.patch_many = patch_many
+        self.credential = credential
+        self.on_written = on_written
+        self.encode = encode
+        self.embed_many = embed_many or embedding_service.embed_many
+        self.workers = workers or settings.embedding_writer_workers
+        self.batch_size = batch_size or settings.embedding_writer_batch_size
+        self.max_queue = max_queue or settings.embedding_writer_queue_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.rows_written = 0
+        self.rows_failed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info("[EmbeddingWriteBehind] Started %d workers", self.workers)
+
+    async def enqueue(self, row_id: Any, content: str, jwt_token: Optional[str] = None, meta: Optional[Dict[str, Any]] = None):
+        """Queue a row for embedding; waits if the queue is full."""
+        if not self.running:
+            await self.start()
+        await self._queue.put((row_id, content, jwt_token, meta))
+
+    async def _worker(self, worker_id: int):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logger.error("[EmbeddingWriteBehind] Worker %d dropped %d rows: %s", worker_id, len(batch), e)
+                self.rows_failed += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _retry(self, func, *args):
+        for attempt in range(self.max_retries):
+            try:
+                return await func(*args)
+            except Exception as e:
+                if attempt == self.max_retries - 1 or not is_transient(e):
+                    raise
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning("[EmbeddingWriteBehind] Attempt %d failed (%s), retrying in %.1fs", attempt + 1, e, delay)
+                await asyncio.sleep(delay)
+
+    async def _write(self, batch: List[PendingRow], embeddings: List[List[float]]) -> List[Optional[Exception]]:
+        """Store the batch's embeddings; returns the error (or None) for each row."""
+        values = [self.encode(embedding) if self.encode else embedding for embedding in embeddings]
+        if self.patch_many is None:
+            return await asyncio.gather(
+                *(
+                    self._retry(self.patch, row_id, {"embedding": value}, self.credential or jwt_token)
+                    for (row_id, _, jwt_token, _), value in zip(batch, values)
+                ),
+                return_exceptions=True,
+            )
+        # Rows queued by different users are written with their own JWTs (for RLS)
+        groups: Dict[Optional[str], List[int]] = {}
+        for i, (_, _, jwt_token, _) in enumerate(batch):
+            groups.setdefault(self.credential or jwt_token, []).append(i)
+        outcomes = await asyncio.gather(
+            *(
+                self._retry(self.patch_many, [{"id": batch[i][0], "embedding": values[i]} for i in indexes], jwt_token)
+                for jwt_token, indexes in groups.items()
+            ),
+            return_exceptions=True,
+        )
+        results: List[Optional[Exception]] = [None] * len(batch)
+        for indexes, outcome in zip(groups.values(), outcomes):
+            for i in indexes:
+                results[i] = outcome if isinstance(outcome, Exception) else None
+        return results
+
+    async def _embed_one(self, content: str) -> List[float]:
+        return (await self._retry(self.embed_many, [content]))[0]
+
+    async def _embed(self, batch: List[PendingRow]) -> List[Any]:
+        """The embedding, or the error, for each row of the batch."""
+        contents = [content for _, content, _, _ in batch]
+        try:
+            return await self._retry(self.embed_many, contents)
+        except Exception as e:
+            if len(batch) == 1 or is_transient(e):
+                return [e] * len(batch)
+            logger.warning("[EmbeddingWriteBehind] Batch of %d rejected (%s), embedding rows one by one", len(batch), e)
+        return await asyncio.gather(*(self._embed_one(content) for content in contents), return_exceptions=True)
+
+    async def _process(self, batch: List[PendingRow]):
+        embedded = await self._embed(batch)
+        for (row_id, _, _, _), embedding in zip(batch, embedded):
+            if isinstance(embedding, Exception):
+                logger.error("[EmbeddingWriteBehind] Failed to embed row %s: %s", row_id, embedding)
+                self.rows_failed += 1
+        ok = [i for i, embedding in enumerate(embedded) if not isinstance(embedding, Exception)]
+        if not ok:
+            return
+        batch = [batch[i] for i in ok]
+        embeddings = [embedded[i] for i in ok]
+        results = await self._write(batch, embeddings)
+        for (row_id, _, _, meta), embedding, result in zip(batch, embeddings, results):
+            if isinstance(result, Exception):
+                logger.error("[EmbeddingWriteBehind] Failed to patch embedding for row %s: %s", row_id, result)
+                self.rows_failed += 1
+                continue
+            self.rows_written += 1
+            if self.on_written is not None:
+                try:
+                    self.on_written(row_id, embedding, meta)
+                except Exception as e:
+                    logger.warning("[EmbeddingWriteBehind] on_written failed for row %s: %s", row_id, e)
+
+    async def drain(self, timeout: Optional[float] = None):
+        """Wait for queued rows to be written, then stop the workers."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("[EmbeddingWriteBehind] Drain timed out with %d rows pending", self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+        }
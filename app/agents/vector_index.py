@@ -0,0 +1,423 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.supabase_integration.rest import rest_client
+from app.agents.utilities.embedding_codec import (
+    dequantize_matrix, from_base64, from_bytea, from_pgvector, quantize_matrix, to_pgvector
+)
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu is optional; the NumPy flat index is always available
+    faiss = None
+
+logger = logging.getLogger(__name__)
+
+# Search results carry each row's stored vector as "embedding" so callers can
+# re-rank without embedding the candidates again. For the RPC backend this
+# needs match_conversations to return the column, e.g.:
+#
+#   create or replace function match_conversations(query_embedding vector, match_threshold float, match_count int)
+#   returns table (id bigint, session_id text, role text, content text, embedding vector, similarity float)
+#   language sql stable security invoker as $$
+#     select id, session_id, role, content, embedding, 1 - (embedding <=> query_embedding) as similarity
+#     from conversations
+#     where embedding is not null and 1 - (embedding <=> query_embedding) > match_threshold
+#     order by embedding <=> query_embedding
+#     limit match_count;
+#   $$;
+
+
+def decode_embedding(value) -> Optional[np.ndarray]:
+    """Parse an ``embedding`` column value as returned by PostgREST (see ``to_wire``)."""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return np.asarray(value, dtype=np.float32)
+    if value.startswith("["):
+        return from_pgvector(value)
+    if value.startswith("\\x"):
+        return from_bytea(value, settings.embedding_wire_dtype)
+    return from_base64(value, settings.embedding_wire_dtype)
+
+
+class SupabaseVectorSearch:
+    """Similarity search through the ``match_conversations`` RPC (pgvector, scoped by RLS)."""
+
+    def __init__(self, rest=None):
+        self.rest = rest or rest_client
+
+    async def search(self, query_embedding, user_id=None, jwt_token=None, k=5, threshold=0.7) -> List[Dict[str, Any]]:
+        resp = await self.rest.post(
+            "rpc/match_conversations",
+            {
+                'query_embedding': to_pgvector(query_embedding),
+                'match_threshold': threshold,
+                'match_count': k
+            },
+            jwt_token,
+            prefer=None
+        )
+        if resp.status_code != 200:
+            raise Exception(f"match_conversations failed: {resp.text}")
+        return resp.json() or []
+
+    async def fetch_rows(self, user_id, jwt_token=None, after_id=None, page_size=1000, max_rows=None) -> List[Dict[str, Any]]:
+        """
+        A user's embedded conversation rows with id > ``after_id``, oldest
+        first. Paging stops once more than ``max_rows`` rows have been read.
+        """
+        rows: List[Dict[str, Any]] = []
+        while True:
+            params = {
+                "select": "id,session_id,role,content,embedding",
+                "user_id": f"eq.{user_id}",
+                "embedding": "not.is.null",
+                "order": "id",
+                "limit": page_size,
+            }
+            if after_id is not None:
+                params["id"] = f"gt.{after_id}"
+            resp = await self.rest.get("conversations", jwt_token, params=params)
+            if resp.status_code != 200:
+                raise Exception(f"Select failed: {resp.text}")
+            page = resp.json() or []
+            rows.extend(page)
+            if len(page) < page_size or (max_rows is not None and len(rows) > max_rows):
+                return rows
+            after_id = page[-1]["id"]
+
+    def add(self, user_id, row_id, embedding, meta=None):
+        pass
+
+    def load(self):
+        pass
+
+    def save(self):
+        pass
+
+    async def aclose(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "supabase"}
+
+
+class _Partition:
+    """One user's vectors: a growable, L2-normalized float32 matrix plus row metadata."""
+
+    def __init__(self, dim: int, mode: str, hnsw_m: int, ivf_nlist: int):
+        self.dim = dim
+        self.mode = mode
+        self.hnsw_m = hnsw_m
+        self.ivf_nlist = ivf_nlist
+        self.vectors = np.empty((16, dim), dtype=np.float32)
+        self.size = 0
+        self.rows: List[Dict[str, Any]] = []
+        self.positions: Dict[Any, int] = {}
+        self.ann = None  # faiss index mirroring vectors[:size] once built
+        # Whether the user's stored rows were loaded from Supabase in this process, and up to which id
+        self.synced = False
+        self.cursor = None
+        # Too many rows to hold locally; the user is searched through the fallback
+        self.oversized = False
+        self.last_used = time.monotonic()
+
+    def drop(self):
+        """Release the vectors and mark the partition oversized."""
+        self.vectors = np.empty((0, self.dim), dtype=np.float32)
+        self.size = 0
+        self.rows = []
+        self.positions = {}
+        self.ann = None
+        self.oversized = True
+
+    def add(self, row_id, vector: np.ndarray, meta: Dict[str, Any]):
+        if row_id in self.positions:
+            # Re-embedded row: overwrite in place (the ANN index keeps the old vector until rebuilt)
+            self.vectors[self.positions[row_id]] = vector
+            self.rows[self.positions[row_id]] = meta
+            return
+        if self.size == len(self.vectors):
+            grown = np.empty((len(self.vectors) * 2, self.dim), dtype=np.float32)
+            grown[: self.size] = self.vectors[: self.size]
+            self.vectors = grown
+        self.vectors[self.size] = vector
+        self.positions[row_id] = self.size
+        self.rows.append(meta)
+        self.size += 1
+        if self.ann is not None:
+            self.ann.add(vector[None, :])
+        elif faiss is not None and self.mode != "flat":
+            self._maybe_build_ann()
+
+    def _maybe_build_ann(self):
+        if self.mode == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        elif self.mode == "ivf":
+            # IVF needs enough points to train its centroids; search stays flat until then
+            if self.size < self.ivf_nlist * 39:
+                return
+            quantizer = faiss.IndexFlatIP(self.dim)
+            index = faiss.IndexIVFFlat(quantizer, self.dim, self.ivf_nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(self.vectors[: self.size])
+            index.nprobe = max(1, self.ivf_nlist // 10)
+        else:
+            return
+        index.add(self.vectors[: self.size])
+        self.ann = index
+
+    def search(self, query: np.ndarray, k: int):
+        if self.size == 0:
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        if self.ann is not None:
+            scores, idx = self.ann.search(query[None, :], min(k, self.size))
+            keep = idx[0] >= 0
+            return scores[0][keep], idx[0][keep]
+        scores = self.vectors[: self.size] @ query
+        if k < self.size:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(self.size)
+        top = top[np.argsort(-scores[top])]
+        return scores[top], top
+
+
+class LocalVectorIndex:
+    """
+    In-process cosine similarity index, partitioned per user.
+
+    Vectors are added as the embedding writer fills in rows, so lookups are
+    local matrix products (or FAISS HNSW/IVF searches when faiss is installed
+    and ``mode`` asks for it). The first search for a user in this process
+    starts a background backfill of their partition with the rows stored in
+    Supabase (only rows newer than the saved file's for partitions loaded
+    from disk) through ``fallback.fetch_rows``; until it completes, searches
+    go to ``fallback``. Users with more than ``max_rows`` embedded rows are
+    not held locally and are always searched through ``fallback``.
+
+    At most ``max_users`` partitions are kept; the least recently searched
+    ones, and any unsearched for ``ttl`` seconds, are dropped (and backfilled
+    again on their next search).
+
+    The index is saved to ``path`` on shutdown and loaded at startup. The file
+    holds message content in plain text and is written with mode 0600. It is
+    a warm-start cache, not a source of truth: with several workers sharing
+    ``path`` the last one to shut down overwrites the others' copies, and
+    rows embedded by other workers reach a partition only through the
+    backfill (a row whose embedding is stored after a newer row was synced
+    is not picked up until the partition is rebuilt).
+    """
+
+    def __init__(
+        self,
+        dim: int = 1536,
+        mode: Optional[str] = None,
+        path: Optional[str] = None,
+        fallback=None,
+        hnsw_m: Optional[int] = None,
+        ivf_nlist: Optional[int] = None,
+        dtype: Optional[str] = None,
+        max_users: Optional[int] = None,
+        ttl: Optional[float] = None,
+        max_rows: Optional[int] = None,
+    ):
+        self.dim = dim
+        self.mode = mode or settings.vector_index_mode
+        if self.mode != "flat" and faiss is None:
+            logger.warning("[LocalVectorIndex] faiss is not installed; using the flat NumPy index instead of %s", self.mode)
+            self.mode = "flat"
+        self.path = settings.vector_index_path if path is None else path
+        self.fallback = fallback
+        self.dtype = dtype or settings.vector_index_dtype
+        self.hnsw_m = hnsw_m or settings.vector_hnsw_m
+        self.ivf_nlist = ivf_nlist or settings.vector_ivf_nlist
+        self.max_users = max_users or settings.vector_index_max_users
+        self.ttl = ttl or settings.vector_index_user_ttl
+        self.max_rows = max_rows or settings.vector_index_max_rows
+        self.partitions: "OrderedDict[str, _Partition]" = OrderedDict()
+        self._syncing: Dict[str, asyncio.Task] = {}
+        self.searches = 0
+        self.fallbacks = 0
+        self.backfilled_rows = 0
+        self.evictions = 0
+
+    def _normalize(self, vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return vector / (np.linalg.norm(vector) + 1e-12)
+
+    def _evict(self):
+        now = time.monotonic()
+        for user_id in list(self.partitions):
+            partition = self.partitions[user_id]
+            expired = now - partition.last_used > self.ttl
+            over_capacity = len(self.partitions) > self.max_users
+            if not (expired or over_capacity):
+                break
+            # A partition being backfilled is dropped once the backfill finishes
+            if user_id in self._syncing:
+                continue
+            del self.partitions[user_id]
+            self.evictions += 1
+
+    def _partition(self, user_id: str) -> _Partition:
+        partition = self.partitions.get(user_id)
+        if partition is None:
+            partition = self.partitions[user_id] = _Partition(self.dim, self.mode, self.hnsw_m, self.ivf_nlist)
+            self._evict()
+        return partition
+
+    def _touch(self, user_id: str) -> Optional[_Partition]:
+        partition = self.partitions.get(user_id)
+        if partition is not None:
+            partition.last_used = time.monotonic()
+            self.partitions.move_to_end(user_id)
+        self._evict()
+        return self.partitions.get(user_id)
+
+    def add(self, user_id, row_id, embedding, meta: Optional[Dict[str, Any]] = None):
+        if user_id is None or embedding is None:
+            return
+        partition = self._partition(str(user_id))
+        if partition.oversized:
+            return
+        if partition.size >= self.max_rows and row_id not in partition.positions:
+            partition.drop()
+            return
+        row = dict(meta or {}, id=row_id)
+        row.pop("user_id", None)
+        partition.add(row_id, self._normalize(embedding), row)
+
+    async def _sync(self, user_id: str, jwt_token):
+        """Backfill a user's partition from Supabase (run in the background by ``search``)."""
+        partition = self._partition(user_id)
+        try:
+            rows = await self.fallback.fetch_rows(
+                user_id, jwt_token, after_id=partition.cursor, max_rows=self.max_rows - partition.size
+            )
+        except Exception as e:
+            logger.warning("[LocalVectorIndex] Backfill for user %s failed: %s", user_id, e)
+            return
+        if partition.size + len(rows) > self.max_rows:
+            logger.info("[LocalVectorIndex] User %s has over %d rows; searching through the fallback", user_id, self.max_rows)
+            partition.drop()
+            return
+        for row in rows:
+            embedding = decode_embedding(row.pop("embedding", None))
+            if embedding is not None and len(embedding) == self.dim:
+                partition.add(row["id"], self._normalize(embedding), row)
+        if rows:
+            partition.cursor = rows[-1]["id"]
+        partition.synced = True
+        self.backfilled_rows += len(rows)
+
+    def _start_sync(self, user_id: str, jwt_token):
+        if user_id in self._syncing:
+            return
+        task = asyncio.create_task(self._sync(user_id, jwt_token))
+        self._syncing[user_id] = task
+        task.add_done_callback(lambda _: self._syncing.pop(user_id, None))
+
+    async def search(self, query_embedding, user_id=None, jwt_token=None, k=5, threshold=0.7) -> List[Dict[str, Any]]:
+        key = str(user_id) if user_id is not None else None
+        partition = self._touch(key) if key is not None else None
+        if partition is not None and partition.oversized:
+            partition = None
+        elif key is not None and hasattr(self.fallback, "fetch_rows") and not (partition is not None and partition.synced):
+            # A partition is only trusted once the user's stored rows are in it; meanwhile the RPC answers
+            self._start_sync(key, jwt_token)
+            partition = None
+        if partition is None:
+            if self.fallback is None:
+                return []
+            self.fallbacks += 1
+            return await self.fallback.search(query_embedding, user_id=user_id, jwt_token=jwt_token, k=k, threshold=threshold)
+        self.searches += 1
+        scores, positions = partition.search(self._normalize(query_embedding), k)
+        return [
+            dict(partition.rows[p], similarity=float(s), embedding=partition.vectors[p])
+            for s, p in zip(scores, positions)
+            if s >= threshold
+        ]
+
+    async def aclose(self):
+        """Cancel backfills still in flight (before ``save``)."""
+        tasks = list(self._syncing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def save(self):
+        """Write all partitions to ``path`` as a single .npz file, quantized to ``dtype``."""
+        if not self.path:
+            return
+        start = time.perf_counter()
+        users = [u for u, p in self.partitions.items() if not p.oversized]
+        vectors = [self.partitions[u].vectors[: self.partitions[u].size] for u in users]
+        meta = {
+            "dim": self.dim,
+            "users": users,
+            "sizes": [self.partitions[u].size for u in users],
+            "rows": [self.partitions[u].rows for u in users],
+        }
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        codes, scales = quantize_matrix(
+            np.concatenate(vectors) if vectors else np.empty((0, self.dim), dtype=np.float32), self.dtype
+        )
+        arrays = {"vectors": codes, "meta": np.array(json.dumps(meta, default=str))}
+        if scales is not None:
+            arrays["scales"] = scales
+        np.savez(tmp_path, **arrays)
+        # Rows include message content
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, self.path)
+        logger.info("[LocalVectorIndex] Saved %d vectors for %d users in %.2fs", sum(meta["sizes"]), len(users), time.perf_counter() - start)
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            meta = json.loads(str(data["meta"]))
+            vectors = dequantize_matrix(data["vectors"], data["scales"] if "scales" in data.files else None)
+        if meta["dim"] != self.dim:
+            logger.warning("[LocalVectorIndex] Ignoring %s: dimension %s != %s", self.path, meta["dim"], self.dim)
+            return
+        offset = 0
+        for user_id, size, rows in zip(meta["users"], meta["sizes"], meta["rows"]):
+            partition = self._partition(user_id)
+            for i, row in enumerate(rows):
+                partition.add(row["id"], vectors[offset + i], row)
+            # Only rows newer than the file's are backfilled on first use
+            partition.cursor = max((row["id"] for row in rows), default=None)
+            offset += size
+        logger.info("[LocalVectorIndex] Loaded %d vectors for %d users", offset, len(meta["users"]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "local",
+            "mode": self.mode,
+            "users": len(self.partitions),
+            "vectors": sum(p.size for p in self.partitions.values()),
+            "searches": self.searches,
+            "fallbacks": self.fallbacks,
+            "backfilled_rows": self.backfilled_rows,
+            "backfills_running": len(self._syncing),
+            "evictions": self.evictions,
+        }
+
+
+def create_vector_search(backend: Optional[str] = None):
+    """Build the backend selected by ``VECTOR_SEARCH_BACKEND`` (``supabase`` or ``local``)."""
+    backend = backend or settings.vector_search_backend
+    if backend == "local":
+        return LocalVectorIndex(fallback=SupabaseVectorSearch())
+    return SupabaseVectorSearch()
@@ -2,51 +2,40 @@ from fastapi import APIRouter, Depends, HTTPException, Header
 from typing import Optional
 from .supabase import auth
 from ..config import settings
-import jwt
 from datetime import datetime, timedelta
 import logging
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 async def get_current_user(authorization: str = Header(None)):
-    logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
-    logger.info("[get_current_user] Called with authorization header: %s", authorization)
     if not authorization:
         logger.warning("[get_current_user] No authorization header provided")
         raise HTTPException(
             status_code=401,
             detail="No authorization header"
         )
-    
-    try:
-        # Remove 'Bearer ' prefix if present
-        token = authorization.replace('Bearer ', '')
-        
-        # Verify the token with Supabase
-        user = auth.supabase.auth.get_user(token)
-        if not user:
-            logger.warning("[get_current_user] Invalid token")
-            raise HTTPException(
-                status_code=401,
-                detail="Invalid token"
-            )
-        logger.info("[get_current_user] Authenticated user: %s", getattr(user, 'id', 'unknown'))
-        return user
-    except Exception as e:
-        logger.error("[get_current_user] Exception: %s", str(e))
+    # Remove 'Bearer ' prefix if present
+    token = authorization.replace('Bearer ', '')
+    return await auth.authenticate(token)
+
+async def get_current_user_strict(authorization: str = Header(None)):
+    """Like get_current_user, but also confirms with Supabase Auth that the session is not revoked."""
+    if not authorization:
         raise HTTPException(
             status_code=401,
-            detail=f"Invalid authentication credentials: {str(e)}"
+            detail="No authorization header"
         )
+    token = authorization.replace('Bearer ', '')
+    return await auth.authenticate_strict(token)
 
 @router.get("/me")
-async def get_user_info(user = Depends(get_current_user)):
+async def get_user_info(user = Depends(get_current_user_strict)):
     """Get current user information"""
     return {
-        "id": user.id,
-        "email": user.email,
-        "user_metadata": user.user_metadata
+        "id": user.user.id,
+        "email": user.user.email,
+        "user_metadata": user.user.user_metadata
     }
 
 # Development only endpoints
@@ -1,5 +1,7 @@
+import asyncio
 from supabase import create_client, Client
 from ..config import settings
+from ..supabase_integration.token_verifier import token_verifier, TokenVerificationError, LocalVerificationUnavailable
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
@@ -11,11 +13,24 @@ class SupabaseAuth:
             settings.supabase_url,
             settings.supabase_key
         )
-    
-    async def get_current_user(self, credentials: HTTPAuthorizationCredentials = Depends(security)):
+
+    async def authenticate(self, token: str):
+        """Verify the JWT locally (signature, expiry, audience) without calling Supabase Auth."""
         try:
-            # Verify the JWT token with Supabase
-            user = self.supabase.auth.get_user(credentials.credentials)
+            return await token_verifier.get_user(token)
+        except LocalVerificationUnavailable:
+            # No JWT secret configured: fall back to asking Supabase Auth
+            return await self.authenticate_remote(token)
+        except TokenVerificationError:
+            raise HTTPException(
+                status_code=401,
+                detail="Invalid authentication credentials"
+            )
+
+    async def authenticate_remote(self, token: str):
+        """Verify the JWT with Supabase Auth, which also catches revoked sessions."""
+        try:
+            user = await asyncio.to_thread(self.supabase.auth.get_user, token)
             if not user:
                 raise HTTPException(
                     status_code=401,
@@ -28,5 +43,24 @@ class SupabaseAuth:
                 detail="Invalid authentication credentials"
             )
 
+    async def authenticate_strict(self, token: str):
+        """For revocation-sensitive routes: reject bad tokens locally, then confirm remotely."""
+        try:
+            await token_verifier.verify(token)
+        except LocalVerificationUnavailable:
+            pass
+        except TokenVerificationError:
+            raise HTTPException(
+                status_code=401,
+                detail="Invalid authentication credentials"
+            )
+        return await self.authenticate_remote(token)
+
+    async def get_current_user(self, credentials: HTTPAuthorizationCredentials = Depends(security)):
+        return await self.authenticate(credentials.credentials)
+
+    async def get_current_user_strict(self, credentials: HTTPAuthorizationCredentials = Depends(security)):
+        return await self.authenticate_strict(credentials.credentials)
+
 # Create a singleton instance
-auth = SupabaseAuth() 
\ No newline at end of file
+auth = SupabaseAuth()
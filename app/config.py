@@ -1,6 +1,6 @@
 import os
 from dotenv import load_dotenv
-from typing import List
+from typing import List, Optional
 from pydantic_settings import BaseSettings
 
 load_dotenv()
@@ -8,6 +8,7 @@ load_dotenv()
 class Settings(BaseSettings):
     # Environment
     environment: str = os.getenv("ENVIRONMENT", "development")
+    log_level: str = os.getenv("LOG_LEVEL", "INFO").upper()
 
     # Supabase settings
     supabase_url: str = os.getenv("SUPABASE_URL", "")
@@ -15,6 +16,95 @@ class Settings(BaseSettings):
 
     # Redis settings
     redis_url: str = os.getenv("REDIS_URL", "redis://localhost:6379")
+    redis_max_connections: int = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    redis_socket_timeout: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+    redis_serializer: str = os.getenv("REDIS_SERIALIZER", "json")
+
+    # OpenAI settings
+    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_base_url: Optional[str] = os.getenv("OPENAI_BASE_URL") or None
+
+    # Embedding settings
+    embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+    embedding_batch_window_ms: float = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+    embedding_max_batch_size: int = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", "256"))
+    embedding_max_input_tokens: int = int(os.getenv("EMBEDDING_MAX_INPUT_TOKENS", "8191"))
+    embedding_max_connections: int = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "20"))
+    embedding_cache_size: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "5000"))
+    embedding_cache_redis: bool = os.getenv("EMBEDDING_CACHE_REDIS", "true").lower() == "true"
+    embedding_cache_ttl: int = int(os.getenv("EMBEDDING_CACHE_TTL", str(7 * 24 * 3600)))
+    embedding_cache_dtype: str = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")
+    embedding_wire_format: str = os.getenv("EMBEDDING_WIRE_FORMAT", "pgvector")
+    embedding_wire_precision: int = int(os.getenv("EMBEDDING_WIRE_PRECISION", "7"))
+    embedding_wire_dtype: str = os.getenv("EMBEDDING_WIRE_DTYPE", "float16")
+    embedding_writer_workers: int = int(os.getenv("EMBEDDING_WRITER_WORKERS", "2"))
+    embedding_writer_batch_size: int = int(os.getenv("EMBEDDING_WRITER_BATCH_SIZE", "32"))
+    embedding_writer_queue_size: int = int(os.getenv("EMBEDDING_WRITER_QUEUE_SIZE", "1000"))
+    embedding_writer_drain_timeout: float = float(os.getenv("EMBEDDING_WRITER_DRAIN_TIMEOUT", "30"))
+    embedding_writer_rpc: str = os.getenv("EMBEDDING_WRITER_RPC", "update_embeddings")
+    embedding_writer_service_key: str = os.getenv("EMBEDDING_WRITER_SERVICE_KEY", "")
+
+    # Conversation similarity search
+    vector_search_backend: str = os.getenv("VECTOR_SEARCH_BACKEND", "supabase")
+    vector_index_mode: str = os.getenv("VECTOR_INDEX_MODE", "flat")
+    vector_index_path: str = os.getenv("VECTOR_INDEX_PATH", "data/vector_index.npz")
+    vector_index_dtype: str = os.getenv("VECTOR_INDEX_DTYPE", "float16")
+    vector_index_max_users: int = int(os.getenv("VECTOR_INDEX_MAX_USERS", "1000"))
+    vector_index_user_ttl: float = float(os.getenv("VECTOR_INDEX_USER_TTL", "3600"))
+    vector_index_max_rows: int = int(os.getenv("VECTOR_INDEX_MAX_ROWS", "20000"))
+    vector_hnsw_m: int = int(os.getenv("VECTOR_HNSW_M", "32"))
+    vector_ivf_nlist: int = int(os.getenv("VECTOR_IVF_NLIST", "100"))
+
+    # Similar-conversation retrieval post-processing
+    retrieval_k: int = int(os.getenv("RETRIEVAL_K", "5"))
+    retrieval_fetch_k: int = int(os.getenv("RETRIEVAL_FETCH_K", "20"))
+    retrieval_threshold: float = float(os.getenv("RETRIEVAL_THRESHOLD", "0.7"))
+    retrieval_mmr_lambda: float = float(os.getenv("RETRIEVAL_MMR_LAMBDA", "0.7"))
+    retrieval_max_per_session: int = int(os.getenv("RETRIEVAL_MAX_PER_SESSION", "2"))
+    retrieval_token_budget: int = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1000"))
+
+    # Request tracing (opt-in; returned as debug_output)
+    trace_allow_debug: bool = os.getenv("TRACE_ALLOW_DEBUG", "true").lower() == "true"
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+    trace_max_events: int = int(os.getenv("TRACE_MAX_EVENTS", "200"))
+    trace_max_chars: int = int(os.getenv("TRACE_MAX_CHARS", "500"))
+
+    # Agent response cache (opt-in)
+    response_cache_enabled: bool = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    response_cache_ttl: int = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+    response_cache_threshold: float = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+    response_cache_scope: str = os.getenv("RESPONSE_CACHE_SCOPE", "user")
+
+    # Turns without tool hints skip the function-calling agent
+    turn_router_enabled: bool = os.getenv("TURN_ROUTER_ENABLED", "true").lower() == "true"
+    turn_router_max_direct_words: int = int(os.getenv("TURN_ROUTER_MAX_DIRECT_WORDS", "12"))
+
+    # Conversation session pool
+    session_pool_size: int = int(os.getenv("SESSION_POOL_SIZE", "1000"))
+    session_ttl: float = float(os.getenv("SESSION_TTL", "1800"))
+    history_window: int = int(os.getenv("HISTORY_WINDOW", "100"))
+    history_ttl: int = int(os.getenv("HISTORY_TTL", str(24 * 3600)))
+    conversation_turn_rpc: str = os.getenv("CONVERSATION_TURN_RPC", "")
+    conversation_import_batch_size: int = int(os.getenv("CONVERSATION_IMPORT_BATCH_SIZE", "500"))
+
+    # Prompt context assembly
+    context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "3000"))
+    context_recent_messages: int = int(os.getenv("CONTEXT_RECENT_MESSAGES", "10"))
+    context_summary_min_tokens: int = int(os.getenv("CONTEXT_SUMMARY_MIN_TOKENS", "800"))
+    context_retrieval_k: int = int(os.getenv("CONTEXT_RETRIEVAL_K", "0"))
+
+    # GPT Researcher
+    gpt_researcher_timeout: float = float(os.getenv("GPT_RESEARCHER_TIMEOUT", "300"))
+    research_max_concurrent: int = int(os.getenv("RESEARCH_MAX_CONCURRENT", "20"))
+    research_max_queued_per_user: int = int(os.getenv("RESEARCH_MAX_QUEUED_PER_USER", "5"))
+    research_job_history: int = int(os.getenv("RESEARCH_JOB_HISTORY", "1000"))
+    research_cache_enabled: bool = os.getenv("RESEARCH_CACHE_ENABLED", "true").lower() == "true"
+    research_cache_ttl: int = int(os.getenv("RESEARCH_CACHE_TTL", str(24 * 3600)))
+    research_event_log_size: int = int(os.getenv("RESEARCH_EVENT_LOG_SIZE", "5000"))
+    research_events_heartbeat: float = float(os.getenv("RESEARCH_EVENTS_HEARTBEAT", "15"))
+    research_chunk_table: str = os.getenv("RESEARCH_CHUNK_TABLE", "research_chunks")
+    research_flush_interval: float = float(os.getenv("RESEARCH_FLUSH_INTERVAL", "2"))
+    research_flush_bytes: int = int(os.getenv("RESEARCH_FLUSH_BYTES", "4096"))
 
     # API settings
     api_v1_str: str = os.getenv("API_V1_STR", "/api/v1")
@@ -27,9 +117,6 @@ class Settings(BaseSettings):
     # CORS settings
     cors_origins: List[str] = ["http://localhost:3000"]  # Default value
 
-    # Logging
-    log_level: str = os.getenv("LOG_LEVEL", "INFO")
-
     class Config:
         case_sensitive = True
 
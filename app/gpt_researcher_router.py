@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, Depends, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from app.agents.gpt_researcher_agent import GPTResearcherAgent
+from app.agents.research_jobs import ResearchJobManager, ResearchQueueFull
+from app.agents.research_cache import research_cache_key
+from app.auth.supabase import auth
+from app.config import settings
 import os
+import json
 import logging
-import threading
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
@@ -13,6 +17,14 @@ router = APIRouter()
 # Get WebSocket URL from environment variable with a default
 WS_URL = os.getenv("GPT_RESEARCHER_WS_URL", "wss://web-production-c0ad.up.railway.app/ws")
 gpt_agent = GPTResearcherAgent(WS_URL)
+research_jobs = ResearchJobManager(run=gpt_agent.arun_task, follow=gpt_agent.afollow_task)
+
+def owned_job(research_id: str, current_user):
+    """The caller's job with this id; other users' jobs are reported as unknown."""
+    job = research_jobs.get(research_id)
+    if job is None or job.user_id != current_user.user.id:
+        raise HTTPException(status_code=404, detail="Unknown research id")
+    return job
 
 @router.post("/gpt-researcher")
 async def gpt_researcher_endpoint(
@@ -23,41 +35,82 @@ async def gpt_researcher_endpoint(
     user_id: str = Body(...),
     topic: str = Body(...),
     jwt_token: str = Body(...),
-    headers: dict = Body(default={})
+    headers: dict = Body(default={}),
+    current_user=Depends(auth.get_current_user)
 ):
+    if user_id != current_user.user.id:
+        raise HTTPException(status_code=403, detail="user_id does not match the authenticated user")
     try:
         logger.info(f"Starting research task: {task}")
         logger.info(f"Headers received: {headers}")
         
-        # Start the research process in a separate thread
-        def run_research():
-            try:
-                gpt_agent.run_task(
-                    task=task,
-                    report_type=report_type,
-                    report_source=report_source,
-                    tone=tone,
-                    user_id=user_id,
-                    topic=topic,
-                    jwt_token=jwt_token
-                )
-            except Exception as e:
-                logger.error(f"Error in research thread: {str(e)}", exc_info=True)
-        
-        # Start the research process in background
-        thread = threading.Thread(target=run_research)
-        thread.start()
+        # The job is queued and started when a slot is free; its id is known right away
+        job = research_jobs.submit(
+            user_id,
+            task=task,
+            report_type=report_type,
+            report_source=report_source,
+            tone=tone,
+            topic=topic,
+            jwt_token=jwt_token,
+            headers=headers,
+            # Identical requests share a running job and a cached report (per user unless the source is the web)
+            cache_key=research_cache_key(task, report_type, report_source, tone, headers, user_id=user_id)
+        )
         
         # Return immediately with the research ID
         return {
             "status": "process_started",
             "message": "Research process has been initiated",
-            "research_id": gpt_agent.research_id
+            "research_id": job.research_id,
+            "job_status": job.status
         }
         
+    except ResearchQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         logger.error(f"Error in gpt_researcher_endpoint: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
-        ) 
\ No newline at end of file
+        )
+
+@router.get("/gpt-researcher/{research_id}")
+async def research_status(research_id: str, current_user=Depends(auth.get_current_user)):
+    return owned_job(research_id, current_user).to_dict()
+
+@router.get("/gpt-researcher/{research_id}/events")
+async def research_events(
+    research_id: str,
+    offset: int = 0,
+    last_event_id: Optional[str] = Header(default=None),
+    current_user=Depends(auth.get_current_user)
+):
+    """
+    Server-sent events of a research job: status changes, logs and report chunks.
+    Each event's id is its offset; reconnecting clients resume after Last-Event-ID
+    (or from ``?offset=``). The stream ends once the job has finished.
+    """
+    job = owned_job(research_id, current_user)
+    if last_event_id is not None and last_event_id.isdigit():
+        offset = int(last_event_id) + 1
+
+    async def events():
+        async for event_offset, event in job.follow(offset, heartbeat=settings.research_events_heartbeat):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {event_offset}\nevent: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.delete("/gpt-researcher/{research_id}")
+async def cancel_research(research_id: str, current_user=Depends(auth.get_current_user)):
+    owned_job(research_id, current_user)
+    if not research_jobs.cancel(research_id):
+        raise HTTPException(status_code=404, detail="No queued or running research job with this id")
+    return {"status": "cancelling", "research_id": research_id}
@@ -1,20 +1,49 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import uuid
 from app.agents.qa_agent import ConversationalAgent
-from app.config import CORS_ORIGINS
+from app.agents.utilities.embedding_service import embedding_service
+from app.supabase_integration.rest import rest_client
+from app.agents.memory import async_memory
+from app.config import CORS_ORIGINS, settings
 from app.auth.supabase import auth
+from app.tracing import trace_request
+from app.metrics import MetricsMiddleware, registry
 import traceback
 from dotenv import load_dotenv
 import os
-import io
-from contextlib import redirect_stdout
-from app.gpt_researcher_router import router as gpt_researcher_router
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from app.gpt_researcher_router import router as gpt_researcher_router, research_jobs
 import logging
 
-app = FastAPI(title="Business Consultant Chat API")
+# Logging is configured once for the whole process; modules only call getLogger
+logging.basicConfig(level=settings.log_level)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await rest_client.start()
+    await asyncio.to_thread(agent.vector_search.load)
+    await agent.embedding_writer.start()
+    yield
+    # Stop research jobs, finish streamed replies and write out queued embeddings, then close the pooled OpenAI and PostgREST clients
+    await research_jobs.aclose()
+    await agent.drain_finalizers()
+    await agent.embedding_writer.drain(timeout=settings.embedding_writer_drain_timeout)
+    await agent.vector_search.aclose()
+    await asyncio.to_thread(agent.vector_search.save)
+    await embedding_service.aclose()
+    await rest_client.aclose()
+    await async_memory.close()
+
+app = FastAPI(title="Business Consultant Chat API", lifespan=lifespan)
+
+# Request latency histograms and per-response Server-Timing headers
+app.add_middleware(MetricsMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -45,47 +74,124 @@ async def root():
 
 @app.post("/chat")
 async def chat(payload: dict, request: Request, current_user=Depends(auth.get_current_user)):
-    logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
-    logger.info("[/chat] Received request with payload: %s", payload)
+    logger.info("[/chat] Received request for session_id: %s", payload.get("session_id"))
     try:
         # Get JWT token from Authorization header
         jwt_token = request.headers.get("authorization", "").replace("Bearer ", "")
         user_id = current_user.user.id
         
         # Generate a new session ID if not provided
-        session_id = payload["session_id"] or str(uuid.uuid4())
+        session_id = payload.get("session_id") or str(uuid.uuid4())
         
-        # Capture agent debug output
-        f = io.StringIO()
-        with redirect_stdout(f):
+        # Agent steps are only collected for traced requests (debug header/flag or sampling)
+        with trace_request(request.headers.get("x-debug-trace") or payload.get("debug")) as trace:
             response = await agent.run(
                 user_message=payload["message"],
                 user_id=user_id,
                 session_id=session_id,
                 jwt_token=jwt_token
             )
-        debug_output = f.getvalue()
         logger.info("[/chat] Sending response for session_id: %s", session_id)
         
-        # Return the agent's reply and debug output
-        return {
+        # Return the agent's reply, plus the trace when one was recorded
+        body = {
             "reply": response["reply"],
-            "session_id": session_id,
-            "debug_output": debug_output
+            "session_id": session_id
         }
+        if trace is not None:
+            body["debug_output"] = trace.to_list()
+        return body
     except Exception as e:
         logger.error("Exception in /chat: %s", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Columns a client may set on imported rows; anything else (id, embedding, status, ...) is dropped
+IMPORT_FIELDS = ("session_id", "role", "content", "created_at")
+
+@app.post("/conversations/import")
+async def import_conversations(payload: dict, request: Request, current_user=Depends(auth.get_current_user)):
+    """Bulk-load past conversations: {"conversations": [{"session_id", "role", "content", "created_at"?}], "embed": true}."""
+    jwt_token = request.headers.get("authorization", "").replace("Bearer ", "")
+    user_id = current_user.user.id
+    conversations = payload.get("conversations", [])
+    if not isinstance(conversations, list) or not all(isinstance(row, dict) for row in conversations):
+        raise HTTPException(status_code=422, detail="conversations must be a list of objects")
+    rows = [
+        dict({key: row[key] for key in IMPORT_FIELDS if key in row}, user_id=user_id)
+        for row in conversations
+    ]
+    if any(
+        not isinstance(row.get("session_id"), str) or not row["session_id"]
+        or row.get("role") not in ("user", "assistant")
+        or not isinstance(row.get("content"), str)
+        for row in rows
+    ):
+        raise HTTPException(
+            status_code=422, detail="Each row needs a session_id, a role of user or assistant and string content"
+        )
+    try:
+        inserted = await agent.import_conversations(rows, jwt_token, embed=payload.get("embed", True))
+    except Exception as e:
+        logging.getLogger(__name__).error("Exception in /conversations/import: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"imported": len(inserted)}
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream(payload: dict, request: Request, current_user=Depends(auth.get_current_user)):
+    """Same as /chat, but streams the reply as server-sent events (token, tool_start, tool_end, done, and debug when traced)."""
+    logger = logging.getLogger(__name__)
+    logger.info("[/chat/stream] Received request for session_id: %s", payload.get("session_id"))
+    jwt_token = request.headers.get("authorization", "").replace("Bearer ", "")
+    user_id = current_user.user.id
+    session_id = payload.get("session_id") or str(uuid.uuid4())
+
+    async def events():
+        try:
+            # With tracing on, the recorded steps are sent as a final "debug" event
+            with trace_request(request.headers.get("x-debug-trace") or payload.get("debug")) as trace:
+                async for event, data in agent.run_stream(
+                    user_message=payload["message"],
+                    user_id=user_id,
+                    session_id=session_id,
+                    jwt_token=jwt_token
+                ):
+                    yield sse_event(event, data)
+                if trace is not None:
+                    yield sse_event("debug", {"debug_output": trace.to_list()})
+        except Exception as e:
+            logger.error("Exception in /chat/stream: %s", e)
+            traceback.print_exc()
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/health")
 async def health_check():
     return {
         "status": "healthy",
-        "environment": "production"
+        "environment": "production",
+        "supabase_rest_pool": rest_client.pool_stats(),
+        "research_jobs": research_jobs.stats(),
+        "vector_search": agent.vector_search.stats(),
+        "redis": async_memory.stats(),
+        "response_cache": agent.response_cache.stats(),
+        "turn_router": agent.router.stats()
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latencies, request latencies and token counts in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/dev_login")
 async def dev_login():
     """Authenticate using Supabase email/password from .env and return JWT/user_id."""
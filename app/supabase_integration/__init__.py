@@ -1,5 +1,10 @@
 from .auth import SupabaseAuth, get_auth
 from .client import get_supabase_client
 from .config import SupabaseConfig
+from .rest import SupabaseRestClient, rest_client
+from .token_verifier import SupabaseTokenVerifier, TokenVerificationError, token_verifier
  
-__all__ = ['SupabaseAuth', 'get_auth', 'get_supabase_client', 'SupabaseConfig'] 
\ No newline at end of file
+__all__ = [
+    'SupabaseAuth', 'get_auth', 'get_supabase_client', 'SupabaseConfig', 'SupabaseRestClient', 'rest_client',
+    'SupabaseTokenVerifier', 'TokenVerificationError', 'token_verifier'
+] 
\ No newline at end of file
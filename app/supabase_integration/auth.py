@@ -1,10 +1,12 @@
 import os
+import asyncio
 from dotenv import load_dotenv
 from .config import SupabaseConfig
 from fastapi import HTTPException, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from supabase import Client
 from .client import get_supabase_client
+from .token_verifier import token_verifier, TokenVerificationError, LocalVerificationUnavailable
 
 security = HTTPBearer()
 
@@ -41,9 +43,21 @@ class SupabaseAuth:
         self.supabase: Client = get_supabase_client()
     
     async def get_current_user(self, credentials: HTTPAuthorizationCredentials = Depends(security)):
-        """Verify the JWT token and return the user."""
+        """Verify the JWT token locally and return the user."""
         try:
-            user = self.supabase.auth.get_user(credentials.credentials)
+            return await token_verifier.get_user(credentials.credentials)
+        except LocalVerificationUnavailable:
+            return await self.get_current_user_remote(credentials)
+        except TokenVerificationError:
+            raise HTTPException(
+                status_code=401,
+                detail="Invalid authentication credentials"
+            )
+
+    async def get_current_user_remote(self, credentials: HTTPAuthorizationCredentials = Depends(security)):
+        """Verify the JWT token with Supabase Auth (catches revoked sessions) and return the user."""
+        try:
+            user = await asyncio.to_thread(self.supabase.auth.get_user, credentials.credentials)
             if not user:
                 raise HTTPException(
                     status_code=401,
@@ -4,8 +4,6 @@ import os
 import logging
 from dotenv import load_dotenv
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class SupabaseConfig(BaseSettings):
@@ -13,6 +11,21 @@ class SupabaseConfig(BaseSettings):
     supabase_key: str
     supabase_jwt_secret: str | None = None
 
+    # PostgREST connection pool (SUPABASE_REST_* env vars)
+    rest_http2: bool = True
+    rest_max_connections: int = 50
+    rest_max_keepalive: int = 20
+    rest_keepalive_expiry: float = 30.0
+    rest_timeout: float = 15.0
+    rest_connect_timeout: float = 5.0
+
+    # Local access token verification (SUPABASE_JWT_* / SUPABASE_JWKS_* env vars)
+    jwt_audience: str = "authenticated"
+    jwt_leeway: int = 10
+    jwt_cache_ttl: float = 60.0
+    jwt_cache_size: int = 10000
+    jwks_ttl: float = 600.0
+
     class Config:
         env_file = ".env"
         env_prefix = "SUPABASE_"
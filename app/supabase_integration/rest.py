@@ -0,0 +1,128 @@
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from .config import SupabaseConfig, get_supabase_config
+from app.metrics import span
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class SupabaseRestClient:
+    """
+    App-lifetime PostgREST client.
+
+    Wraps one pooled ``httpx.AsyncClient`` (HTTP/2 when ``h2`` is installed)
+    so every ``/rest/v1`` call reuses warm connections instead of paying a new
+    TCP+TLS handshake. Create it at startup and close it at shutdown; it is
+    also created lazily on first use for scripts and tests.
+    """
+
+    def __init__(self, config: Optional[SupabaseConfig] = None, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._config = config
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self.requests_total = 0
+        self.requests_failed = 0
+        self.in_flight = 0
+
+    @property
+    def config(self) -> SupabaseConfig:
+        if self._config is None:
+            self._config = get_supabase_config()
+        return self._config
+
+    async def start(self):
+        if self._client is not None:
+            return
+        config = self.config
+        http2 = config.rest_http2 and HTTP2_AVAILABLE and self._transport is None
+        self._client = httpx.AsyncClient(
+            base_url=f"{config.supabase_url.rstrip('/')}/rest/v1",
+            http2=http2,
+            transport=self._transport,
+            limits=httpx.Limits(
+                max_connections=config.rest_max_connections,
+                max_keepalive_connections=config.rest_max_keepalive,
+                keepalive_expiry=config.rest_keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(config.rest_timeout, connect=config.rest_connect_timeout),
+            headers={"apikey": config.supabase_key},
+        )
+        logger.info("[SupabaseRestClient] Started (http2=%s, max_connections=%d)", http2, config.rest_max_connections)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def started(self) -> bool:
+        return self._client is not None
+
+    def headers(self, jwt_token: Optional[str], prefer: Optional[str] = None) -> Dict[str, str]:
+        headers = {"Authorization": f"Bearer {jwt_token or self.config.supabase_key}"}
+        if prefer:
+            headers["Prefer"] = prefer
+        return headers
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        jwt_token: Optional[str] = None,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        prefer: Optional[str] = None,
+    ) -> httpx.Response:
+        """Send ``method`` to ``/rest/v1/{path}`` with the user's JWT for RLS."""
+        if self._client is None:
+            await self.start()
+        self.requests_total += 1
+        self.in_flight += 1
+        try:
+            with span(f"postgrest.{method.lower()}"):
+                return await self._client.request(
+                    method, f"/{path.lstrip('/')}", params=params, json=json, headers=self.headers(jwt_token, prefer)
+                )
+        except httpx.HTTPError:
+            self.requests_failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    async def get(self, path, jwt_token=None, params=None):
+        return await self.request("GET", path, jwt_token, params=params)
+
+    async def post(self, path, json, jwt_token=None, params=None, prefer="return=representation"):
+        return await self.request("POST", path, jwt_token, params=params, json=json, prefer=prefer)
+
+    async def patch(self, path, json, jwt_token=None, params=None, prefer="return=representation"):
+        return await self.request("PATCH", path, jwt_token, params=params, json=json, prefer=prefer)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        stats = {
+            "started": self.started,
+            "requests_total": self.requests_total,
+            "requests_failed": self.requests_failed,
+            "in_flight": self.in_flight,
+        }
+        # httpx does not expose pool state publicly; read it from the httpcore pool when present
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            stats["connections"] = len(connections)
+            stats["idle_connections"] = sum(1 for conn in connections if conn.is_idle())
+            stats["http2_connections"] = sum(1 for conn in connections if "HTTP/2" in conn.info())
+        return stats
+
+
+# Create a singleton instance
+rest_client = SupabaseRestClient()
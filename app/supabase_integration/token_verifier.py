@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+import httpx
+from jose import JWTError, jwt
+
+from .config import SupabaseConfig, get_supabase_config
+
+logger = logging.getLogger(__name__)
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+ASYMMETRIC_ALGORITHMS = {"RS256", "RS384", "RS512", "ES256", "ES384", "ES512"}
+
+
+class TokenVerificationError(Exception):
+    """Raised when a Supabase access token cannot be verified."""
+
+
+class LocalVerificationUnavailable(TokenVerificationError):
+    """Raised when the token may be valid but cannot be checked locally (no JWT secret configured)."""
+
+
+@dataclass
+class VerifiedUser:
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    user_metadata: Dict[str, Any] = field(default_factory=dict)
+    app_metadata: Dict[str, Any] = field(default_factory=dict)
+    claims: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_claims(cls, claims: Dict[str, Any]) -> "VerifiedUser":
+        return cls(
+            id=claims["sub"],
+            email=claims.get("email"),
+            role=claims.get("role"),
+            user_metadata=claims.get("user_metadata") or {},
+            app_metadata=claims.get("app_metadata") or {},
+            claims=claims,
+        )
+
+
+@dataclass
+class VerifiedUserResponse:
+    """Same shape as supabase's UserResponse (``.user.id``) so callers need not care how it was verified."""
+    user: VerifiedUser
+
+
+class SupabaseTokenVerifier:
+    """
+    Verify Supabase access tokens locally.
+
+    HS256 tokens are checked against ``SupabaseConfig.supabase_jwt_secret``;
+    asymmetric tokens against the project's JWKS, which is fetched once and
+    cached. Decoded claims are cached by token hash until the token expires
+    or ``jwt_cache_ttl`` elapses, so repeat requests cost a dict lookup.
+    """
+
+    def __init__(self, config: Optional[SupabaseConfig] = None, http_client: Optional[httpx.AsyncClient] = None):
+        self._config = config
+        self._http_client = http_client
+        self._claims: "OrderedDict[str, tuple]" = OrderedDict()
+        self._jwks: Dict[str, Dict[str, Any]] = {}
+        self._jwks_fetched_at = 0.0
+        self._jwks_lock: Optional[asyncio.Lock] = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def config(self) -> SupabaseConfig:
+        if self._config is None:
+            self._config = get_supabase_config()
+        return self._config
+
+    @staticmethod
+    def _token_key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._claims.get(key)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if time.time() >= expires_at:
+            del self._claims[key]
+            return None
+        self._claims.move_to_end(key)
+        return claims
+
+    def _store(self, key: str, claims: Dict[str, Any]):
+        expires_at = time.time() + self.config.jwt_cache_ttl
+        if "exp" in claims:
+            expires_at = min(expires_at, float(claims["exp"]))
+        self._claims[key] = (claims, expires_at)
+        self._claims.move_to_end(key)
+        while len(self._claims) > self.config.jwt_cache_size:
+            self._claims.popitem(last=False)
+
+    async def _get_jwk(self, kid: Optional[str]) -> Dict[str, Any]:
+        stale = time.monotonic() - self._jwks_fetched_at > self.config.jwks_ttl
+        if kid not in self._jwks or stale:
+            if self._jwks_lock is None:
+                self._jwks_lock = asyncio.Lock()
+            async with self._jwks_lock:
+                if kid not in self._jwks or time.monotonic() - self._jwks_fetched_at > self.config.jwks_ttl:
+                    await self._refresh_jwks()
+        if kid not in self._jwks:
+            raise TokenVerificationError(f"Unknown signing key: {kid}")
+        return self._jwks[kid]
+
+    async def _refresh_jwks(self):
+        url = f"{self.config.supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        client = self._http_client or httpx.AsyncClient(timeout=5.0)
+        try:
+            resp = await client.get(url)
+            resp.raise_for_status()
+            self._jwks = {key.get("kid"): key for key in resp.json().get("keys", [])}
+            self._jwks_fetched_at = time.monotonic()
+        except httpx.HTTPError as e:
+            raise TokenVerificationError(f"Could not fetch JWKS: {e}")
+        finally:
+            if self._http_client is None:
+                await client.aclose()
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """Return the token's claims, or raise TokenVerificationError."""
+        key = self._token_key(token)
+        claims = self._cached(key)
+        if claims is not None:
+            self.cache_hits += 1
+            return claims
+        self.cache_misses += 1
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError as e:
+            raise TokenVerificationError(f"Malformed token: {e}")
+        algorithm = header.get("alg")
+        if algorithm in SYMMETRIC_ALGORITHMS:
+            if not self.config.supabase_jwt_secret:
+                raise LocalVerificationUnavailable("SUPABASE_JWT_SECRET is not configured")
+            signing_key: Any = self.config.supabase_jwt_secret
+        elif algorithm in ASYMMETRIC_ALGORITHMS:
+            signing_key = await self._get_jwk(header.get("kid"))
+        else:
+            raise TokenVerificationError(f"Unsupported signing algorithm: {algorithm}")
+        try:
+            claims = jwt.decode(
+                token,
+                signing_key,
+                algorithms=[algorithm],
+                audience=self.config.jwt_audience,
+                options={"leeway": self.config.jwt_leeway},
+            )
+        except JWTError as e:
+            raise TokenVerificationError(str(e))
+        if "sub" not in claims:
+            raise TokenVerificationError("Token has no subject")
+        self._store(key, claims)
+        return claims
+
+    async def get_user(self, token: str) -> VerifiedUserResponse:
+        return VerifiedUserResponse(user=VerifiedUser.from_claims(await self.verify(token)))
+
+    def stats(self) -> Dict[str, int]:
+        return {"cache_hits": self.cache_hits, "cache_misses": self.cache_misses, "cached_tokens": len(self._claims)}
+
+
+# Create a singleton instance
+token_verifier = SupabaseTokenVerifier()
@@ -0,0 +1,111 @@
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+from app.config import settings
+
+# Trace of the request being handled; None (the common case) means tracing is off
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+
+TRUTHY = ("1", "true", "yes", "on")
+
+
+def _clip(value: Any, limit: int) -> Any:
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else repr(value)
+    return text if len(text) <= limit else text[:limit] + f"... ({len(text)} chars)"
+
+
+class Trace:
+    """Bounded buffer of steps recorded while one request is handled."""
+
+    def __init__(self, max_events: Optional[int] = None, max_chars: Optional[int] = None):
+        self.max_chars = max_chars or settings.trace_max_chars
+        self.events = deque(maxlen=max_events or settings.trace_max_events)
+        self.dropped = 0
+        self.start = time.perf_counter()
+
+    def add(self, kind: str, **data):
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        event = {"t_ms": round((time.perf_counter() - self.start) * 1000, 1), "kind": kind}
+        event.update({key: _clip(value, self.max_chars) for key, value in data.items()})
+        self.events.append(event)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        events = list(self.events)
+        if self.dropped:
+            events.insert(0, {"kind": "dropped", "count": self.dropped})
+        return events
+
+
+def should_trace(requested: Any = None) -> bool:
+    """Trace when the caller asked for it (debug flag/header, if allowed) or the request is sampled."""
+    if requested is not None and str(requested).lower() in TRUTHY and settings.trace_allow_debug:
+        return True
+    return settings.trace_sample_rate > 0 and random.random() < settings.trace_sample_rate
+
+
+@contextmanager
+def trace_request(requested: Any = None):
+    """Yield a ``Trace`` scoped to this request's context, or None when tracing is off."""
+    if not should_trace(requested):
+        yield None
+        return
+    trace = Trace()
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+def record(kind: str, **data):
+    """Add a step to the current trace; a no-op when tracing is off."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(kind, **data)
+
+
+class TraceCallbackHandler(AsyncCallbackHandler):
+    """Records agent, LLM and tool steps into a ``Trace``."""
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+
+    async def on_chat_model_start(self, serialized, messages, **kwargs):
+        self.trace.add("llm_start", messages=sum(len(batch) for batch in messages))
+
+    async def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") if response.llm_output else None
+        text = response.generations[0][0].text if response.generations and response.generations[0] else ""
+        self.trace.add("llm_end", output=text, token_usage=usage)
+
+    async def on_llm_error(self, error, **kwargs):
+        self.trace.add("llm_error", error=str(error))
+
+    async def on_agent_action(self, action, **kwargs):
+        self.trace.add("agent_action", tool=action.tool, input=action.tool_input)
+
+    async def on_tool_end(self, output, **kwargs):
+        self.trace.add("tool_end", output=output)
+
+    async def on_tool_error(self, error, **kwargs):
+        self.trace.add("tool_error", error=str(error))
+
+    async def on_agent_finish(self, finish, **kwargs):
+        self.trace.add("agent_finish", output=finish.return_values.get("output"))
+
+
+def trace_callbacks() -> Optional[Dict[str, Any]]:
+    """Runnable config that traces into the current trace, or None when tracing is off."""
+    trace = current_trace.get()
+    if trace is None:
+        return None
+    return {"callbacks": [TraceCallbackHandler(trace)]}
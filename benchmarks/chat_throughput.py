@@ -0,0 +1,66 @@
+"""
+Concurrent /chat throughput benchmark against stubbed OpenAI and Supabase.
+
+Usage:
+    python -m benchmarks.chat_throughput --requests 64 --concurrency 1 4 16 64
+
+With a blocking agent, throughput stays flat as concurrency grows; with the
+async execution path it should scale close to linearly until the stubs'
+latency is no longer the bottleneck.
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+from types import SimpleNamespace
+
+from benchmarks.stubs import StubServer, configure_environment, create_stub_app
+
+
+async def run_level(client, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            resp = await client.post("/chat", json={"message": "How do I grow revenue?", "session_id": str(uuid.uuid4())})
+            if resp.status_code != 200:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    return total / elapsed, elapsed, failures
+
+
+async def main(args):
+    import httpx
+    from app.main import app
+    from app.auth.supabase import auth
+
+    app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(user=SimpleNamespace(id=str(uuid.uuid4())))
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            out = sys.stdout
+            print(f"{'concurrency':>12} {'req/s':>10} {'elapsed(s)':>12} {'failures':>9}", file=out)
+            for concurrency in args.concurrency:
+                throughput, elapsed, failures = await run_level(client, args.requests, concurrency)
+                print(f"{concurrency:>12} {throughput:>10.1f} {elapsed:>12.2f} {failures:>9}", file=out)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    stub_app = create_stub_app(llm_latency=args.llm_latency)
+    with StubServer(stub_app, port=args.port) as stub:
+        configure_environment(stub.url)
+        asyncio.run(main(args))
+        print("Stub calls:", stub_app.state.calls)
@@ -0,0 +1,275 @@
+"""
+Load scenarios for /chat, /chat/stream and /gpt-researcher against the local
+stand-ins in benchmarks/stubs.py (no network, no OpenAI/Supabase accounts).
+
+Usage:
+    python -m benchmarks.scenarios chat research --concurrency 1 8 32
+    python -m benchmarks.scenarios all --save-baseline
+    python -m benchmarks.scenarios all --compare --tolerance 0.25
+
+Each scenario/concurrency level reports p50/p95/p99 latency, throughput and,
+from a separate smaller pass under tracemalloc (so tracing overhead does not
+skew latencies), peak and retained allocations per request. ``--compare``
+checks the results against the stored baseline and exits non-zero when p95
+latency or throughput regressed by more than ``--tolerance``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+
+from benchmarks.stubs import FakeResearcher, StubServer, configure_environment, create_stub_app, use_fake_redis
+
+SCENARIOS = ("chat", "chat_stream", "research")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+QUESTIONS = [
+    "How do I grow revenue?",
+    "What should our pricing strategy be for a new product line?",
+    "How can we reduce customer churn in a subscription business?",
+    "Thanks!",
+]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of ``values`` (0 < q <= 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies, elapsed, failures, first_byte=None):
+    result = {
+        "requests": len(latencies) + failures,
+        "failures": failures,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0) * 1000, 1),
+    }
+    if first_byte:
+        result["first_event_p50_ms"] = round(percentile(first_byte, 50) * 1000, 1)
+        result["first_event_p95_ms"] = round(percentile(first_byte, 95) * 1000, 1)
+    return result
+
+
+async def drive(worker, total, concurrency):
+    """Run ``total`` calls of ``worker(worker_index, call_index)`` over ``concurrency`` workers."""
+    latencies, first_byte, failures = [], [], 0
+    counter = iter(range(total))
+
+    async def loop(index):
+        nonlocal failures
+        for call in counter:
+            start = time.perf_counter()
+            try:
+                first = await worker(index, call)
+            except Exception:
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if first is not None:
+                first_byte.append(first - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop(i) for i in range(concurrency)))
+    return latencies, first_byte, failures, time.perf_counter() - start
+
+
+def auth_headers(user_id):
+    # The benchmark's auth override takes the bearer token as the user id
+    return {"Authorization": f"Bearer {user_id}"}
+
+
+def chat_worker(client, stream=False):
+    # Each worker is one user holding a conversation: its turns share a session
+    sessions = {}
+
+    async def one(index, call):
+        session_id = sessions.setdefault(index, str(uuid.uuid4()))
+        payload = {"message": QUESTIONS[call % len(QUESTIONS)], "session_id": session_id}
+        headers = auth_headers(f"bench-user-{index}")
+        if not stream:
+            resp = await client.post("/chat", json=payload, headers=headers)
+            resp.raise_for_status()
+            return None
+        first = None
+        async with client.stream("POST", "/chat/stream", json=payload, headers=headers) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if first is None and line.startswith("event: token"):
+                    first = time.perf_counter()
+                if line.startswith("event: error"):
+                    raise RuntimeError("stream failed")
+        return first
+
+    return one
+
+
+def research_worker(client, distinct):
+    # Tasks are unique per run so every level starts with a cold report cache;
+    # within a level, duplicates exercise in-flight dedup and caching
+    run = uuid.uuid4().hex[:8]
+
+    async def one(index, call):
+        body = {
+            "task": f"Market analysis {run} {call % distinct}",
+            "report_type": "research_report",
+            "report_source": "web",
+            "tone": "Objective",
+            "user_id": f"bench-user-{index}",
+            "topic": "benchmark",
+            "jwt_token": "stub",
+        }
+        headers = auth_headers(body["user_id"])
+        resp = await client.post("/gpt-researcher", json=body, headers=headers)
+        resp.raise_for_status()
+        research_id = resp.json()["research_id"]
+        first, status = None, None
+        async with client.stream("GET", f"/gpt-researcher/{research_id}/events", headers=headers) as events:
+            async for line in events.aiter_lines():
+                if first is None and line.startswith("event: ") and line != "event: status":
+                    first = time.perf_counter()
+                if line.startswith("data: ") and '"type": "status"' in line:
+                    status = json.loads(line[len("data: "):]).get("status")
+        if status != "completed":
+            raise RuntimeError(f"research ended as {status}")
+        return first
+
+    return one
+
+
+async def run_scenarios(args):
+    import httpx
+    from fastapi import Depends
+    from fastapi.security import HTTPAuthorizationCredentials
+    from app.main import app
+    from app.auth.supabase import auth, security
+
+    def bench_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+        return SimpleNamespace(user=SimpleNamespace(id=credentials.credentials))
+
+    fake_redis = use_fake_redis()
+    app.dependency_overrides[auth.get_current_user] = bench_user
+    results = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=300) as client:
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    total = args.research_requests if name == "research" else args.requests
+                    make = {
+                        "chat": lambda: chat_worker(client),
+                        "chat_stream": lambda: chat_worker(client, stream=True),
+                        "research": lambda: research_worker(client, args.distinct),
+                    }[name]
+                    latencies, first_byte, failures, elapsed = await drive(make(), total, concurrency)
+                    result = summarize(latencies, elapsed, failures, first_byte)
+                    if args.alloc_requests:
+                        result.update(await measure_allocations(make(), min(args.alloc_requests, total), concurrency))
+                    results[f"{name}@{concurrency}"] = result
+                    print_result(name, concurrency, result)
+    return {"fake_redis": fake_redis, "results": results}
+
+
+async def measure_allocations(worker, total, concurrency):
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    await drive(worker, total, concurrency)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "alloc_peak_kb": round((peak - before) / 1024, 1),
+        "alloc_retained_kb_per_request": round((after - before) / 1024 / max(total, 1), 2),
+    }
+
+
+def print_result(name, concurrency, result):
+    print(
+        f"{name:>12} c={concurrency:<4} {result['throughput_rps']:>8.1f} req/s  "
+        f"p50={result['p50_ms']:.0f}ms p95={result['p95_ms']:.0f}ms p99={result['p99_ms']:.0f}ms  "
+        f"failures={result['failures']}  peak={result.get('alloc_peak_kb', '-')}KB"
+    )
+
+
+def compare(results, baseline, tolerance):
+    """Return the regressions of ``results`` against ``baseline`` as printable lines."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{key}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["failures"] > previous.get("failures", 0):
+            regressions.append(f"{key}: failures {previous.get('failures', 0)} -> {current['failures']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="+", choices=SCENARIOS + ("all",))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=128, help="Requests per level for the chat scenarios")
+    parser.add_argument("--research-requests", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=8, help="Distinct research tasks (the rest are duplicates)")
+    parser.add_argument("--alloc-requests", type=int, default=16, help="Requests in the tracemalloc pass (0 = skip)")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embedding-latency", type=float, default=0.02)
+    parser.add_argument("--rest-latency", type=float, default=0.01)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--researcher-delay", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--researcher-port", type=int, default=8767)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+    if "all" in args.scenarios:
+        args.scenarios = list(SCENARIOS)
+
+    stub_app = create_stub_app(
+        llm_latency=args.llm_latency, embedding_latency=args.embedding_latency,
+        rest_latency=args.rest_latency, jitter=args.jitter,
+    )
+    researcher = FakeResearcher(port=args.researcher_port, delay=args.researcher_delay)
+    with StubServer(stub_app, port=args.port) as stub, researcher:
+        configure_environment(stub.url, researcher.url)
+        report = asyncio.run(run_scenarios(args))
+    print("Stub calls:", stub_app.state.calls, "researcher sessions:", researcher.sessions)
+
+    report["config"] = {
+        key: getattr(args, key)
+        for key in ("requests", "research_requests", "distinct", "llm_latency", "embedding_latency", "rest_latency", "jitter", "researcher_delay")
+    }
+    report["python"] = platform.python_version()
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("Warning: baseline was recorded with different settings:", baseline.get("config"))
+        regressions = compare(report["results"], baseline["results"], args.tolerance)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
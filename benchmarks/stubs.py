@@ -0,0 +1,353 @@
+"""
+Local stand-ins for OpenAI, Supabase PostgREST, GPT Researcher and Redis used
+by the benchmarks.
+
+OpenAI and PostgREST are served from one FastAPI app on a background uvicorn
+thread, and the researcher from a websocket server on another thread, so the
+application under test talks to them over real sockets. Redis is replaced
+in-process by fakeredis.
+"""
+import asyncio
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+EMBEDDING_DIM = 1536
+STUB_REPLY = "Stub advice: focus on your core customers."
+FILTER_OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "neq": lambda a, b: a != b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+# Query parameters that are not column filters
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+
+def _delay(latency, jitter):
+    return max(0.0, latency + random.uniform(-jitter, jitter)) if jitter else latency
+
+
+def _coerce(value, like):
+    """Parse a filter operand to the type of the column value it is compared with."""
+    if isinstance(like, bool):
+        return value == "true"
+    if isinstance(like, int):
+        return int(value)
+    if isinstance(like, float):
+        return float(value)
+    return value
+
+
+class PostgrestTables:
+    """
+    In-memory tables with the subset of PostgREST used by the app: column
+    filters (``eq``/``neq``/``gt``/``gte``/``lt``/``lte``), ``select``,
+    ``order`` (``col`` or ``col.desc``), ``limit``, bulk inserts with
+    ``columns`` + ``missing=default``, and ``return=minimal``.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.ids = itertools.count(1)
+
+    def table(self, name):
+        return self.tables.setdefault(name, OrderedDict())
+
+    def insert(self, name, rows, columns=None):
+        inserted = []
+        for row in rows:
+            if columns:
+                row = {column: row.get(column) for column in columns}
+                if name == "conversations" and row.get("status") is None:
+                    row["status"] = "complete"
+            row = dict(row)
+            row.setdefault("id", next(self.ids))
+            row.setdefault("created_at", time.time())
+            self.table(name)[row["id"]] = row
+            inserted.append(row)
+        return inserted
+
+    def query(self, name, params):
+        rows = list(self.table(name).values())
+        for column, condition in params.items():
+            if column in RESERVED_PARAMS or "." not in condition:
+                continue
+            op, operand = condition.split(".", 1)
+            compare = FILTER_OPERATORS.get(op)
+            if compare is None:
+                continue
+            rows = [
+                row for row in rows
+                if row.get(column) is not None and compare(row[column], _coerce(operand, row[column]))
+            ]
+        for term in reversed([t for t in params.get("order", "").split(",") if t]):
+            column, _, direction = term.partition(".")
+            rows.sort(key=lambda row: row.get(column) or 0, reverse=direction.startswith("desc"))
+        if "limit" in params:
+            rows = rows[: int(params["limit"])]
+        return rows
+
+    @staticmethod
+    def project(rows, select):
+        if not select or select == "*":
+            return rows
+        columns = select.split(",")
+        return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def create_stub_app(llm_latency=0.2, embedding_latency=0.02, rest_latency=0.01, jitter=0.0):
+    """
+    OpenAI (chat completions, embeddings) and PostgREST stand-ins. Each call
+    sleeps for its latency, +/- ``jitter`` seconds drawn uniformly.
+    """
+    app = FastAPI()
+    db = PostgrestTables()
+    app.state.db = db
+    app.state.calls = {"chat": 0, "embeddings": 0, "rest": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls["chat"] += 1
+        await asyncio.sleep(_delay(llm_latency, jitter))
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(_stream_completion(body, include_usage), media_type="text/event-stream")
+        return {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": STUB_REPLY},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(body),
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        app.state.calls["embeddings"] += 1
+        await asyncio.sleep(_delay(embedding_latency, jitter))
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "data": [
+                {"object": "embedding", "index": i, "embedding": [0.001 * (len(str(text)) % 97)] * EMBEDDING_DIM}
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": sum(len(str(text).split()) for text in inputs), "total_tokens": 0},
+        }
+
+    async def rest_call():
+        app.state.calls["rest"] += 1
+        await asyncio.sleep(_delay(rest_latency, jitter))
+
+    def respond(request, rows, status):
+        if "return=minimal" in request.headers.get("prefer", ""):
+            return Response(status_code=201 if status == 201 else 204)
+        return JSONResponse(db.project(rows, request.query_params.get("select")), status_code=status)
+
+    @app.post("/rest/v1/rpc/match_conversations")
+    async def match_conversations(request: Request):
+        await rest_call()
+        return []
+
+    @app.post("/rest/v1/rpc/log_turn")
+    async def log_turn(request: Request):
+        body = await request.json()
+        await rest_call()
+        params = {"session_id": f"eq.{body['p_session_id']}", "order": "id.desc", "limit": str(body.get("p_history_limit") or 0)}
+        if body.get("p_after_id") is not None:
+            params["id"] = f"gt.{body['p_after_id']}"
+        history = db.query("conversations", params)
+        base = {"session_id": body["p_session_id"], "user_id": body["p_user_id"], "title": body.get("p_title")}
+        user_row, assistant_row = db.insert("conversations", [
+            dict(base, role="user", content=body["p_content"], status="complete"),
+            dict(base, role="assistant", content="", status="pending"),
+        ])
+        return {
+            "user_row_id": user_row["id"],
+            "assistant_row_id": assistant_row["id"],
+            "history": [{"id": m["id"], "role": m["role"], "content": m["content"]} for m in reversed(history)],
+        }
+
+    @app.post("/rest/v1/rpc/update_embeddings")
+    async def update_embeddings(request: Request):
+        body = await request.json()
+        await rest_call()
+        rows = db.table("conversations")
+        for update in body["p_rows"]:
+            if update["id"] in rows:
+                rows[update["id"]]["embedding"] = update["embedding"]
+        return Response(status_code=204)
+
+    @app.post("/rest/v1/{table}")
+    async def insert(table: str, request: Request):
+        body = await request.json()
+        await rest_call()
+        columns = request.query_params.get("columns")
+        rows = db.insert(table, body if isinstance(body, list) else [body], columns.split(",") if columns else None)
+        return respond(request, rows, 201)
+
+    @app.get("/rest/v1/{table}")
+    async def select(table: str, request: Request):
+        await rest_call()
+        return respond(request, db.query(table, dict(request.query_params)), 200)
+
+    @app.patch("/rest/v1/{table}")
+    async def update(table: str, request: Request):
+        body = await request.json()
+        await rest_call()
+        rows = db.query(table, dict(request.query_params))
+        for row in rows:
+            row.update(body)
+        return respond(request, rows, 200)
+
+    return app
+
+
+def _usage(body):
+    prompt = sum(len(str(m.get("content") or "").split()) for m in body.get("messages", []))
+    completion = len(STUB_REPLY.split())
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+
+async def _stream_completion(body, include_usage=False):
+    base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "stub")}
+    tokens = [{"role": "assistant", "content": ""}] + [{"content": word + " "} for word in STUB_REPLY.split()]
+    for delta in tokens:
+        yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}]))}\n\n"
+    yield f"data: {json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]))}\n\n"
+    if include_usage:
+        yield f"data: {json.dumps(dict(base, choices=[], usage=_usage(body)))}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+class StubServer:
+    """Run an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app, host="127.0.0.1", port=8765):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="off"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+class FakeResearcher:
+    """
+    GPT Researcher websocket stand-in on a background thread: after the
+    ``start {...}`` command it sends ``logs`` messages, then the report in
+    ``chunks`` pieces of ``chunk_size`` characters, ``delay`` seconds apart,
+    and closes the connection.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8767, logs=5, chunks=20, chunk_size=200, delay=0.05):
+        self.host = host
+        self.port = port
+        self.logs = logs
+        self.chunks = chunks
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.sessions = 0
+        self._loop = asyncio.new_event_loop()
+        self._stop = None
+        self._ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def _handler(self, ws):
+        command = await ws.recv()
+        request = json.loads(command[len("start "):])
+        self.sessions += 1
+        for i in range(self.logs):
+            await asyncio.sleep(self.delay)
+            await ws.send(json.dumps({"type": "logs", "content": "progress", "output": f"step {i} of {request['task']}"}))
+        for i in range(self.chunks):
+            await asyncio.sleep(self.delay)
+            await ws.send(json.dumps({"type": "report", "output": str(i % 10) * self.chunk_size}))
+
+    async def _serve(self):
+        import websockets
+        self._stop = asyncio.Event()
+        async with websockets.serve(self._handler, self.host, self.port):
+            self._ready.set()
+            await self._stop.wait()
+
+    def _run(self):
+        self._loop.run_until_complete(self._serve())
+
+    def __enter__(self):
+        self.thread.start()
+        self._ready.wait(timeout=5)
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self.thread.join(timeout=5)
+
+
+def configure_environment(stub_url, researcher_url=None):
+    # Settings are read at import time, so this must run before importing app.*
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "SUPABASE_URL": stub_url,
+        "SUPABASE_KEY": "stub",
+        "EMBEDDING_CACHE_REDIS": "false",
+        "REDIS_URL": os.getenv("BENCH_REDIS_URL", "redis://127.0.0.1:6390"),
+        # Keep benchmark runs from reading or writing the real local index
+        "VECTOR_INDEX_PATH": "",
+    })
+    if researcher_url:
+        os.environ["GPT_RESEARCHER_WS_URL"] = researcher_url
+
+
+def use_fake_redis():
+    """
+    Point the app's Redis clients at fakeredis (must run after app.* is
+    imported). Returns False when fakeredis is not installed, in which case
+    REDIS_URL is used as configured.
+    """
+    try:
+        import fakeredis
+    except ImportError:
+        return False
+    from app.agents import memory as memory_module
+
+    server = fakeredis.FakeServer()
+    memory_module.memory.redis_client = fakeredis.FakeRedis(server=server)
+    memory_module.async_memory.redis_client = fakeredis.aioredis.FakeRedis(server=server)
+    return True
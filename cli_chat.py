@@ -1,5 +1,8 @@
 import os
+import sys
+import json
 import asyncio
+import argparse
 import httpx
 from dotenv import load_dotenv
 
@@ -7,6 +10,7 @@ load_dotenv()
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 API_URL = "http://localhost:8000/chat"
+IMPORT_URL = "http://localhost:8000/conversations/import"
 
 # Reuse get_auth_info from tests/test_qa_agent.py
 from tests.test_qa_agent import get_auth_info
@@ -29,6 +33,29 @@ async def fetch_conversation(session_id, jwt_token):
             return list(reversed(resp.json()))
         return []
 
+def load_conversations(path):
+    """Read rows from a JSON array or a JSON Lines file."""
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+async def import_conversations(path, batch_size=1000):
+    auth_info = get_auth_info()
+    headers = {
+        "Authorization": f"Bearer {auth_info['token']}",
+        "Content-Type": "application/json"
+    }
+    rows = load_conversations(path)
+    imported = 0
+    async with httpx.AsyncClient(timeout=httpx.Timeout(300.0)) as client:
+        for start in range(0, len(rows), batch_size):
+            resp = await client.post(IMPORT_URL, headers=headers, json={"conversations": rows[start:start + batch_size]})
+            resp.raise_for_status()
+            imported += resp.json()["imported"]
+    print(f"Imported {imported} messages from {path}")
+
 async def main():
     auth_info = get_auth_info()
     jwt_token = auth_info["token"]
@@ -56,4 +83,10 @@ async def main():
         await asyncio.sleep(1)  # Give the agent a moment to reply
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chat with the business consultant agent")
+    parser.add_argument("--import", dest="import_path", help="Load conversations from a JSON/JSONL file instead of chatting")
+    args = parser.parse_args()
+    if args.import_path:
+        asyncio.run(import_conversations(args.import_path))
+        sys.exit(0)
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,53 @@
+import os
+import fakeredis
+import pytest
+from dotenv import load_dotenv
+
+# Settings and the Supabase/OpenAI clients are created at import time; tests
+# that import app.main or the routers never reach these services. Values from
+# .env (used by the live integration tests) take precedence.
+load_dotenv()
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+
+class CountingRedis(fakeredis.aioredis.FakeRedis):
+    """In-process redis.asyncio client that counts round trips (a pipeline is one)."""
+    round_trips = 0
+
+    async def execute_command(self, *args, **options):
+        self.round_trips += 1
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        async def counted(*args, **kwargs):
+            self.round_trips += 1
+            return await execute(*args, **kwargs)
+
+        pipe.execute = counted
+        return pipe
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def redis_client(redis_server):
+    return CountingRedis(server=redis_server)
+
+
+@pytest.fixture
+def sync_redis_client(redis_server):
+    return fakeredis.FakeRedis(server=redis_server)
+
+
+@pytest.fixture
+def redis_memory(redis_client):
+    from app.agents.memory import AsyncRedisMemory
+    return AsyncRedisMemory(client=redis_client, serializer="json")
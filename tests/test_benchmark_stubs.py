@@ -0,0 +1,27 @@
+from benchmarks.stubs import PostgrestTables
+from benchmarks.scenarios import compare, percentile
+
+def test_postgrest_tables_honor_filters_order_and_limit():
+    db = PostgrestTables()
+    db.insert("conversations", [{"session_id": "a", "role": "user", "content": str(i)} for i in range(5)])
+    db.insert("conversations", [{"session_id": "b", "role": "user", "content": "other"}])
+    rows = db.query("conversations", {"session_id": "eq.a", "id": "gt.1", "order": "id.desc", "limit": "2"})
+    assert [r["id"] for r in rows] == [5, 4]
+    assert db.project(rows, "id,content") == [{"id": 5, "content": "4"}, {"id": 4, "content": "3"}]
+
+def test_bulk_insert_with_columns_fills_defaults():
+    db = PostgrestTables()
+    user, assistant = db.insert(
+        "conversations",
+        [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "", "status": "pending"}],
+        columns=["role", "content", "status"],
+    )
+    assert user["status"] == "complete" and assistant["status"] == "pending"
+
+def test_percentiles_and_baseline_comparison():
+    values = [i / 100 for i in range(1, 101)]
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 99)) == (0.5, 0.95, 0.99)
+    baseline = {"chat@8": {"p95_ms": 100.0, "throughput_rps": 50.0, "failures": 0}}
+    assert compare({"chat@8": {"p95_ms": 110.0, "throughput_rps": 48.0, "failures": 0}}, baseline, 0.2) == []
+    regressions = compare({"chat@8": {"p95_ms": 130.0, "throughput_rps": 30.0, "failures": 0}}, baseline, 0.2)
+    assert len(regressions) == 2
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import httpx
+import pytest
+from types import SimpleNamespace
+
+from app import main
+from app.auth.supabase import auth
+
+class FakeChunk:
+    def __init__(self, content):
+        self.content = content
+
+class FakeExecutor:
+    """Replays ``astream_events`` v2 events for a tool call followed by a streamed reply."""
+
+    def __init__(self, fail_after_tokens=None):
+        self.fail_after_tokens = fail_after_tokens
+
+    async def astream_events(self, inputs, config=None, version=None):
+        yield {"event": "on_tool_start", "name": "GetBusinessMetrics", "data": {"input": "revenue"}}
+        yield {"event": "on_tool_end", "name": "GetBusinessMetrics", "data": {}}
+        for i, text in enumerate(["Grow ", "revenue."]):
+            if i == self.fail_after_tokens:
+                raise RuntimeError("model error")
+            yield {"event": "on_chat_model_stream", "name": "ChatOpenAI", "data": {"chunk": FakeChunk(text)}}
+        yield {"event": "on_chain_end", "name": "AgentExecutor", "data": {"output": {"output": "Grow revenue."}}}
+
+@pytest.fixture
+def agent(monkeypatch):
+    agent = main.agent
+    finished = []
+
+    async def start_turn(session, user_message, user_id, jwt_token):
+        return 42
+
+    async def finish_turn(session_id, user_id, assistant_row_id, agent_reply, jwt_token, status="complete", user_message=None):
+        await asyncio.sleep(0.01)
+        finished.append((assistant_row_id, agent_reply, status))
+
+    async def append(session_id, user_id, messages):
+        pass
+
+    monkeypatch.setattr(agent, "agent", FakeExecutor())
+    monkeypatch.setattr(agent, "_start_turn", start_turn)
+    monkeypatch.setattr(agent, "_finish_turn", finish_turn)
+    monkeypatch.setattr(agent.history, "append", append)
+    monkeypatch.setattr(agent.router, "enabled", False)
+    monkeypatch.setattr(agent.response_cache, "enabled", False)
+    main.app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(user=SimpleNamespace(id="u1"))
+    agent.finished = finished
+    yield agent
+    main.app.dependency_overrides.clear()
+
+def parse_sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+async def post_stream(payload):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        resp = await client.post("/chat/stream", json=payload, headers={"Authorization": "Bearer jwt"})
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    return parse_sse(resp.text)
+
+@pytest.mark.asyncio
+async def test_stream_event_sequence(agent):
+    events = await post_stream({"message": "How do I grow revenue?", "session_id": "s1"})
+    assert [event for event, _ in events] == ["session", "tool_start", "tool_end", "token", "token", "done"]
+    assert events[0][1] == {"session_id": "s1"}
+    assert events[1][1] == {"tool": "GetBusinessMetrics", "input": "revenue"}
+    assert "".join(data["text"] for event, data in events if event == "token") == "Grow revenue."
+    assert events[-1][1]["reply"] == "Grow revenue."
+    await agent.drain_finalizers()
+    assert agent.finished == [(42, "Grow revenue.", "complete")]
+
+@pytest.mark.asyncio
+async def test_agent_failure_sends_error_event_and_marks_row_failed(agent):
+    agent.agent = FakeExecutor(fail_after_tokens=1)
+    events = await post_stream({"message": "How do I grow revenue?", "session_id": "s1"})
+    assert [event for event, _ in events][-2:] == ["token", "error"]
+    await agent.drain_finalizers()
+    assert agent.finished == [(42, "Grow ", "failed")]
+
+@pytest.mark.asyncio
+async def test_disconnect_finalizes_partial_reply_and_drain_waits(agent):
+    stream = agent.run_stream("How do I grow revenue?", "u1", session_id="s2", jwt_token="jwt")
+    async for event, data in stream:
+        if event == "token":
+            break
+    # The client goes away after the first token
+    await stream.aclose()
+    assert agent.finished == []
+    await agent.drain_finalizers()
+    assert agent.finished == [(42, "Grow ", "failed")]
+    assert not agent._pending_finalizers
@@ -0,0 +1,81 @@
+import pytest
+from langchain_core.messages import SystemMessage
+from app.agents.context_builder import ContextBuilder, count_message_tokens, stable_context
+from app.agents.session_pool import SessionState
+
+def make_session(turns):
+    session = SessionState("s")
+    for i in range(turns):
+        session.memory.chat_memory.add_user_message(f"question {i} " + "detail " * 20)
+        session.memory.chat_memory.add_ai_message(f"answer {i} " + "advice " * 20)
+    return session
+
+class FakeSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, summary, messages):
+        self.calls.append(len(messages))
+        return (summary + " | " if summary else "") + f"{len(messages)} messages"
+
+@pytest.mark.asyncio
+async def test_short_sessions_are_sent_verbatim():
+    summarizer = FakeSummarizer()
+    builder = ContextBuilder(summarize=summarizer, token_budget=5000, recent_messages=10, summary_min_tokens=0, retrieval_k=0)
+    session = make_session(3)
+    history, stats = await builder.build(session, "next")
+    assert history == session.messages
+    assert stats["tokens_saved"] == 0
+    assert summarizer.calls == []
+
+@pytest.mark.asyncio
+async def test_older_turns_are_summarized_incrementally():
+    summarizer = FakeSummarizer()
+    builder = ContextBuilder(summarize=summarizer, token_budget=5000, recent_messages=4, summary_min_tokens=0, retrieval_k=0)
+    session = make_session(5)
+    history, stats = await builder.build(session, "next")
+    assert isinstance(history[0], SystemMessage) and "6 messages" in history[0].content
+    assert history[1:] == session.messages[-4:]
+    assert stats["tokens_saved"] > 0
+    # One more turn only summarizes the two messages that left the recent window
+    session.memory.chat_memory.add_user_message("q5")
+    session.memory.chat_memory.add_ai_message("a5")
+    await builder.build(session, "next")
+    assert summarizer.calls == [6, 2]
+
+@pytest.mark.asyncio
+async def test_budget_is_enforced():
+    builder = ContextBuilder(summarize=FakeSummarizer(), token_budget=120, recent_messages=20, summary_min_tokens=10**6, retrieval_k=0)
+    session = make_session(10)
+    history, stats = await builder.build(session, "next")
+    assert len(history) >= 2
+    assert count_message_tokens(history) <= 120 or len(history) == 2
+    assert stats["context_tokens"] < stats["full_tokens"]
+
+@pytest.mark.asyncio
+async def test_relevant_older_turns_are_retrieved():
+    async def embed_many(texts):
+        return [[1.0, 0.0] if "pricing" in t else [0.0, 1.0] for t in texts]
+    session = make_session(4)
+    session.memory.chat_memory.messages[0].content = "our pricing problem"
+    builder = ContextBuilder(summarize=FakeSummarizer(), token_budget=5000, recent_messages=2, summary_min_tokens=0, retrieval_k=1, embed_many=embed_many)
+    history, stats = await builder.build(session, "what about pricing?")
+    assert stats["relevant_messages"] == 1
+    assert "our pricing problem" in history[1].content
+    assert stable_context(history) == [history[0]] + history[2:]
+
+@pytest.mark.asyncio
+async def test_summarized_messages_are_trimmed_and_embedded_once():
+    calls = []
+
+    async def embed_many(texts):
+        calls.append(len(texts))
+        return [[1.0, 0.0] if "pricing" in t else [0.0, 1.0] for t in texts]
+    session = make_session(4)
+    builder = ContextBuilder(summarize=FakeSummarizer(), token_budget=5000, recent_messages=2, summary_min_tokens=0, retrieval_k=1, embed_many=embed_many)
+    await builder.build(session, "first")
+    assert len(session.messages) == 2 and session.summarized_count == 6
+    for i in range(3):
+        await builder.build(session, "what about pricing?")
+    # Six excerpts embedded when summarized, then only the query on each turn
+    assert calls == [6, 1, 1, 1, 1]
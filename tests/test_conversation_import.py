@@ -0,0 +1,47 @@
+import httpx
+import pytest
+from types import SimpleNamespace
+
+from app import main
+from app.auth.supabase import auth
+
+@pytest.fixture
+def imported(monkeypatch):
+    calls = []
+
+    async def import_conversations(rows, jwt_token, embed=True):
+        calls.append(rows)
+        return rows
+
+    monkeypatch.setattr(main.agent, "import_conversations", import_conversations)
+    main.app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(user=SimpleNamespace(id="u1"))
+    yield calls
+    main.app.dependency_overrides.clear()
+
+async def post_import(payload):
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post("/conversations/import", json=payload, headers={"Authorization": "Bearer jwt"})
+
+@pytest.mark.asyncio
+async def test_only_whitelisted_fields_are_imported(imported):
+    resp = await post_import({"conversations": [{
+        "session_id": "s1", "role": "user", "content": "hi", "created_at": "2024-01-01T00:00:00Z",
+        "id": 7, "user_id": "someone-else", "embedding": [0.1], "status": "complete", "bogus": 1,
+    }]})
+    assert resp.status_code == 200 and resp.json() == {"imported": 1}
+    assert imported == [[{
+        "session_id": "s1", "role": "user", "content": "hi", "created_at": "2024-01-01T00:00:00Z", "user_id": "u1"
+    }]]
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("row", [
+    {"session_id": "s1", "role": "user", "content": {"nested": "object"}},
+    {"session_id": "s1", "role": "user"},
+    {"session_id": "s1", "role": "system", "content": "hi"},
+    {"role": "user", "content": "hi"},
+])
+async def test_invalid_rows_are_rejected(imported, row):
+    resp = await post_import({"conversations": [row]})
+    assert resp.status_code == 422
+    assert imported == []
@@ -0,0 +1,85 @@
+import json
+import httpx
+import pytest
+from app.supabase_integration.config import SupabaseConfig
+from app.supabase_integration.rest import SupabaseRestClient
+from app.agents.conversation_store import ConversationStore
+
+def make_client(requests, reverse=False):
+    next_id = iter(range(1, 10_000))
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        body = json.loads(request.content)
+        if request.url.path.endswith("/rpc/log_turn"):
+            return httpx.Response(200, json={
+                "user_row_id": 11, "assistant_row_id": 12,
+                "history": [{"id": 9, "role": "user", "content": "hi"}, {"id": 10, "role": "assistant", "content": "hello"}]
+            })
+        rows = [dict(row, id=next(next_id)) for row in body]
+        return httpx.Response(201, json=rows[::-1] if reverse else rows)
+    config = SupabaseConfig(supabase_url="https://project.supabase.co", supabase_key="anon-key")
+    return SupabaseRestClient(config=config, transport=httpx.MockTransport(handler))
+
+@pytest.mark.asyncio
+async def test_start_turn_inserts_both_rows_in_one_request():
+    requests = []
+    store = ConversationStore(rest=make_client(requests), turn_rpc="")
+    user_row_id, assistant_row_id, history = await store.start_turn("s1", "u1", "hi", "jwt")
+    assert (user_row_id, assistant_row_id, history) == (1, 2, None)
+    (request,) = requests
+    rows = json.loads(request.content)
+    assert [r["role"] for r in rows] == ["user", "assistant"]
+    assert rows[1]["status"] == "pending" and "status" not in rows[0]
+    assert "missing=default" in request.headers["prefer"]
+    assert "status" in request.url.params["columns"].split(",")
+
+@pytest.mark.asyncio
+async def test_start_turn_picks_rows_by_role_not_position():
+    store = ConversationStore(rest=make_client([], reverse=True), turn_rpc="")
+    user_row_id, assistant_row_id, _ = await store.start_turn("s1", "u1", "hi", "jwt")
+    assert (user_row_id, assistant_row_id) == (1, 2)
+
+@pytest.mark.asyncio
+async def test_start_turn_rpc_returns_history():
+    requests = []
+    store = ConversationStore(rest=make_client(requests), turn_rpc="log_turn")
+    user_row_id, assistant_row_id, history = await store.start_turn("s1", "u1", "hi", "jwt", history_after=8, history_limit=100)
+    assert (user_row_id, assistant_row_id) == (11, 12)
+    assert [m["id"] for m in history] == [9, 10]
+    assert json.loads(requests[0].content)["p_after_id"] == 8
+
+@pytest.mark.asyncio
+async def test_bulk_import_batches_rows():
+    requests = []
+    store = ConversationStore(rest=make_client(requests), turn_rpc="")
+    rows = [{"session_id": "s1", "user_id": "u1", "role": "user", "content": f"m{i}"} for i in range(5)]
+    inserted = await store.bulk_import(rows, "jwt", batch_size=2)
+    assert [len(json.loads(r.content)) for r in requests] == [2, 2, 1]
+    assert [r["id"] for r in inserted] == [1, 2, 3, 4, 5]
+    assert [r["content"] for r in inserted] == [f"m{i}" for i in range(5)]
+
+@pytest.mark.asyncio
+async def test_update_embeddings_uses_one_rpc_and_falls_back_to_patches():
+    requests = []
+
+    def handler(request: httpx.Request):
+        requests.append(request)
+        if request.url.path.endswith("/rpc/missing_rpc"):
+            return httpx.Response(404, json={"code": "PGRST202"})
+        return httpx.Response(204)
+
+    config = SupabaseConfig(supabase_url="https://project.supabase.co", supabase_key="anon-key")
+    rest = SupabaseRestClient(config=config, transport=httpx.MockTransport(handler))
+    rows = [{"id": 1, "embedding": "[0.1]"}, {"id": 2, "embedding": "[0.2]"}]
+
+    await ConversationStore(rest=rest, embedding_rpc="update_embeddings").update_embeddings(rows, "jwt")
+    (request,) = requests
+    assert request.url.path.endswith("/rpc/update_embeddings")
+    assert json.loads(request.content) == {"p_rows": rows}
+
+    requests.clear()
+    store = ConversationStore(rest=rest, embedding_rpc="missing_rpc")
+    await store.update_embeddings(rows, "jwt")
+    assert [r.method for r in requests] == ["POST", "PATCH", "PATCH"]
+    assert store.embedding_rpc == ""
@@ -0,0 +1,59 @@
+import pytest
+from app.agents.utilities.embedding_cache import EmbeddingCache
+
+def test_key_normalizes_whitespace_and_includes_model():
+    cache = EmbeddingCache(use_redis=False)
+    assert cache.make_key("m", "hello   world ") == cache.make_key("m", " hello world")
+    assert cache.make_key("m", "hello world") != cache.make_key("other", "hello world")
+
+def test_lru_eviction_and_counters():
+    cache = EmbeddingCache(max_entries=2, use_redis=False)
+    cache.set("m", "a", [1.0])
+    cache.set("m", "b", [2.0])
+    assert cache.get("m", "a") == [1.0]
+    cache.set("m", "c", [3.0])  # evicts "b", the least recently used
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "c") == [3.0]
+    stats = cache.stats()
+    assert stats["local_hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["local_entries"] == 2
+
+def test_redis_tier_stores_float32_bytes(sync_redis_client):
+    redis = sync_redis_client
+    writer = EmbeddingCache(redis_client=redis, use_redis=True, dtype="float32")
+    writer.set("m", "shared text", [0.5, -1.25, 2.0])
+    blob = redis.get(redis.keys()[0])
+    assert isinstance(blob, bytes) and len(blob) == 3 * 4
+    # A second worker with a cold LRU tier is served from Redis
+    reader = EmbeddingCache(redis_client=redis, use_redis=True, dtype="float32")
+    assert reader.get("m", "shared text") == [0.5, -1.25, 2.0]
+    assert reader.stats()["redis_hits"] == 1
+
+@pytest.mark.asyncio
+async def test_async_lookup_uses_local_tier():
+    cache = EmbeddingCache(use_redis=False)
+    assert await cache.aget("m", "q") is None
+    await cache.aset_many("m", ["q"], [[0.25]])
+    assert await cache.aget("m", "q") == [0.25]
+
+def test_quantized_tiers_are_smaller_and_namespaced(sync_redis_client):
+    redis = sync_redis_client
+    cache = EmbeddingCache(redis_client=redis, use_redis=True, dtype="int8")
+    cache.set("m", "text", [0.5, -1.0, 0.25, 0.0])
+    key = redis.keys()[0]
+    assert key.startswith(b"emb.int8:") and len(redis.get(key)) == 4 + 4
+    assert cache.stats()["local_bytes"] == 8
+    assert EmbeddingCache(redis_client=redis, use_redis=True, dtype="float32").get("m", "text") is None
+    restored = EmbeddingCache(redis_client=redis, use_redis=True, dtype="int8").get("m", "text")
+    assert restored == pytest.approx([0.5, -1.0, 0.25, 0.0], abs=0.01)
+
+@pytest.mark.asyncio
+async def test_async_tier_uses_the_async_client(redis_client):
+    writer = EmbeddingCache(async_redis_client=redis_client, use_redis=True, dtype="float32")
+    await writer.aset_many("m", ["shared text"], [[0.5, -1.25]])
+    reader = EmbeddingCache(async_redis_client=redis_client, use_redis=True, dtype="float32")
+    assert await reader.aget("m", "shared text") == [0.5, -1.25]
+    assert await reader.aget("m", "shared text") == [0.5, -1.25]
+    assert (reader.stats()["redis_hits"], reader.stats()["local_hits"]) == (1, 1)
+    assert await reader.aget("m", "other") is None and reader.stats()["misses"] == 1
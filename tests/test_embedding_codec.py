@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from app.agents.utilities import embedding_codec as codec
+
+VECTOR = np.random.default_rng(0).standard_normal(1536).astype(np.float32) * 0.05
+
+@pytest.mark.parametrize("dtype, size, tolerance", [("float32", 6144, 0), ("float16", 3072, 1e-4), ("int8", 1540, 2e-3)])
+def test_quantized_round_trips(dtype, size, tolerance):
+    blob = codec.quantize(VECTOR, dtype)
+    assert len(blob) == size
+    assert np.abs(codec.dequantize(blob, dtype) - VECTOR).max() <= tolerance
+    assert np.allclose(codec.from_base64(codec.to_base64(VECTOR, dtype), dtype), codec.dequantize(blob, dtype))
+    assert np.allclose(codec.from_bytea(codec.to_bytea(VECTOR, dtype), dtype), codec.dequantize(blob, dtype))
+
+def test_matrix_quantization_keeps_cosine_similarity():
+    matrix = np.random.default_rng(1).standard_normal((50, 64)).astype(np.float32)
+    codes, scales = codec.quantize_matrix(matrix, "int8")
+    restored = codec.dequantize_matrix(codes, scales)
+    cosine = (restored * matrix).sum(1) / np.linalg.norm(restored, axis=1) / np.linalg.norm(matrix, axis=1)
+    assert cosine.min() > 0.999
+
+def test_pgvector_text_is_compact_and_keeps_float32_precision():
+    text = codec.to_pgvector(VECTOR)
+    assert np.allclose(codec.from_pgvector(text), VECTOR, rtol=1e-6, atol=0)
+    json_size = len(str([float(v) for v in VECTOR]))
+    assert len(text) < json_size * 0.75
+    assert codec.to_wire(None) is None
+    assert codec.to_wire([0.5, -1.0], wire_format="pgvector") == "[0.5,-1]"
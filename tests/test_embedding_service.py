@@ -0,0 +1,89 @@
+import asyncio
+import json
+import httpx
+import pytest
+from openai import AsyncOpenAI, BadRequestError
+from app.agents.utilities.embedding_service import EmbeddingService
+
+def make_fake_embeddings_endpoint(calls, fail=False):
+    """Fake OpenAI /embeddings endpoint: each text maps to [len(text), index]."""
+    def handler(request: httpx.Request):
+        body = json.loads(request.content)
+        calls.append(body["input"])
+        if fail:
+            return httpx.Response(500, json={"error": {"message": "boom"}})
+        if "bad" in body["input"]:
+            return httpx.Response(400, json={"error": {"message": "invalid input"}})
+        data = [
+            {"object": "embedding", "index": i, "embedding": [float(len(text)), float(i)]}
+            for i, text in enumerate(body["input"])
+        ]
+        return httpx.Response(200, json={
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0}
+        })
+    return handler
+
+def make_service(calls, fail=False, **kwargs):
+    client = AsyncOpenAI(
+        api_key="test",
+        base_url="http://fake-openai.local/v1",
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(make_fake_embeddings_endpoint(calls, fail)))
+    )
+    return EmbeddingService(model="test-model", client=client, **kwargs)
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_call():
+    calls = []
+    service = make_service(calls, batch_window_ms=20)
+    texts = ["a", "bb", "ccc", "bb", "dddd"]
+    results = await asyncio.gather(*(service.embed(t) for t in texts))
+    assert len(calls) == 1
+    # Duplicates are sent once
+    assert calls[0] == ["a", "bb", "ccc", "dddd"]
+    assert [r[0] for r in results] == [1.0, 2.0, 3.0, 2.0, 4.0]
+    await service.aclose()
+
+@pytest.mark.asyncio
+async def test_max_batch_size_flushes_early():
+    calls = []
+    service = make_service(calls, batch_window_ms=1000, max_batch_size=2)
+    results = await asyncio.wait_for(service.embed_many(["a", "b", "c", "d"]), timeout=0.5)
+    assert len(results) == 4
+    assert [len(batch) for batch in calls] == [2, 2]
+    await service.aclose()
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_every_waiter():
+    calls = []
+    service = make_service(calls, fail=True, batch_window_ms=5)
+    results = await asyncio.gather(service.embed("x"), service.embed("y"), return_exceptions=True)
+    assert all(isinstance(r, Exception) for r in results)
+    assert service.stats()["requests_sent"] == 0
+    await service.aclose()
+
+@pytest.mark.asyncio
+async def test_one_rejected_input_does_not_fail_the_batch():
+    calls = []
+    service = make_service(calls, batch_window_ms=5)
+    good, bad, other = await asyncio.gather(
+        service.embed("a"), service.embed("bad"), service.embed("ccc"), return_exceptions=True
+    )
+    assert (good[0], other[0]) == (1.0, 3.0)
+    assert isinstance(bad, BadRequestError)
+    assert calls[0] == ["a", "bad", "ccc"] and sorted(calls[1:]) == [["a"], ["bad"], ["ccc"]]
+    await service.aclose()
+
+@pytest.mark.asyncio
+async def test_empty_and_oversized_inputs_are_handled_before_batching():
+    calls = []
+    service = make_service(calls, batch_window_ms=5, max_input_tokens=8)
+    with pytest.raises(ValueError):
+        await service.embed("   ")
+    long_text = "word " * 100
+    vector = await service.embed(long_text)
+    assert len(calls) == 1 and len(calls[0][0]) < len(long_text) and vector[0] == len(calls[0][0])
+    await service.aclose()
@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from app.agents.utilities.embedding_writer import EmbeddingWriteBehind
+
+class FakeBackend:
+    def __init__(self, embed_failures=0, patch_failures=0):
+        self.embed_calls = []
+        self.patched = {}
+        self.embed_failures = embed_failures
+        self.patch_failures = patch_failures
+
+    async def embed_many(self, texts):
+        self.embed_calls.append(list(texts))
+        if "invalid" in texts:
+            raise ValueError("input rejected")
+        if self.embed_failures:
+            self.embed_failures -= 1
+            raise RuntimeError("embedding endpoint down")
+        return [[float(len(t))] for t in texts]
+
+    async def patch(self, row_id, update_data, jwt_token):
+        if self.patch_failures:
+            self.patch_failures -= 1
+            raise RuntimeError("PostgREST unavailable")
+        self.patched[row_id] = (update_data, jwt_token)
+
+@pytest.mark.asyncio
+async def test_rows_are_embedded_in_batches_and_drained():
+    backend = FakeBackend()
+    writer = EmbeddingWriteBehind(patch=backend.patch, embed_many=backend.embed_many, workers=1, batch_size=10, max_queue=100)
+    await writer.start()
+    for i in range(5):
+        await writer.enqueue(i, "x" * i, "jwt")
+    await writer.drain(timeout=1)
+    assert len(backend.patched) == 5
+    assert backend.patched[3] == ({"embedding": [3.0]}, "jwt")
+    # The first row may be picked up alone; the rest arrive as one batch
+    assert sum(len(c) for c in backend.embed_calls) == 5
+    assert len(backend.embed_calls) <= 2
+    assert writer.stats()["rows_written"] == 5
+    assert not writer.running
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    backend = FakeBackend(embed_failures=1, patch_failures=1)
+    writer = EmbeddingWriteBehind(patch=backend.patch, embed_many=backend.embed_many, workers=1, retry_backoff=0.001)
+    await writer.enqueue("row", "hello", None)
+    await writer.drain(timeout=1)
+    assert "row" in backend.patched
+    assert writer.stats() == {"queued": 0, "rows_written": 1, "rows_failed": 0}
+
+@pytest.mark.asyncio
+async def test_enqueue_applies_backpressure():
+    backend = FakeBackend()
+    writer = EmbeddingWriteBehind(patch=backend.patch, embed_many=backend.embed_many, workers=1, max_queue=1)
+    await writer.start()
+    # Stop the worker so nothing is consumed
+    for task in writer._tasks:
+        task.cancel()
+    await writer.enqueue(1, "a", None)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(writer.enqueue(2, "b", None), timeout=0.05)
+
+@pytest.mark.asyncio
+async def test_written_rows_are_reported_with_their_metadata():
+    backend = FakeBackend(patch_failures=1)
+    written = []
+    writer = EmbeddingWriteBehind(patch=backend.patch, embed_many=backend.embed_many, workers=1, batch_size=10,
+                                  max_queue=100, max_retries=1, on_written=lambda *args: written.append(args))
+    await writer.enqueue("failed", "abc", "jwt", meta={"user_id": "u1"})
+    await writer.drain(timeout=1)
+    await writer.enqueue("ok", "abcd", "jwt", meta={"user_id": "u1"})
+    await writer.drain(timeout=1)
+    assert written == [("ok", [4.0], {"user_id": "u1"})]
+
+@pytest.mark.asyncio
+async def test_batches_are_written_with_one_request_per_credential():
+    backend = FakeBackend()
+    calls = []
+
+    async def patch_many(rows, jwt_token):
+        calls.append((rows, jwt_token))
+
+    writer = EmbeddingWriteBehind(patch_many=patch_many, embed_many=backend.embed_many)
+    await writer._process([(0, "x", "a", None), (1, "xx", "b", None), (2, "xxx", "a", None)])
+    assert calls == [
+        ([{"id": 0, "embedding": [1.0]}, {"id": 2, "embedding": [3.0]}], "a"),
+        ([{"id": 1, "embedding": [2.0]}], "b"),
+    ]
+    assert writer.stats()["rows_written"] == 3
+
+    # A service credential replaces the (possibly expired) user JWTs
+    calls.clear()
+    writer = EmbeddingWriteBehind(patch_many=patch_many, embed_many=backend.embed_many, credential="service")
+    await writer._process([(0, "x", "a", None), (1, "xx", "b", None)])
+    assert [jwt for _, jwt in calls] == ["service"]
+
+@pytest.mark.asyncio
+async def test_a_rejected_row_does_not_drop_the_rest_of_the_batch():
+    backend = FakeBackend()
+    writer = EmbeddingWriteBehind(patch=backend.patch, embed_many=backend.embed_many, retry_backoff=0.001)
+    await writer._process([(1, "good", "jwt", None), (2, "invalid", "jwt", None), (3, "fine", "jwt", None)])
+    assert set(backend.patched) == {1, 3}
+    # The invalid batch and row are not retried
+    assert backend.embed_calls == [["good", "invalid", "fine"], ["good"], ["invalid"], ["fine"]]
+    assert writer.stats()["rows_failed"] == 1
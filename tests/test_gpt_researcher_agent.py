@@ -44,7 +44,7 @@ def main():
         }
     }
     print("Sending request to:", API_URL)
-    response = httpx.post(API_URL, json=payload, timeout=None)
+    response = httpx.post(API_URL, json=payload, headers={"Authorization": f"Bearer {auth_info['token']}"}, timeout=None)
     print("Status code:", response.status_code)
     try:
         print("Response:", response.json())
@@ -0,0 +1,105 @@
+import asyncio
+import json
+import pytest
+import httpx
+import websockets
+from app.agents.gpt_researcher_agent import GPTResearcherAgent
+from app.agents.research_jobs import ResearchJobManager
+from app.agents.research_cache import research_cache_key
+
+class FakeRest:
+    def __init__(self):
+        self.calls = []
+
+    async def request(self, method, path, jwt_token=None, params=None, json=None, prefer=None):
+        self.calls.append((method, path, json))
+        return httpx.Response(201 if method == "POST" else 204)
+
+    async def post(self, path, json, jwt_token=None, params=None, prefer="return=representation"):
+        return await self.request("POST", path, jwt_token, params=params, json=json, prefer=prefer)
+
+async def fake_researcher(ws):
+    """Minimal GPT Researcher: logs, a report in chunks, then close (or hang on 'slow')."""
+    command = await ws.recv()
+    request = json.loads(command[len("start "):])
+    await ws.send(json.dumps({"type": "logs", "output": f"researching {request['task']}"}))
+    if request["task"] == "slow":
+        await ws.wait_closed()
+        return
+    for part in ["# Report\n", "body ", "text"]:
+        await ws.send(json.dumps({"type": "report", "output": part}))
+
+@pytest.mark.asyncio
+async def test_many_concurrent_jobs_share_one_event_loop():
+    async with websockets.serve(fake_researcher, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        agent = GPTResearcherAgent(f"ws://127.0.0.1:{port}", rest=FakeRest())
+        results = await asyncio.gather(*(
+            agent.arun_task(f"task {i}", "research_report", "web", "Formal", "u1", "topic", "jwt")
+            for i in range(50)
+        ))
+    assert {r["status"] for r in results} == {"completed"}
+    assert {r["results"] for r in results} == {"# Report\nbody text"}
+    assert results[7]["metadata"] == [{"type": "logs", "output": "researching task 7"}]
+
+@pytest.mark.asyncio
+async def test_timeout_and_cancellation_still_persist_partial_results():
+    rest = FakeRest()
+    async with websockets.serve(fake_researcher, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        agent = GPTResearcherAgent(f"ws://127.0.0.1:{port}", rest=rest)
+        timed_out = await agent.arun_task("slow", "research_report", "web", "Formal", "u1", "t", "jwt", timeout=0.2)
+        assert timed_out["status"] == "timeout"
+
+        jobs = ResearchJobManager(run=agent.arun_task, max_concurrent=2, max_queued_per_user=5, history_size=10)
+        job = jobs.submit("u1", task="slow", report_type="research_report", report_source="web",
+                          tone="Formal", topic="t", jwt_token="jwt")
+        await asyncio.sleep(0.2)
+        assert job.status == "running"
+        assert jobs.cancel(job.research_id)
+        await jobs.aclose()
+        assert job.status == "cancelled"
+    # Both jobs flushed the log message they received before stopping
+    metadata_updates = [p for method, path, p in rest.calls if method == "PATCH" and "metadata" in p]
+    assert len(metadata_updates) == 2
+
+class FakeCache:
+    def __init__(self):
+        self.entries = {}
+
+    async def get(self, cache_key):
+        return self.entries.get(cache_key) if cache_key else None
+
+    async def set(self, cache_key, metadata, results):
+        if cache_key and results:
+            self.entries[cache_key] = {"metadata": metadata, "results": results}
+        return True
+
+@pytest.mark.asyncio
+async def test_identical_requests_share_one_run_and_repeat_from_cache():
+    connections = []
+
+    async def counting_researcher(ws):
+        connections.append(ws)
+        await asyncio.sleep(0.1)
+        await fake_researcher(ws)
+
+    rest = FakeRest()
+    async with websockets.serve(counting_researcher, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        agent = GPTResearcherAgent(f"ws://127.0.0.1:{port}", rest=rest, cache=FakeCache())
+        jobs = ResearchJobManager(run=agent.arun_task, follow=agent.afollow_task, max_concurrent=5,
+                                  max_queued_per_user=5, history_size=10)
+        params = dict(task="AI in education", report_type="research_report", report_source="web",
+                      tone="Formal", topic="t", jwt_token="jwt", cache_key=research_cache_key("AI in education", "research_report", "web", "Formal"))
+        submitted = [jobs.submit(f"user-{i}", **params) for i in range(3)]
+        assert [j.leader_id for j in submitted[1:]] == [submitted[0].research_id] * 2
+        await asyncio.gather(*(j.task for j in submitted))
+        repeat = jobs.submit("user-9", **dict(params, cache_key=research_cache_key("ai in  EDUCATION", "research_report", "web", "formal")))
+        await repeat.task
+    assert len(connections) == 1
+    assert all(j.status == "completed" for j in submitted + [repeat])
+    # Every job still gets its own research_history row with the full report
+    rows = [p for method, path, p in rest.calls if method == "POST" and path == "research_history"]
+    assert {r["id"] for r in rows} == {j.research_id for j in submitted + [repeat]}
+    assert [r["results"] for r in rows[1:]] == ["# Report\nbody text"] * 3
@@ -0,0 +1,66 @@
+import asyncio
+import httpx
+import pytest
+from types import SimpleNamespace
+from fastapi import Depends, FastAPI
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app import gpt_researcher_router
+from app.agents.research_cache import research_cache_key
+from app.agents.research_jobs import ResearchJobManager
+from app.auth.supabase import auth, security
+
+def bearer_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Tests use the bearer token as the user id
+    return SimpleNamespace(user=SimpleNamespace(id=credentials.credentials))
+
+@pytest.fixture
+def client(monkeypatch):
+    release = asyncio.Event()
+
+    async def run(research_id, user_id, **params):
+        await release.wait()
+        return {"research_id": research_id, "status": "completed", "results": "report"}
+
+    async def follow(leader, research_id, **params):
+        await release.wait()
+        return {"research_id": research_id, "status": "completed", "results": "report"}
+
+    monkeypatch.setattr(gpt_researcher_router, "research_jobs", ResearchJobManager(run=run, follow=follow))
+    app = FastAPI()
+    app.include_router(gpt_researcher_router.router)
+    app.dependency_overrides[auth.get_current_user] = bearer_user
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def submit_body(user_id, report_source="web"):
+    return {"task": "AI in education", "report_type": "research_report", "report_source": report_source,
+            "tone": "Formal", "user_id": user_id, "topic": "t", "jwt_token": user_id}
+
+@pytest.mark.asyncio
+async def test_jobs_are_only_visible_to_their_owner(client):
+    async with client:
+        alice = {"Authorization": "Bearer alice"}
+        bob = {"Authorization": "Bearer bob"}
+        assert (await client.post("/gpt-researcher", json=submit_body("alice"), headers=bob)).status_code == 403
+        first = (await client.post("/gpt-researcher", json=submit_body("alice"), headers=alice)).json()
+        # An identical request shares the run but gets its own id, never the other user's
+        second = (await client.post("/gpt-researcher", json=submit_body("bob"), headers=bob)).json()
+        assert "attached_to" not in second and second["research_id"] != first["research_id"]
+
+        research_id = first["research_id"]
+        assert (await client.get(f"/gpt-researcher/{research_id}", headers=bob)).status_code == 404
+        assert (await client.get(f"/gpt-researcher/{research_id}/events", headers=bob)).status_code == 404
+        assert (await client.delete(f"/gpt-researcher/{research_id}", headers=bob)).status_code == 404
+        assert (await client.get(f"/gpt-researcher/{research_id}", headers=alice)).json()["status"] == "running"
+        assert (await client.delete(f"/gpt-researcher/{research_id}", headers=alice)).status_code == 200
+        await asyncio.sleep(0)
+        # Bob's job carries on after Alice cancels hers
+        status = (await client.get(f"/gpt-researcher/{second['research_id']}", headers=bob)).json()["status"]
+        assert status in ("queued", "running")
+        await gpt_researcher_router.research_jobs.aclose()
+
+def test_non_web_reports_are_cached_per_user():
+    web = [research_cache_key("AI", "research_report", "web", "Formal", user_id=user) for user in ("a", "b")]
+    local = [research_cache_key("AI", "research_report", "local", "Formal", user_id=user) for user in ("a", "b")]
+    assert web[0] == web[1]
+    assert local[0] != local[1]
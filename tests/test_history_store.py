@@ -0,0 +1,58 @@
+import pytest
+from app.agents.history_store import ConversationHistoryStore
+
+class FakeSupabase:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    async def fetch(self, session_id, jwt_token, after_id=None, limit=None):
+        self.calls.append((after_id, limit))
+        rows = [r for r in self.rows if after_id is None or r["id"] > after_id]
+        return rows[-limit:] if limit else rows
+
+def make_rows(n):
+    return [{"id": i, "role": "user" if i % 2 else "assistant", "content": f"m{i}"} for i in range(1, n + 1)]
+
+@pytest.mark.asyncio
+async def test_miss_backfills_window_then_serves_from_redis(redis_memory):
+    supabase = FakeSupabase(make_rows(10))
+    store = ConversationHistoryStore(fetch=supabase.fetch, redis=redis_memory, window=4)
+    first = await store.get_recent("s", "u1", "jwt")
+    assert [m["id"] for m in first] == [7, 8, 9, 10]
+    again = await store.get_recent("s", "u1", "jwt", after_id=8)
+    assert [m["id"] for m in again] == [9, 10]
+    assert supabase.calls == [(None, 4)]
+    assert store.stats() == {"hits": 1, "misses": 1}
+
+@pytest.mark.asyncio
+async def test_append_keeps_a_capped_rolling_window(redis_memory):
+    redis = redis_memory
+    supabase = FakeSupabase(make_rows(2))
+    store = ConversationHistoryStore(fetch=supabase.fetch, redis=redis, window=3)
+    # Appending before the list is seeded does not create a partial window
+    await store.append("s", "u1", [{"id": 3, "role": "user", "content": "m3"}])
+    assert await redis.get_list(store.key("s", "u1")) is None
+    await store.get_recent("s", "u1", "jwt")
+    await store.append("s", "u1", [{"id": 3, "role": "user", "content": "m3"}, {"id": 4, "role": "assistant", "content": "m4"}])
+    recent = await store.get_recent("s", "u1", "jwt")
+    assert [m["id"] for m in recent] == [2, 3, 4]
+    assert len(supabase.calls) == 1
+
+@pytest.mark.asyncio
+async def test_cursor_fallback_when_redis_is_cold(redis_memory):
+    supabase = FakeSupabase(make_rows(6))
+    store = ConversationHistoryStore(fetch=supabase.fetch, redis=redis_memory, window=50)
+    rows = await store.get_recent("s", "u1", "jwt", after_id=4)
+    assert [m["id"] for m in rows] == [5, 6]
+    assert supabase.calls == [(4, 50)]
+
+@pytest.mark.asyncio
+async def test_lists_are_scoped_to_the_user(redis_memory):
+    supabase = FakeSupabase(make_rows(4))
+    store = ConversationHistoryStore(fetch=supabase.fetch, redis=redis_memory, window=10)
+    await store.get_recent("s", "owner", "owner-jwt")
+    # Another user reusing the session id misses the owner's list and can't append to it
+    assert await store.get_cached("s", "other") is None
+    await store.append("s", "other", [{"id": 5, "role": "user", "content": "injected"}])
+    assert [m["id"] for m in await store.get_cached("s", "owner")] == [1, 2, 3, 4]
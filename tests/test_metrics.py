@@ -0,0 +1,47 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from app.metrics import MetricsMiddleware, Registry, server_timing, span, STAGE_SECONDS
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    hist = registry.histogram("test_seconds", "Test latency", ["stage"], buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    hist.observe(5.0, stage="a")
+    text = registry.render()
+    assert 'test_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_seconds_bucket{stage="a",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'test_seconds_count{stage="a"} 3' in text
+    assert "# TYPE test_seconds histogram" in text
+
+def test_counter_renders_labels():
+    registry = Registry()
+    counter = registry.counter("test_tokens_total", "Tokens", ["kind"])
+    counter.inc(10, kind="prompt")
+    counter.inc(5, kind="prompt")
+    assert 'test_tokens_total{kind="prompt"} 15' in registry.render()
+
+def test_server_timing_sums_repeated_stages():
+    header = server_timing([("postgrest.get", 0.010), ("postgrest.get", 0.005), ("agent_invoke", 1.2)])
+    assert header == 'postgrest-get;dur=15.0;desc="x2", agent_invoke;dur=1200.0'
+
+@pytest.mark.asyncio
+async def test_middleware_adds_server_timing_header():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/work")
+    async def work():
+        with span("unit_test_stage"):
+            await asyncio.sleep(0.01)
+        return {"ok": True}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://t") as client:
+        resp = await client.get("/work")
+    assert resp.status_code == 200
+    assert "unit_test_stage;dur=" in resp.headers["server-timing"]
+    assert "total;dur=" in resp.headers["server-timing"]
+    assert ("unit_test_stage",) in STAGE_SECONDS.series
@@ -0,0 +1,41 @@
+import pytest
+from app.agents.memory import get_serializer
+
+@pytest.mark.asyncio
+async def test_set_many_and_get_many_use_one_round_trip_each(redis_client, redis_memory):
+    memory = redis_memory
+    assert await memory.set_many({"a": {"x": 1}, "b": "two"}, expire=60)
+    assert redis_client.round_trips == 1
+    assert await memory.get_many(["a", "b", "missing"]) == {"a": {"x": 1}, "b": "two"}
+    assert redis_client.round_trips == 2
+    assert [await redis_client.ttl(key) for key in ("a", "b")] == [60, 60]
+    stats = memory.stats()
+    assert stats["latency_ms"]["set_many"]["count"] == 1 and stats["errors"] == 0
+
+@pytest.mark.asyncio
+async def test_set_memory_sets_expiry_atomically(redis_client, redis_memory):
+    await redis_memory.set_memory("k", [1, 2], expire=30)
+    assert redis_client.round_trips == 1
+    assert await redis_memory.get_memory("k") == [1, 2]
+    assert await redis_client.ttl("k") == 30
+
+@pytest.mark.asyncio
+async def test_errors_are_counted_not_raised(redis_client, redis_memory, monkeypatch):
+    async def down(key):
+        raise ConnectionError("down")
+    monkeypatch.setattr(redis_client, "get", down)
+    assert await redis_memory.get_memory("k") is None
+    assert redis_memory.stats()["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_capped_list_append_and_read(redis_memory):
+    assert await redis_memory.append_to_list("l", [1], max_length=2, create=False)
+    assert await redis_memory.get_list("l") is None
+    await redis_memory.append_to_list("l", [1, 2, 3], max_length=2, expire=60)
+    assert await redis_memory.get_list("l") == [2, 3]
+
+def test_serializers_round_trip():
+    value = {"role": "user", "content": "olá", "id": 3}
+    for name in ("json", "orjson", "msgpack"):
+        dumps, loads = get_serializer(name)
+        assert loads(dumps(value)) == value
@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from app.agents.research_jobs import ResearchJobManager, ResearchQueueFull
+
+class FakeRunner:
+    def __init__(self):
+        self.started = []
+        self.release = asyncio.Event()
+
+    async def run(self, research_id, user_id, task, **params):
+        self.started.append((user_id, task))
+        await self.release.wait()
+        return {"research_id": research_id, "status": "completed", "results": f"report on {task}"}
+
+@pytest.mark.asyncio
+async def test_jobs_start_round_robin_across_users_within_the_limit():
+    runner = FakeRunner()
+    jobs = ResearchJobManager(run=runner.run, max_concurrent=2, max_queued_per_user=10, history_size=100)
+    heavy = [jobs.submit("heavy", task=f"h{i}") for i in range(5)]
+    light = jobs.submit("light", task="l0")
+    await asyncio.sleep(0)
+    assert [j.status for j in heavy[:2]] == ["running", "running"]
+    assert light.status == "queued"
+    assert jobs.stats() == {"running": 2, "queued": 4, "attached": 0, "tracked": 6}
+    runner.release.set()
+    while jobs.stats()["running"]:
+        await asyncio.sleep(0.01)
+    # The light user's job is not stuck behind the heavy user's backlog
+    order = [task for _, task in runner.started]
+    assert order.index("l0") < order.index("h3")
+    assert all(j.status == "completed" for j in heavy + [light])
+    assert light.result_length == len("report on l0")
+
+@pytest.mark.asyncio
+async def test_per_user_queue_limit_and_cancelling_queued_jobs():
+    runner = FakeRunner()
+    jobs = ResearchJobManager(run=runner.run, max_concurrent=1, max_queued_per_user=2, history_size=100)
+    running = jobs.submit("u1", task="a")
+    await asyncio.sleep(0)
+    queued = [jobs.submit("u1", task="b"), jobs.submit("u1", task="c")]
+    with pytest.raises(ResearchQueueFull):
+        jobs.submit("u1", task="d")
+    assert jobs.cancel(queued[0].research_id)
+    assert queued[0].status == "cancelled"
+    assert jobs.get(queued[0].research_id).to_dict()["status"] == "cancelled"
+    await jobs.aclose()
+    assert running.status == "cancelled" and queued[1].status == "cancelled"
+    assert [task for _, task in runner.started] == ["a"]
+
+@pytest.mark.asyncio
+async def test_followers_get_live_events_and_can_resume_from_an_offset():
+    runner = FakeRunner()
+
+    async def run(research_id, user_id, task, on_event, **params):
+        for i in range(3):
+            on_event({"type": "report", "output": f"part {i}"})
+            await asyncio.sleep(0.01)
+        return await runner.run(research_id, user_id, task)
+
+    jobs = ResearchJobManager(run=run, max_concurrent=1, max_queued_per_user=5, history_size=10)
+    job = jobs.submit("u1", task="t")
+    seen = []
+
+    async def follow():
+        async for offset, event in job.follow(0, heartbeat=0.05):
+            if event is not None:
+                seen.append((offset, event.get("output") or event["status"]))
+
+    follower = asyncio.create_task(follow())
+    await asyncio.sleep(0.1)
+    runner.release.set()
+    await asyncio.wait_for(follower, 1)
+    assert seen == [(0, "running"), (1, "part 0"), (2, "part 1"), (3, "part 2"), (4, "completed")]
+    # A finished job replays from the requested offset and ends
+    resumed = [offset async for offset, _ in job.follow(3)]
+    assert resumed == [3, 4]
+
+@pytest.mark.asyncio
+async def test_cancelling_a_leader_hands_the_research_to_a_follower():
+    runner = FakeRunner()
+
+    async def follow(leader, research_id, user_id, task, on_event, **params):
+        async for _, event in leader.follow(0):
+            if event.get("type") != "status":
+                on_event(event)
+        return {"research_id": research_id, "status": leader.status, "results": f"report on {task}"}
+
+    jobs = ResearchJobManager(run=runner.run, follow=follow, max_concurrent=2, max_queued_per_user=5, history_size=10)
+    leader = jobs.submit("u1", task="t", cache_key="k")
+    followers = [jobs.submit("u2", task="t", cache_key="k"), jobs.submit("u3", task="t", cache_key="k")]
+    await asyncio.sleep(0)
+    assert "leader_id" not in followers[0].to_dict()
+    assert jobs.cancel(leader.research_id)
+    await asyncio.sleep(0.01)
+    assert leader.status == "cancelled"
+    # The oldest follower now runs the research; the other one follows it
+    assert followers[0].status == "running" and followers[0].leader_id is None
+    assert followers[1].leader_id == followers[0].research_id
+    assert {"type": "status", "status": "running", "restarted": True} in followers[1].events
+    runner.release.set()
+    await asyncio.gather(*(j.task for j in followers if j.task))
+    await asyncio.sleep(0)
+    assert [j.status for j in followers] == ["completed", "completed"]
+    assert [user for user, _ in runner.started] == ["u1", "u2"]
+    assert jobs.stats()["running"] == 0
@@ -0,0 +1,47 @@
+import httpx
+import pytest
+from app.agents.research_persistence import BufferedResearchWriter
+
+class FakeRest:
+    """Records PostgREST writes; paths in ``failing`` answer 404."""
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+
+    async def request(self, method, path, jwt_token=None, params=None, json=None, prefer=None):
+        if path in self.failing:
+            return httpx.Response(404, text=f"relation {path} does not exist")
+        self.calls.append((method, path, json))
+        return httpx.Response(201 if method == "POST" else 204)
+
+    async def post(self, path, json, jwt_token=None, params=None, prefer="return=representation"):
+        return await self.request("POST", path, jwt_token, params=params, json=json, prefer=prefer)
+
+@pytest.mark.asyncio
+async def test_chunks_are_appended_once_and_results_written_on_final_flush():
+    rest = FakeRest()
+    writer = BufferedResearchWriter("r1", "jwt", rest=rest, chunk_table="research_chunks", flush_interval=3600, flush_bytes=10)
+    for word in ["alpha ", "beta ", "gamma ", "delta"]:
+        await writer.add_chunk(word)
+    await writer.add_metadata({"type": "logs", "output": "searching"})
+    await writer.flush(final=True)
+    chunks = [payload for method, path, payload in rest.calls if path == "research_chunks"]
+    assert [c["seq"] for c in chunks] == [0, 1]
+    assert "".join(c["content"] for c in chunks) == writer.results == "alpha beta gamma delta"
+    updates = [payload for method, path, payload in rest.calls if path == "research_history"]
+    assert updates == [{"results": "alpha beta gamma delta", "metadata": [{"type": "logs", "output": "searching"}]}]
+    # Nothing left to write
+    await writer.flush(final=True)
+    assert len(rest.calls) == 3
+
+@pytest.mark.asyncio
+async def test_falls_back_to_debounced_result_updates_without_chunk_table():
+    rest = FakeRest(failing={"research_chunks"})
+    writer = BufferedResearchWriter("r1", "jwt", rest=rest, chunk_table="research_chunks", flush_interval=3600, flush_bytes=1000)
+    for i in range(50):
+        await writer.add_chunk("x" * 10)
+    await writer.add_chunk("y" * 600)
+    await writer.flush(final=True)
+    updates = [payload["results"] for method, path, payload in rest.calls if path == "research_history"]
+    assert [len(u) for u in updates] == [1100]
+    assert writer.chunk_table == ""
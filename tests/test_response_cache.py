@@ -0,0 +1,55 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from app.agents.response_cache import ResponseCache, context_fingerprint
+
+VECTORS = {
+    "how do i expand into a new market?": [1.0, 0.0, 0.0],
+    "how can i expand into new markets": [0.99, 0.1, 0.0],
+    "what is our churn rate": [0.0, 1.0, 0.0],
+}
+
+async def fake_embed(text):
+    return VECTORS[text.lower()]
+
+@pytest.fixture
+def make_cache(redis_memory):
+    def make(**kwargs):
+        return ResponseCache(redis=redis_memory, embed=fake_embed, enabled=True, ttl=60, threshold=0.95, **kwargs)
+    return make
+
+@pytest.mark.asyncio
+async def test_exact_and_semantic_hits(make_cache):
+    cache = make_cache(scope="user")
+    fp = context_fingerprint([], "gpt")
+    assert await cache.get("u1", "How do I expand into a new market?", fp) is None
+    await cache.set("u1", "How do I expand into a new market?", fp, "Start with research.")
+    exact = await cache.get("u1", "  how do I expand into a NEW market ", fp)
+    assert exact == {"reply": "Start with research.", "tier": "exact", "similarity": 1.0}
+    semantic = await cache.get("u1", "How can I expand into new markets", fp)
+    assert semantic["tier"] == "semantic" and semantic["similarity"] > 0.95
+    assert await cache.get("u1", "What is our churn rate", fp) is None
+    stats = cache.stats()
+    assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 2)
+
+@pytest.mark.asyncio
+async def test_scope_and_context_separate_entries(make_cache):
+    cache = make_cache(scope="user")
+    fp = context_fingerprint([], "gpt")
+    await cache.set("u1", "How do I expand into a new market?", fp, "reply")
+    assert await cache.get("u2", "How do I expand into a new market?", fp) is None
+    other_context = context_fingerprint([HumanMessage(content="hi"), AIMessage(content="hello")], "gpt")
+    assert await cache.get("u1", "How do I expand into a new market?", other_context) is None
+
+@pytest.mark.asyncio
+async def test_global_scope_skips_replies_that_used_tools(make_cache):
+    cache = make_cache(scope="global")
+    fp = context_fingerprint([], "gpt")
+    assert not await cache.set("u1", "What is our churn rate", fp, "Your churn is 5%", used_tools=True)
+    await cache.set("u1", "How do I expand into a new market?", fp, "generic advice")
+    assert (await cache.get("u2", "How do I expand into a new market?", fp))["reply"] == "generic advice"
+
+@pytest.mark.asyncio
+async def test_disabled_cache_is_a_no_op(redis_memory):
+    cache = ResponseCache(redis=redis_memory, embed=fake_embed, enabled=False)
+    assert not await cache.set("u1", "What is our churn rate", "fp", "reply")
+    assert await cache.get("u1", "What is our churn rate", "fp") is None
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from app.agents.retrieval import RetrievalConfig, Retriever, select
+
+def config(**overrides):
+    values = dict(k=3, fetch_k=10, threshold=0.0, mmr_lambda=None, max_per_session=None, token_budget=None)
+    values.update(overrides)
+    return RetrievalConfig(**values)
+
+def test_mmr_skips_near_duplicates_and_sessions_are_collapsed():
+    query = np.array([1.0, 0.0, 0.0])
+    vectors = np.array([
+        [0.95, 0.3, 0.0],   # most relevant
+        [0.94, 0.31, 0.0],  # near-duplicate of the first
+        [0.8, 0.0, 0.6],    # less relevant, different direction
+        [0.7, -0.7, 0.0],
+    ])
+    sessions = ["s1", "s1", "s2", "s1"]
+    assert select(query, vectors, sessions, config()) == [0, 1, 2]
+    assert select(query, vectors, sessions, config(mmr_lambda=0.5)) == [0, 3, 2]
+    assert select(query, vectors, sessions, config(max_per_session=1)) == [0, 2]
+    assert select(query, vectors, sessions, config(threshold=0.9)) == [0, 1]
+
+class FakeSearch:
+    def __init__(self, rows):
+        self.rows = rows
+        self.requested_k = None
+
+    async def search(self, query_embedding, user_id=None, jwt_token=None, k=5, threshold=0.7):
+        self.requested_k = k
+        return self.rows
+
+@pytest.mark.asyncio
+async def test_retriever_over_fetches_and_trims_to_token_budget():
+    contents = {"query": [1.0, 0.0], "long answer " * 50: [0.9, 0.1], "short": [0.8, 0.2], "tiny": [0.7, 0.3]}
+
+    async def embed_many(texts):
+        return [contents[t] for t in texts]
+
+    rows = [{"content": c, "session_id": f"s{i}"} for i, c in enumerate(list(contents)[1:])]
+    search = FakeSearch(rows)
+    retriever = Retriever(search, embed_many=embed_many)
+    results = await retriever.retrieve("query", config=config(fetch_k=25, token_budget=20))
+    assert search.requested_k == 25
+    # The top hit alone exceeds the budget; smaller lower-ranked hits still fit
+    assert [r["content"] for r in results] == ["short", "tiny"]
+    results = await retriever.retrieve("query", config=config(token_budget=200))
+    assert [r["content"] for r in results] == ["long answer " * 50, "short", "tiny"]
+
+@pytest.mark.asyncio
+async def test_retriever_uses_stored_vectors_and_embeds_only_the_rest():
+    embedded = []
+
+    async def embed_many(texts):
+        embedded.append(list(texts))
+        return [[1.0, 0.0] if t == "query" else [0.6, 0.8] for t in texts]
+
+    rows = [
+        {"content": "stored", "session_id": "s1", "embedding": [0.9, 0.1]},
+        {"content": "pgvector", "session_id": "s2", "embedding": "[0.8,0.2]"},
+        {"content": "missing", "session_id": "s3"},
+    ]
+    retriever = Retriever(FakeSearch(rows), embed_many=embed_many)
+    results = await retriever.retrieve("query", config=config())
+    assert embedded == [["query"], ["missing"]]
+    assert [r["content"] for r in results] == ["stored", "pgvector", "missing"]
+    assert all("embedding" not in r for r in results)
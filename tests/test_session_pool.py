@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from app.agents.session_pool import SessionMemoryPool
+
+def test_sessions_have_isolated_memory():
+    pool = SessionMemoryPool(max_sessions=10, ttl=60)
+    a = pool.get("a")
+    b = pool.get("b")
+    a.memory.chat_memory.add_user_message("only in a")
+    assert len(a.messages) == 1
+    assert b.messages == []
+    assert pool.get("a") is a
+
+def test_users_reusing_a_session_id_get_separate_state():
+    pool = SessionMemoryPool(max_sessions=10, ttl=60)
+    owner = pool.get("shared", "alice")
+    owner.memory.chat_memory.add_user_message("alice's plan")
+    owner.summary = "alice's summary"
+    intruder = pool.get("shared", "bob")
+    assert intruder is not owner and intruder.user_id == "bob"
+    assert intruder.messages == [] and intruder.summary == ""
+    assert pool.get("shared", "alice") is owner
+
+def test_lru_and_ttl_eviction():
+    pool = SessionMemoryPool(max_sessions=2, ttl=60)
+    pool.get("a")
+    pool.get("b")
+    pool.get("a")
+    pool.get("c")  # "b" is least recently used
+    assert set(pool._sessions) == {(None, "a"), (None, "c")}
+    pool.ttl = 0.0001
+    pool._sessions[(None, "a")].last_used -= 1
+    pool.get("d")
+    assert (None, "a") not in pool._sessions
+    assert pool.stats()["evictions"] == 2
+
+@pytest.mark.asyncio
+async def test_active_session_is_not_evicted():
+    pool = SessionMemoryPool(max_sessions=1, ttl=60)
+    async with pool.session("busy") as state:
+        pool.get("other")
+        assert pool._sessions.get((None, "busy")) is state
+    assert pool.stats()["active"] == 0
+
+@pytest.mark.asyncio
+async def test_turns_in_one_session_are_serialized():
+    pool = SessionMemoryPool()
+    order = []
+
+    async def turn(name):
+        async with pool.session("s"):
+            order.append(f"{name}-start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name}-end")
+
+    await asyncio.gather(turn("one"), turn("two"))
+    assert order == ["one-start", "one-end", "two-start", "two-end"]
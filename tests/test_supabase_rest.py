@@ -0,0 +1,44 @@
+import httpx
+import pytest
+from app.supabase_integration.config import SupabaseConfig
+from app.supabase_integration.rest import SupabaseRestClient
+
+def make_client(requests):
+    def handler(request: httpx.Request):
+        requests.append(request)
+        if request.method == "GET":
+            return httpx.Response(200, json=[{"role": "user", "content": "hi"}])
+        return httpx.Response(201, json=[{"id": 1}])
+    config = SupabaseConfig(supabase_url="https://project.supabase.co", supabase_key="anon-key")
+    return SupabaseRestClient(config=config, transport=httpx.MockTransport(handler))
+
+@pytest.mark.asyncio
+async def test_requests_reuse_one_client_with_auth_headers():
+    requests = []
+    client = make_client(requests)
+    await client.start()
+    pooled = client._client
+    resp = await client.get("conversations", "user-jwt", params={"session_id": "eq.abc"})
+    assert resp.json() == [{"role": "user", "content": "hi"}]
+    await client.post("conversations", {"content": "hi"}, "user-jwt")
+    assert client._client is pooled
+    get, post = requests
+    assert get.url.path == "/rest/v1/conversations"
+    assert get.url.params["session_id"] == "eq.abc"
+    assert get.headers["apikey"] == "anon-key"
+    assert get.headers["authorization"] == "Bearer user-jwt"
+    assert post.headers["prefer"] == "return=representation"
+    stats = client.pool_stats()
+    assert stats["requests_total"] == 2 and stats["in_flight"] == 0
+    await client.aclose()
+    assert not client.started
+
+@pytest.mark.asyncio
+async def test_client_starts_lazily():
+    requests = []
+    client = make_client(requests)
+    assert not client.started
+    await client.patch("conversations", {"status": "complete"}, "jwt", params={"id": "eq.1"})
+    assert client.started
+    assert requests[0].method == "PATCH"
+    await client.aclose()
@@ -0,0 +1,74 @@
+import time
+import httpx
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from jose import jwk, jwt
+from app.supabase_integration.config import SupabaseConfig
+from app.supabase_integration.token_verifier import (
+    LocalVerificationUnavailable,
+    SupabaseTokenVerifier,
+    TokenVerificationError,
+)
+
+SECRET = "super-secret-jwt-token-with-at-least-32-characters"
+
+def make_config(secret=SECRET):
+    return SupabaseConfig(supabase_url="https://project.supabase.co", supabase_key="anon", supabase_jwt_secret=secret)
+
+def make_token(key=SECRET, algorithm="HS256", headers=None, **overrides):
+    claims = {"sub": "user-1", "aud": "authenticated", "role": "authenticated", "email": "a@b.co", "exp": int(time.time()) + 3600}
+    claims.update(overrides)
+    return jwt.encode(claims, key, algorithm=algorithm, headers=headers)
+
+@pytest.mark.asyncio
+async def test_valid_token_is_verified_and_cached():
+    verifier = SupabaseTokenVerifier(config=make_config())
+    token = make_token()
+    response = await verifier.get_user(token)
+    assert response.user.id == "user-1"
+    assert response.user.email == "a@b.co"
+    await verifier.verify(token)
+    assert verifier.stats()["cache_hits"] == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("token", [
+    make_token(exp=int(time.time()) - 3600),
+    make_token(aud="someone-else"),
+    make_token(key="another-secret-that-is-also-long-enough"),
+    "not-a-jwt",
+])
+async def test_invalid_tokens_are_rejected(token):
+    verifier = SupabaseTokenVerifier(config=make_config())
+    with pytest.raises(TokenVerificationError):
+        await verifier.verify(token)
+
+@pytest.mark.asyncio
+async def test_missing_secret_requests_remote_fallback():
+    verifier = SupabaseTokenVerifier(config=make_config(secret=None))
+    with pytest.raises(LocalVerificationUnavailable):
+        await verifier.verify(make_token())
+
+@pytest.mark.asyncio
+async def test_asymmetric_tokens_use_cached_jwks():
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    private_pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    public_jwk = dict(jwk.construct(public_pem, "ES256").to_dict(), kid="key-1")
+    fetches = []
+
+    def jwks_endpoint(request):
+        fetches.append(request.url.path)
+        return httpx.Response(200, json={"keys": [public_jwk]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(jwks_endpoint))
+    verifier = SupabaseTokenVerifier(config=make_config(secret=None), http_client=client)
+    for sub in ("user-1", "user-2"):
+        token = make_token(key=private_pem.decode(), algorithm="ES256", headers={"kid": "key-1"}, sub=sub)
+        assert (await verifier.verify(token))["sub"] == sub
+    assert fetches == ["/auth/v1/.well-known/jwks.json"]
+    await client.aclose()
@@ -0,0 +1,43 @@
+import pytest
+from app.config import settings
+from app.tracing import Trace, TraceCallbackHandler, current_trace, record, trace_callbacks, trace_request
+
+def test_disabled_path_records_nothing(monkeypatch):
+    monkeypatch.setattr(settings, "trace_sample_rate", 0.0)
+    with trace_request(None) as trace:
+        assert trace is None
+        record("rest", status=200)
+        assert trace_callbacks() is None
+
+def test_debug_flag_scopes_a_trace(monkeypatch):
+    monkeypatch.setattr(settings, "trace_allow_debug", True)
+    with trace_request("1") as trace:
+        record("rest", method="POST", status=201)
+        assert current_trace.get() is trace
+    assert current_trace.get() is None
+    (event,) = trace.to_list()
+    assert event["kind"] == "rest" and event["status"] == 201
+
+def test_debug_flag_ignored_when_not_allowed(monkeypatch):
+    monkeypatch.setattr(settings, "trace_allow_debug", False)
+    monkeypatch.setattr(settings, "trace_sample_rate", 0.0)
+    with trace_request("true") as trace:
+        assert trace is None
+
+def test_buffer_is_bounded_and_values_clipped():
+    trace = Trace(max_events=3, max_chars=10)
+    for i in range(5):
+        trace.add("step", output="x" * 50, n=i)
+    events = trace.to_list()
+    assert events[0] == {"kind": "dropped", "count": 2}
+    assert [e["n"] for e in events[1:]] == [2, 3, 4]
+    assert events[1]["output"].startswith("xxxxxxxxxx... (50 chars)")
+
+@pytest.mark.asyncio
+async def test_callback_handler_records_tool_steps():
+    from langchain_core.agents import AgentAction
+    trace = Trace()
+    handler = TraceCallbackHandler(trace)
+    await handler.on_agent_action(AgentAction(tool="GetBusinessMetrics", tool_input="revenue", log=""))
+    await handler.on_tool_end("{'revenue': 1}")
+    assert [e["kind"] for e in trace.to_list()] == ["agent_action", "tool_end"]
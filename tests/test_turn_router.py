@@ -0,0 +1,45 @@
+import pytest
+from langchain.tools import Tool
+from app.agents.turn_router import TurnRouter, classify
+
+@pytest.mark.parametrize("message,route,reason", [
+    ("Thanks!", "direct", "small_talk"),
+    ("ok, got it", "direct", "small_talk"),
+    ("Hi there", "direct", "small_talk"),
+    ("Can you rephrase that more simply?", "direct", "short_follow_up"),
+    ("What was our revenue last quarter?", "agent", "metrics"),
+    ("Thanks, can you pull the KPIs for Q3?", "agent", "metrics"),
+    ("What did we discuss last time about pricing?", "agent", "history"),
+    ("Remember the hiring plan?", "agent", "history"),
+    ("Search my past chats about hiring", "agent", "history"),
+    ("Can you look up what I asked about pricing?", "agent", "lookup"),
+    (
+        "We are a mid-sized logistics company considering expanding into two new regions next year, how should we plan it?",
+        "agent", "open_question",
+    ),
+])
+def test_classify(message, route, reason):
+    decision = classify(message, max_direct_words=12, has_history=True)
+    assert (decision.route, decision.reason) == (route, reason)
+
+def test_short_messages_opening_a_session_use_the_agent():
+    assert classify("How should I price this?", max_direct_words=12).reason == "first_turn"
+    assert classify("How should I price this?", max_direct_words=12, has_history=True).reason == "short_follow_up"
+    assert classify("Hi there", max_direct_words=12).route == "direct"
+
+def test_router_counts_decisions_and_tokens_saved():
+    tool = Tool(name="GetBusinessMetrics", func=lambda q: q, description="Retrieve business metrics and KPIs")
+    router = TurnRouter([tool], enabled=True)
+    assert router.tool_schema_tokens > 0
+    router.route("thanks")
+    router.route("Show me the churn rate")
+    stats = router.stats()
+    assert stats["decisions"] == {"direct:small_talk": 1, "agent:metrics": 1}
+    assert stats["direct_rate"] == 0.5
+    assert stats["estimated_tokens_saved"] == router.tool_schema_tokens
+
+def test_disabled_router_always_uses_agent():
+    router = TurnRouter(enabled=False)
+    decision = router.route("thanks")
+    assert (decision.route, decision.reason) == ("agent", "router_disabled")
+    assert router.stats()["estimated_tokens_saved"] == 0
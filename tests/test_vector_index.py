@@ -0,0 +1,112 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+from app.agents.vector_index import LocalVectorIndex
+
+class FakeRpc:
+    def __init__(self):
+        self.calls = 0
+
+    async def search(self, query_embedding, user_id=None, jwt_token=None, k=5, threshold=0.7):
+        self.calls += 1
+        return [{"id": "remote"}]
+
+def unit(seed, dim=32):
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+@pytest.mark.asyncio
+async def test_search_is_scoped_per_user_and_ranked_by_similarity():
+    index = LocalVectorIndex(dim=32, mode="flat", path="")
+    for i in range(20):
+        index.add("alice", i, unit(i), {"user_id": "alice", "session_id": "s1", "role": "user", "content": f"a{i}"})
+    index.add("bob", 100, unit(3), {"content": "bob's copy of a3"})
+    query = unit(3) + 0.1 * unit(99)
+    results = await index.search(query, user_id="alice", k=3, threshold=0.0)
+    assert results[0]["id"] == 3 and results[0]["content"] == "a3"
+    assert all(r["id"] != 100 for r in results)
+    assert "user_id" not in results[0]
+    assert [r["similarity"] for r in results] == sorted((r["similarity"] for r in results), reverse=True)
+    # Threshold filters out weak matches
+    assert [r["id"] for r in await index.search(query, user_id="alice", k=3, threshold=0.9)] == [3]
+
+@pytest.mark.asyncio
+async def test_unknown_users_fall_back_and_index_round_trips_to_disk(tmp_path):
+    rpc = FakeRpc()
+    path = str(tmp_path / "index.npz")
+    index = LocalVectorIndex(dim=32, mode="flat", path=path, fallback=rpc)
+    assert await index.search(unit(1), user_id="carol") == [{"id": "remote"}]
+    for i in range(40):
+        index.add("carol", i, unit(i), {"content": f"c{i}"})
+    index.save()
+    restored = LocalVectorIndex(dim=32, mode="flat", path=path, fallback=rpc)
+    restored.load()
+    results = await restored.search(unit(7), user_id="carol", k=1)
+    assert results[0]["id"] == 7 and results[0]["content"] == "c7"
+    assert restored.stats()["vectors"] == 40
+    assert rpc.calls == 1
+
+class FakeSupabase(FakeRpc):
+    """RPC fallback that also serves the user's stored rows for backfills."""
+
+    def __init__(self, stored, fail=False):
+        super().__init__()
+        self.stored = stored
+        self.fail = fail
+        self.fetches = []
+
+    async def fetch_rows(self, user_id, jwt_token=None, after_id=None, page_size=1000, max_rows=None):
+        self.fetches.append((user_id, after_id))
+        if self.fail:
+            raise RuntimeError("PostgREST unavailable")
+        rows = [dict(row) for row in self.stored if after_id is None or row["id"] > after_id]
+        return rows[: max_rows + 1] if max_rows is not None else rows
+
+def stored_rows(n):
+    return [{"id": i, "session_id": "s", "role": "user", "content": f"old{i}", "embedding": unit(i).tolist()} for i in range(n)]
+
+async def backfills(index):
+    await asyncio.gather(*list(index._syncing.values()))
+
+@pytest.mark.asyncio
+async def test_partitions_are_backfilled_in_the_background(tmp_path):
+    remote = FakeSupabase(stored_rows(5), fail=True)
+    index = LocalVectorIndex(dim=32, mode="flat", path=str(tmp_path / "index.npz"), fallback=remote)
+    # A message logged in this process creates the partition, but older rows are not in it yet
+    index.add("dave", 10, unit(10), {"content": "new"})
+    assert await index.search(unit(2), user_id="dave") == [{"id": "remote"}]
+    await backfills(index)
+
+    remote.fail = False
+    # Searches keep going to the RPC until a backfill has completed
+    assert await index.search(unit(2), user_id="dave") == [{"id": "remote"}]
+    await backfills(index)
+    results = await index.search(unit(2), user_id="dave", k=1)
+    assert results[0]["content"] == "old2" and len(results[0]["embedding"]) == 32
+    assert index.stats()["vectors"] == 6 and remote.calls == 2
+    assert remote.fetches == [("dave", None), ("dave", None)]
+
+    # After a restart only rows newer than the saved file are fetched
+    index.save()
+    assert os.stat(index.path).st_mode & 0o777 == 0o600
+    restored = LocalVectorIndex(dim=32, mode="flat", path=index.path, fallback=remote)
+    restored.load()
+    await restored.search(unit(2), user_id="dave")
+    await backfills(restored)
+    assert remote.fetches[-1] == ("dave", 10)
+
+@pytest.mark.asyncio
+async def test_partitions_are_bounded_by_users_and_rows():
+    remote = FakeSupabase(stored_rows(5))
+    index = LocalVectorIndex(dim=32, mode="flat", path="", fallback=remote, max_users=2, max_rows=3)
+    for user in ("a", "b", "c"):
+        index.add(user, 100, unit(100), {"content": "new"})
+    # "a" was least recently used
+    assert list(index.partitions) == ["b", "c"] and index.stats()["evictions"] == 1
+
+    # Five stored rows exceed max_rows: the user stays on the RPC and nothing is held for them
+    await index.search(unit(1), user_id="c")
+    await backfills(index)
+    assert await index.search(unit(1), user_id="c") == [{"id": "remote"}]
+    assert index.partitions["c"].oversized and index.stats()["vectors"] == 1
+    assert len(remote.fetches) == 1